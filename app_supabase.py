@@ -1,21 +1,260 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from supabase import create_client, Client
-from datetime import datetime, date
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g, session, has_app_context, has_request_context
+from werkzeug.local import LocalProxy
+from collections import OrderedDict, deque
+from datetime import datetime, date, timezone
+import asyncio
+import concurrent.futures
+import contextvars
+import copy
+import csv
+import functools
+import io
+import itertools
+import json
 import os
-from dotenv import load_dotenv
+import re
+import threading
+import time
+import uuid
+import click
 
-# Carrega variáveis de ambiente
-load_dotenv()
+# O pacote supabase (httpx, pydantic, realtime, storage...) é a parte mais
+# pesada do import. Ele e o .env só são carregados quando necessários, para o
+# worker subir rápido depois que o Render acorda o serviço (ver
+# benchmark_importacao.py).
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'sua-chave-secreta-aqui'
 
-# Configuração do Supabase
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+_env_carregado = False
 
-# Cliente Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def carregar_env():
+    """Carrega o .env uma única vez (variáveis já definidas não são sobrescritas)"""
+    global _env_carregado
+    if not _env_carregado:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_carregado = True
+
+def create_app():
+    """Fábrica do app (gunicorn usa app_supabase:create_app())
+
+    As rotas continuam registradas no app do módulo, então url_for e
+    `flask --app app_supabase` funcionam como antes. Nada aqui conecta no
+    Supabase: o cliente é criado na primeira consulta.
+    """
+    carregar_env()
+    return app
+
+def criar_cliente_supabase():
+    """Cria o cliente Supabase sobre um httpx.Client com pool keep-alive e HTTP/2
+
+    O pool (SUPABASE_POOL_CONEXOES, padrão 10) deve ter pelo menos uma
+    conexão por thread do worker (ver gunicorn.conf.py). As conexões ficam
+    abertas por SUPABASE_KEEPALIVE_SEGUNDOS (padrão 60): o padrão do httpx
+    fecha conexões ociosas após 5s, o que em tráfego baixo faz quase toda
+    requisição pagar TCP + TLS de novo. Cada consulta tem o tempo limite de
+    timeout_supabase().
+    """
+    import httpx
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+    
+    carregar_env()
+    pool_conexoes = int(os.getenv('SUPABASE_POOL_CONEXOES', '10'))
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=pool_conexoes,
+            max_keepalive_connections=pool_conexoes,
+            keepalive_expiry=float(os.getenv('SUPABASE_KEEPALIVE_SEGUNDOS', '60'))
+        ),
+        http2=True,
+        timeout=timeout_supabase(),
+        follow_redirects=True
+    )
+    return create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'),
+                         options=SyncClientOptions(httpx_client=http_client))
+
+def timeout_supabase():
+    """Tempo limite de cada consulta (SUPABASE_TIMEOUT_SEGUNDOS, padrão 8s)
+
+    Bem abaixo do timeout do gunicorn: com o Supabase lento a página cai no
+    último placar salvo em vez de ficar presa esperando.
+    """
+    import httpx
+    
+    return httpx.Timeout(float(os.getenv('SUPABASE_TIMEOUT_SEGUNDOS', '8')), connect=3.0)
+
+_cliente_supabase = None
+_trava_cliente = threading.Lock()
+
+def obter_cliente_supabase():
+    """Cliente Supabase do processo, criado na primeira chamada"""
+    global _cliente_supabase
+    if _cliente_supabase is None:
+        with _trava_cliente:
+            if _cliente_supabase is None:
+                _cliente_supabase = criar_cliente_supabase()
+    return _cliente_supabase
+
+def reiniciar_cliente_supabase(aquecer=False):
+    """Descarta o cliente do processo atual (gunicorn chama no post_fork)
+
+    Com preload_app o módulo é importado no master antes do fork; um cliente
+    criado lá seria herdado por todos os workers com o mesmo pool e os
+    mesmos sockets. Com aquecer=True o novo cliente é criado em segundo
+    plano, enquanto o worker já aceita requisições.
+    """
+    global _cliente_supabase
+    with _trava_cliente:
+        _cliente_supabase = None
+    if aquecer:
+        threading.Thread(target=obter_cliente_supabase, daemon=True).start()
+
+# Cliente Supabase: todo uso de `supabase` passa pelo cliente do processo
+supabase = LocalProxy(obter_cliente_supabase)
+
+# Latência das últimas consultas ao Supabase (deste processo), para o /status
+LATENCIAS_AMOSTRAS = 500
+_latencias = deque(maxlen=LATENCIAS_AMOSTRAS)
+
+class SupabaseIndisponivel(Exception):
+    """Consulta recusada sem ir à rede porque o circuito está aberto"""
+
+class CircuitoSupabase:
+    """Disjuntor das consultas ao Supabase (um por processo)
+
+    Fechado, as consultas passam normalmente. Depois de `falhas_para_abrir`
+    falhas seguidas de conexão/tempo limite ele abre por `segundos_aberto`:
+    as consultas falham na hora com SupabaseIndisponivel, sem esperar o
+    timeout. Passado esse tempo, uma única consulta de teste é liberada;
+    se der certo o circuito fecha, senão abre de novo.
+    """
+
+    def __init__(self, falhas_para_abrir=5, segundos_aberto=30):
+        self.falhas_para_abrir = falhas_para_abrir
+        self.segundos_aberto = segundos_aberto
+        self.falhas = 0
+        self._aberto_ate = None
+        self._testando = False
+        self._trava = threading.Lock()
+
+    @property
+    def estado(self):
+        with self._trava:
+            if self._aberto_ate is None:
+                return 'fechado'
+            return 'aberto' if time.monotonic() < self._aberto_ate else 'meio-aberto'
+
+    def permitir(self):
+        """Diz se uma consulta pode ir ao Supabase agora"""
+        with self._trava:
+            if self._aberto_ate is None:
+                return True
+            if time.monotonic() < self._aberto_ate or self._testando:
+                return False
+            self._testando = True
+            return True
+
+    def registrar_sucesso(self):
+        with self._trava:
+            self.falhas = 0
+            self._aberto_ate = None
+            self._testando = False
+
+    def registrar_falha(self):
+        with self._trava:
+            self.falhas += 1
+            # Falha na consulta de teste reabre direto
+            if self._testando or self.falhas >= self.falhas_para_abrir:
+                self._aberto_ate = time.monotonic() + self.segundos_aberto
+            self._testando = False
+
+circuito_supabase = CircuitoSupabase(
+    falhas_para_abrir=int(os.getenv('SUPABASE_CIRCUITO_FALHAS', '5')),
+    segundos_aberto=float(os.getenv('SUPABASE_CIRCUITO_SEGUNDOS', '30'))
+)
+
+def _falha_de_conexao(erro):
+    """Diz se o erro indica Supabase fora do ar ou lento (e não uma consulta inválida)"""
+    from postgrest.exceptions import APIError
+    
+    if not isinstance(erro, APIError):
+        # Tempo limite, conexão recusada, DNS...
+        return True
+    codigo = str(erro.code or '')
+    # HTTP 5xx sem corpo JSON, conexão do PostgREST com o banco e, do
+    # PostgreSQL, conexão (08), falta de recursos (53) e cancelamento (57)
+    return ((len(codigo) == 3 and codigo.startswith('5'))
+            or codigo in ('PGRST000', 'PGRST001', 'PGRST002')
+            or (len(codigo) == 5 and codigo[:2] in ('08', '53', '57')))
+
+def _marcar_falha():
+    """Avisa a requisição atual que alguma consulta (ou o cálculo de um placar) falhou
+
+    Os dados dela não são guardados no cache nem como último placar bom
+    (ver EntradaCachePlacar e com_ultimo_placar_bom).
+    """
+    if has_app_context():
+        g.falha_supabase = True
+
+def _antes_de_executar():
+    if not circuito_supabase.permitir():
+        _marcar_falha()
+        raise SupabaseIndisponivel('Supabase indisponível (circuito aberto)')
+
+def _depois_de_executar(inicio, erro=None):
+    _latencias.append(time.perf_counter() - inicio)
+    if erro is None:
+        circuito_supabase.registrar_sucesso()
+        return
+    
+    _marcar_falha()
+    if _falha_de_conexao(erro):
+        circuito_supabase.registrar_falha()
+    else:
+        # O Supabase respondeu; o problema é da consulta
+        circuito_supabase.registrar_sucesso()
+
+def _executar(query):
+    """Executa uma consulta do Supabase passando pelo circuito e registrando a latência"""
+    _antes_de_executar()
+    inicio = time.perf_counter()
+    try:
+        resposta = query.execute()
+    except Exception as e:
+        _depois_de_executar(inicio, e)
+        raise
+    _depois_de_executar(inicio)
+    return resposta
+
+async def _executar_async(query):
+    """Versão de _executar para o cliente assíncrono"""
+    _antes_de_executar()
+    inicio = time.perf_counter()
+    try:
+        resposta = await query.execute()
+    except Exception as e:
+        _depois_de_executar(inicio, e)
+        raise
+    _depois_de_executar(inicio)
+    return resposta
+
+def percentis_latencia():
+    """p50/p95/p99 (em ms) das últimas consultas ao Supabase"""
+    amostras = sorted(_latencias.copy())
+    if not amostras:
+        return {'amostras': 0}
+    
+    def percentil(p):
+        return round(amostras[min(len(amostras) - 1, int(p / 100 * len(amostras)))] * 1000, 1)
+    
+    return {
+        'amostras': len(amostras),
+        'p50_ms': percentil(50),
+        'p95_ms': percentil(95),
+        'p99_ms': percentil(99)
+    }
 
 # Sistema de pontuação
 PONTUACAO_CONFIG = {
@@ -40,6 +279,62 @@ PONTUACAO_RANKING = {
     'demais_posicoes': 0
 }
 
+# Quantidade de equipes na Divisão A (as demais ficam na Divisão B). Cada
+# liga define a sua (ligas.equipes_divisao_a); este é o valor das novas.
+EQUIPES_DIVISAO_A = 5
+
+# Quesitos disputados no ranking do Placar 2
+QUESITOS_RANKING = [
+    'pessoas_novas', 'celulas_realizadas', 'celulas_elite',
+    'pessoas_terca', 'pessoas_novas_terca', 'pessoas_arena',
+    'pessoas_novas_arena', 'pessoas_domingo', 'pessoas_novas_domingo',
+    'valor_arrecadacao', 'revisao_vidas'
+]
+
+# Colunas lidas por cada tela. Cada consulta pede só o que a tela usa, em vez
+# de select('*'); o nome da equipe vem do mapa de equipes, não de um join
+# equipes(nome) repetido em cada registro.
+COLUNAS = {
+    # Diretório de ligas (obter_ligas)
+    'liga': 'id, slug, nome, dominio, equipes_divisao_a',
+    # Placar geral e listas de equipes
+    'placar': 'id, nome, logo_url, pontuacao_total',
+    # Diretório de equipes (obter_diretorio_equipes)
+    'equipe_diretorio': 'id, nome, logo_url',
+    # Tabela do histórico da equipe (historico.html)
+    'registro_historico': (
+        'id, data_registro, data_inicio, data_fim, qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite, '
+        'qtd_pessoas_terca, qtd_pessoas_novas_terca, qtd_pessoas_arena, qtd_pessoas_novas_arena, '
+        'qtd_pessoas_domingo, qtd_pessoas_novas_domingo, valor_arrecadacao_parceiro, pontuacao'
+    ),
+    # Tabela do relatório por período (relatorio_resultado.html)
+    'registro_relatorio': (
+        'id, equipe_id, data_registro, data_inicio, data_fim, qtd_pessoas, qtd_pessoas_novas, qtd_celulas_elite, '
+        'qtd_pessoas_terca, qtd_pessoas_novas_terca, qtd_pessoas_arena, qtd_pessoas_novas_arena, '
+        'qtd_pessoas_domingo, qtd_pessoas_novas_domingo, valor_arrecadacao_parceiro, qtd_revisao_vidas, pontuacao'
+    ),
+    # Agregação da análise com IA (gerar_analise_com_ia)
+    'registro_analise': (
+        'id, equipe_id, data_registro, pontuacao, qtd_pessoas_novas, qtd_pessoas_novas_terca, qtd_pessoas_novas_arena, '
+        'qtd_pessoas_novas_domingo, qtd_celulas_realizadas, qtd_celulas_elite, qtd_pessoas_terca, '
+        'qtd_pessoas_arena, qtd_pessoas_domingo, valor_arrecadacao_parceiro, qtd_revisao_vidas'
+    ),
+    # Formulário de edição de registro (editar_registro.html)
+    'registro_edicao': (
+        'id, equipe_id, data_inicio, data_fim, qtd_pessoas, qtd_pessoas_novas, qtd_celulas, '
+        'qtd_celulas_realizadas, qtd_celulas_elite, qtd_pessoas_terca, qtd_pessoas_novas_terca, '
+        'qtd_pessoas_arena, qtd_pessoas_novas_arena, qtd_pessoas_domingo, qtd_pessoas_novas_domingo, '
+        'valor_arrecadacao_parceiro, qtd_revisao_vidas, pontuacao'
+    )
+}
+
+# Linhas por página ao ler registros. Precisa ficar abaixo do max-rows do
+# PostgREST (1000 por padrão no Supabase), que corta o resultado em silêncio.
+TAMANHO_PAGINA_REGISTROS = 500
+
+# Registros exibidos por página no histórico e no relatório por período
+REGISTROS_POR_PAGINA = 50
+
 def calcular_pontuacao(registro):
     """Calcula a pontuação baseada nos novos critérios estabelecidos (Placar 1)"""
     pontos = 0
@@ -73,287 +368,553 @@ def calcular_pontuacao(registro):
     
     return int(pontos)
 
-def calcular_pontuacao_ranking(registros_periodo):
-    """Calcula pontuação baseada em ranking comparativo entre equipes (Placar 2)"""
-    if not registros_periodo:
-        return {}
-    
-    # Agrupa registros por equipe
-    dados_por_equipe = {}
-    for registro in registros_periodo:
-        equipe_id = registro['equipe_id']
-        if equipe_id not in dados_por_equipe:
-            dados_por_equipe[equipe_id] = {
-                'pessoas_novas': 0,
-                'celulas_realizadas': 0,
-                'celulas_elite': 0,
-                'pessoas_terca': 0,
-                'pessoas_novas_terca': 0,
-                'pessoas_arena': 0,
-                'pessoas_novas_arena': 0,
-                'pessoas_domingo': 0,
-                'pessoas_novas_domingo': 0,
-                'valor_arrecadacao': 0,
-                'revisao_vidas': 0,
-                'pontuacao_ranking': 0
-            }
-        
-        dados = dados_por_equipe[equipe_id]
-        dados['pessoas_novas'] += registro.get('qtd_pessoas_novas', 0)
-        dados['celulas_realizadas'] += registro.get('qtd_celulas_realizadas', 0)
-        dados['celulas_elite'] += registro.get('qtd_celulas_elite', 0)
-        dados['pessoas_terca'] += registro.get('qtd_pessoas_terca', 0)
-        dados['pessoas_novas_terca'] += registro.get('qtd_pessoas_novas_terca', 0)
-        dados['pessoas_arena'] += registro.get('qtd_pessoas_arena', 0)
-        dados['pessoas_novas_arena'] += registro.get('qtd_pessoas_novas_arena', 0)
-        dados['pessoas_domingo'] += registro.get('qtd_pessoas_domingo', 0)
-        dados['pessoas_novas_domingo'] += registro.get('qtd_pessoas_novas_domingo', 0)
-        dados['valor_arrecadacao'] += registro.get('valor_arrecadacao_parceiro', 0)
-        dados['revisao_vidas'] += registro.get('qtd_revisao_vidas', 0)
-    
-    # Lista de quesitos para ranking
-    quesitos = [
-        'pessoas_novas', 'celulas_realizadas', 'celulas_elite',
-        'pessoas_terca', 'pessoas_novas_terca', 'pessoas_arena',
-        'pessoas_novas_arena', 'pessoas_domingo', 'pessoas_novas_domingo',
-        'valor_arrecadacao', 'revisao_vidas'
-    ]
-    
-    # Para cada quesito, cria ranking e atribui pontos
-    for quesito in quesitos:
-        # Ordena equipes por este quesito (maior para menor)
-        ranking_quesito = sorted(
-            dados_por_equipe.items(),
-            key=lambda x: x[1][quesito],
-            reverse=True
-        )
-        
-        # Filtra apenas equipes com valor > 0
-        ranking_quesito = [(equipe_id, dados) for equipe_id, dados in ranking_quesito if dados[quesito] > 0]
-        
-        if not ranking_quesito:
-            continue
-        
-        # Cria grupos de empate
-        grupos_empate = []
-        grupo_atual = []
-        valor_atual_grupo = None
-        
-        for equipe_id, dados in ranking_quesito:
-            valor = dados[quesito]
-            
-            if valor_atual_grupo is None or valor == valor_atual_grupo:
-                # Primeira equipe ou empate com o grupo atual
-                grupo_atual.append((equipe_id, dados))
-                valor_atual_grupo = valor
-            else:
-                # Valor diferente, finaliza grupo atual e inicia novo
-                grupos_empate.append((valor_atual_grupo, grupo_atual))
-                grupo_atual = [(equipe_id, dados)]
-                valor_atual_grupo = valor
-        
-        # Adiciona o último grupo
-        if grupo_atual:
-            grupos_empate.append((valor_atual_grupo, grupo_atual))
-        
-        # Atribui pontos por grupo de empate
-        posicao_atual = 1
-        
-        for valor_grupo, equipes_grupo in grupos_empate:
-            # Determina quantos pontos este grupo recebe baseado na posição
-            if posicao_atual == 1:
-                pontos = PONTUACAO_RANKING['primeiro_lugar']
-            elif posicao_atual == 2:
-                pontos = PONTUACAO_RANKING['segundo_lugar']
-            elif posicao_atual == 3:
-                pontos = PONTUACAO_RANKING['terceiro_lugar']
-            else:
-                pontos = PONTUACAO_RANKING['demais_posicoes']
-            
-            # Todas as equipes do grupo recebem a mesma pontuação
-            for equipe_id, dados in equipes_grupo:
-                dados_por_equipe[equipe_id]['pontuacao_ranking'] += pontos
-            
-            # Atualiza posição para o próximo grupo
-            posicao_atual += len(equipes_grupo)
-    
-    return dados_por_equipe
-
 def init_database():
     """Inicializa as tabelas no Supabase"""
     try:
         # Verifica se as tabelas existem tentando fazer uma consulta
-        supabase.table('equipes').select('*').limit(1).execute()
+        _executar(supabase.table('equipes').select('id').limit(1))
         print("✅ Tabelas já existem no Supabase!")
         return True
     except Exception as e:
         print("⚠️  Tabelas não encontradas. Você precisa criar as tabelas no Supabase.")
-        print("📋 Execute os comandos SQL no painel do Supabase:")
-        print("""
--- Criar tabela de equipes
-CREATE TABLE equipes (
-    id SERIAL PRIMARY KEY,
-    nome VARCHAR(100) NOT NULL,
-    logo_url TEXT,
-    pontuacao_total INTEGER DEFAULT 0,
-    data_criacao TIMESTAMP DEFAULT NOW(),
-    data_atualizacao TIMESTAMP DEFAULT NOW()
-);
-
--- Criar tabela de registros
-CREATE TABLE registros (
-    id SERIAL PRIMARY KEY,
-    equipe_id INTEGER REFERENCES equipes(id) ON DELETE CASCADE,
-    data_inicio DATE NOT NULL,
-    data_fim DATE NOT NULL,
-    data_registro TIMESTAMP DEFAULT NOW(),
-    qtd_pessoas INTEGER DEFAULT 0,
-    qtd_pessoas_novas INTEGER DEFAULT 0,
-    qtd_celulas_elite INTEGER DEFAULT 0,
-    qtd_pessoas_terca INTEGER DEFAULT 0,
-    qtd_pessoas_novas_terca INTEGER DEFAULT 0,
-    qtd_pessoas_arena INTEGER DEFAULT 0,
-    qtd_pessoas_novas_arena INTEGER DEFAULT 0,
-    qtd_pessoas_domingo INTEGER DEFAULT 0,
-    qtd_pessoas_novas_domingo INTEGER DEFAULT 0,
-    valor_arrecadacao_parceiro DECIMAL(10,2) DEFAULT 0,
-    pontuacao INTEGER DEFAULT 0
-);
-
--- Habilitar RLS (Row Level Security) - opcional
-ALTER TABLE equipes ENABLE ROW LEVEL SECURITY;
-ALTER TABLE registros ENABLE ROW LEVEL SECURITY;
-
--- Política para permitir todas as operações (para desenvolvimento)
-CREATE POLICY "Enable all operations for equipes" ON equipes FOR ALL USING (true);
-CREATE POLICY "Enable all operations for registros" ON registros FOR ALL USING (true);
-        """)
+        print("📋 Aplique as migrações (pasta migrations/) com DATABASE_URL definido:")
+        print("   python migracoes.py aplicar")
+        print("   ou cole os arquivos no SQL Editor do Supabase, na ordem dos números")
         return False
 
+# Ligas (ver migrations/0014_ligas.sql). Um deploy atende várias ligas
+# (congregações/campus): cada requisição pertence a uma liga e todas as
+# leituras e gravações filtram por ela. A liga vem do domínio cadastrado
+# (ligas.dominio), do subdomínio igual ao slug (norte.placar.com.br) ou de
+# ?liga=slug, que fica guardado na sessão; sem nenhum deles, é a principal.
+LIGA_PRINCIPAL = {
+    'id': 1,
+    'slug': 'principal',
+    'nome': 'ZERO 1',
+    'dominio': None,
+    'equipes_divisao_a': EQUIPES_DIVISAO_A
+}
+LIGAS_CACHE_SEGUNDOS = 60
+ARQUIVO_LIGAS = os.path.join(app.instance_path, 'ligas.json')
+_ligas_cache = {'carregado_em': None, 'ligas': None}
+_trava_ligas = threading.Lock()
+
+def obter_ligas():
+    """Ligas cadastradas, relidas do Supabase no máximo a cada LIGAS_CACHE_SEGUNDOS
+
+    Com o Supabase fora fica a última lista boa (deste processo ou a salva
+    em instance/ligas.json), para cada domínio continuar na sua liga e no
+    seu último placar salvo.
+    """
+    with _trava_ligas:
+        carregado_em = _ligas_cache['carregado_em']
+        if carregado_em is not None and time.monotonic() - carregado_em < LIGAS_CACHE_SEGUNDOS:
+            return _ligas_cache['ligas']
+        
+        try:
+            ligas = _executar(supabase.table('ligas').select(COLUNAS['liga']).order('id')).data
+            if ligas != _ligas_cache['ligas']:
+                _salvar_ligas(ligas)
+        except Exception as e:
+            print(f"Erro ao obter ligas: {e}")
+            ligas = _ligas_cache['ligas'] or _carregar_ligas_salvas()
+        
+        _ligas_cache['carregado_em'] = time.monotonic()
+        _ligas_cache['ligas'] = ligas or [LIGA_PRINCIPAL]
+        return _ligas_cache['ligas']
+
+def _salvar_ligas(ligas):
+    try:
+        os.makedirs(app.instance_path, exist_ok=True)
+        temporario = f"{ARQUIVO_LIGAS}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(ligas, f)
+        os.replace(temporario, ARQUIVO_LIGAS)
+    except OSError as e:
+        print(f"Erro ao salvar ligas: {e}")
+
+def _carregar_ligas_salvas():
+    try:
+        with open(ARQUIVO_LIGAS, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def liga_do_host(host):
+    """Liga cujo domínio ou subdomínio (slug) é o host, ou None"""
+    ligas = obter_ligas()
+    host = (host or '').split(':')[0].lower()
+    for liga in ligas:
+        if liga.get('dominio') and liga['dominio'].lower() == host:
+            return liga
+    
+    subdominio = host.split('.')[0]
+    if '.' in host:
+        return next((liga for liga in ligas if liga['slug'] == subdominio), None)
+    return None
+
+def resolver_liga(host, slug=None):
+    """Liga de um host ou, se ele não for de nenhuma, do slug escolhido"""
+    liga = liga_do_host(host)
+    if liga:
+        return liga
+    
+    ligas = obter_ligas()
+    por_slug = {liga['slug']: liga for liga in ligas}
+    if slug in por_slug:
+        return por_slug[slug]
+    return next((liga for liga in ligas if liga['id'] == LIGA_PRINCIPAL['id']), ligas[0])
+
+def liga_atual():
+    """Liga da requisição atual, resolvida na primeira chamada e guardada em g
+
+    Fora de uma requisição (comandos do CLI) vale a liga posta em g.liga
+    pelo comando ou, sem ela, a principal.
+    """
+    if not has_app_context():
+        return LIGA_PRINCIPAL
+    if 'liga' not in g:
+        slug = None
+        if has_request_context():
+            slug = request.args.get('liga')
+            if slug:
+                session['liga'] = slug
+            slug = slug or session.get('liga')
+        g.liga = resolver_liga(request.host if has_request_context() else None, slug)
+    return g.liga
+
+@app.context_processor
+def dados_da_liga():
+    # Quem entra pelo domínio de uma liga fica nela; os demais podem trocar
+    ligas = obter_ligas()
+    pode_trocar = len(ligas) > 1 and not (has_request_context() and liga_do_host(request.host))
+    return {'liga': liga_atual(), 'ligas': ligas if pode_trocar else []}
+
+# Espelho local das leituras (opcional, ver espelho_sqlite.py). Com
+# ESPELHO_SQLITE definido, placar, histórico e relatórios leem do arquivo
+# SQLite; as gravações continuam no Supabase. O placar 2 (ranking por
+# quesito) continua vindo da função placar_ranking_periodo.
+_espelho = None
+_espelho_pid = None
+_trava_espelho = threading.Lock()
+
+def obter_espelho(data_inicio=None):
+    """Espelho pronto para leitura, ou None (desligado ou antes da primeira sincronização)
+
+    Cada processo abre o seu na primeira chamada, com uma thread que
+    sincroniza a cada ESPELHO_INTERVALO_SEGUNDOS (padrão 10). O pid evita
+    usar, depois do fork do gunicorn, um espelho aberto no master.
+    Períodos que começam antes do corte do arquivo (registros arquivados
+    não são copiados) também retornam None e são lidos do Supabase.
+    """
+    global _espelho, _espelho_pid
+    carregar_env()
+    caminho = os.getenv('ESPELHO_SQLITE')
+    if not caminho:
+        return None
+
+    if _espelho is None or _espelho_pid != os.getpid():
+        with _trava_espelho:
+            if _espelho is None or _espelho_pid != os.getpid():
+                from espelho_sqlite import EspelhoSQLite
+                _espelho = EspelhoSQLite(caminho)
+                _espelho_pid = os.getpid()
+                threading.Thread(target=_sincronizar_espelho_periodicamente, args=(_espelho,), daemon=True).start()
+    if not _espelho.pronto:
+        return None
+    if data_inicio:
+        corte = _espelho.corte_arquivo()
+        if corte and str(data_inicio) < corte:
+            return None
+    return _espelho
+
+def _sincronizar_espelho_periodicamente(espelho):
+    intervalo = float(os.getenv('ESPELHO_INTERVALO_SEGUNDOS', '10'))
+    while True:
+        sincronizar_espelho(espelho)
+        time.sleep(intervalo)
+
+def sincronizar_espelho(espelho=None):
+    """Traz para o espelho o que mudou no Supabase
+
+    Também é chamada logo depois de cada gravação, para quem acabou de
+    registrar ver o resultado na próxima página (no mesmo worker).
+    """
+    espelho = espelho or (_espelho if _espelho_pid == os.getpid() else None)
+    if espelho is None:
+        return
+    try:
+        espelho.sincronizar(supabase, _executar)
+    except Exception as e:
+        print(f"Erro ao sincronizar o espelho: {e}")
+
+def pagina_do_espelho(espelho, colunas, cursor=None, limite=REGISTROS_POR_PAGINA, **filtros):
+    """Versão de get_pagina_registros lendo do espelho"""
+    try:
+        chave = decodificar_cursor(cursor) if cursor else None
+    except ValueError:
+        # Cursor inválido: volta para a primeira página
+        chave = None
+    dados = espelho.registros(colunas, cursor=chave, limite=limite + 1, **filtros)
+    return separar_pagina(dados, limite)
+
+class SnapshotPeriodo:
+    """Dados de um período carregados no máximo uma vez por requisição.
+
+    Guarda só o ranking do período (função placar_ranking_periodo): o
+    placar 2, os rankings por quesito e a análise com IA leem daqui em vez
+    de consultar o Supabase cada um por conta própria.
+    """
+
+    def __init__(self, data_inicio, data_fim, liga_id=LIGA_PRINCIPAL['id']):
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self.liga_id = liga_id
+        self._ranking = None
+
+    def _params_ranking(self):
+        return {
+            'p_data_inicio': self.data_inicio,
+            'p_data_fim': self.data_fim,
+            'p_pontos_primeiro': PONTUACAO_RANKING['primeiro_lugar'],
+            'p_pontos_segundo': PONTUACAO_RANKING['segundo_lugar'],
+            'p_pontos_terceiro': PONTUACAO_RANKING['terceiro_lugar'],
+            'p_pontos_demais': PONTUACAO_RANKING['demais_posicoes'],
+            'p_liga_id': self.liga_id
+        }
+
+    @property
+    def ranking(self):
+        """Linhas da função placar_ranking_periodo (equipes + totais + posições)"""
+        if self._ranking is None:
+            response = _executar(supabase.rpc('placar_ranking_periodo', self._params_ranking()))
+            self._ranking = response.data
+        return self._ranking
+
+def get_snapshot_periodo(data_inicio, data_fim):
+    """Obtém o snapshot do período compartilhado pela requisição atual"""
+    liga_id = liga_atual()['id']
+    if not has_app_context():
+        return SnapshotPeriodo(data_inicio, data_fim, liga_id)
+    
+    snapshots = g.setdefault('snapshots_periodo', {})
+    chave = (liga_id, data_inicio, data_fim)
+    if chave not in snapshots:
+        snapshots[chave] = SnapshotPeriodo(data_inicio, data_fim, liga_id)
+    return snapshots[chave]
+
+class CachePlacar:
+    """Cache LRU com validade dos placares calculados (um por processo)
+
+    Os mesmos poucos períodos (semana, mês, temporada) são pedidos o tempo
+    todo pelo placar, pelo placar 2 e pelas TVs. Cada resultado fica
+    guardado por `segundos` sob a chave (função, liga, início, fim), até
+    `maximo` entradas (sai a usada há mais tempo). As gravações chamam
+    invalidar com as datas do registro: só caem os placares gerais e os
+    períodos que se sobrepõem a elas. Guarda e devolve cópias, porque quem
+    chama altera as listas (numerar_equipes).
+    """
+
+    def __init__(self, maximo=128, segundos=30):
+        self.maximo = maximo
+        self.segundos = segundos
+        self.acertos = 0
+        self.faltas = 0
+        self.invalidacoes = 0
+        self._entradas = OrderedDict()
+        # Muda a cada invalidação: um cálculo que começou antes não é guardado
+        self._versao = 0
+        self._trava = threading.Lock()
+
+    @property
+    def versao(self):
+        return self._versao
+
+    def obter(self, chave):
+        """Cópia do valor guardado, ou None se não há (ou venceu)"""
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None or time.monotonic() - entrada[0] >= self.segundos:
+                self._entradas.pop(chave, None)
+                self.faltas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            valor = entrada[1]
+        return copy.deepcopy(valor)
+
+    def guardar(self, chave, valor, versao):
+        """Guarda o valor calculado desde `versao` (descartado se houve invalidação no meio)"""
+        valor = copy.deepcopy(valor)
+        with self._trava:
+            if versao != self._versao:
+                return
+            self._entradas[chave] = (time.monotonic(), valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, liga_id=None, data_inicio=None, data_fim=None):
+        """Descarta os placares afetados por uma gravação
+
+        Sem datas (equipes, reconciliação, importação), todos os da liga (de
+        todas as ligas com liga_id=None); com as datas de um registro, os
+        placares gerais da liga e os períodos que se sobrepõem a elas.
+        """
+        with self._trava:
+            self._versao += 1
+            for chave in list(self._entradas):
+                _, liga, inicio, fim = chave
+                if liga_id is not None and liga != liga_id:
+                    continue
+                if data_inicio and inicio and fim and not (str(data_inicio) <= fim and str(data_fim) >= inicio):
+                    continue
+                del self._entradas[chave]
+                self.invalidacoes += 1
+
+    def status(self):
+        with self._trava:
+            total = self.acertos + self.faltas
+            return {
+                'compartilhado': False,
+                'entradas': len(self._entradas),
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'invalidacoes': self.invalidacoes,
+                'taxa_acerto': round(self.acertos / total, 3) if total else None
+            }
+
+# Cache dos placares do processo. Com PLACAR_CACHE_SQLITE definido, os
+# workers passam a usar um arquivo em comum (ver cache_compartilhado.py).
+_cache_placar = None
+_cache_placar_pid = None
+_trava_cache_placar = threading.Lock()
+
+def obter_cache_placar():
+    """Cache dos placares: em memória (por processo) ou compartilhado entre os workers
+
+    Criado na primeira chamada de cada processo (depois do .env carregado);
+    o pid evita usar, depois do fork do gunicorn, um cache aberto no master.
+    """
+    global _cache_placar, _cache_placar_pid
+    if _cache_placar is None or _cache_placar_pid != os.getpid():
+        with _trava_cache_placar:
+            if _cache_placar is None or _cache_placar_pid != os.getpid():
+                carregar_env()
+                maximo = int(os.getenv('PLACAR_CACHE_ENTRADAS', '128'))
+                segundos = float(os.getenv('PLACAR_CACHE_SEGUNDOS', '30'))
+                caminho = os.getenv('PLACAR_CACHE_SQLITE')
+                if caminho:
+                    from cache_compartilhado import CacheCompartilhado
+                    _cache_placar = CacheCompartilhado(caminho, maximo, segundos)
+                else:
+                    _cache_placar = CachePlacar(maximo, segundos)
+                _cache_placar_pid = os.getpid()
+    return _cache_placar
+
+def chave_cache_placar(nome, data_inicio=None, data_fim=None):
+    return (nome, liga_atual()['id'], str(data_inicio) if data_inicio else None, str(data_fim) if data_fim else None)
+
+class EntradaCachePlacar:
+    """Uma entrada do cache dos placares: lida antes do cálculo, guardada depois
+
+    Usada pelo em_cache_placar e pelo Placar 2 assíncrono, que carrega o
+    snapshot do período antes de montar as equipes. A versão dos dados é
+    lida na falta, antes do cálculo: se houver uma invalidação no meio, o
+    resultado não é guardado. Resultados de uma requisição em que alguma
+    consulta falhou (as funções devolvem listas vazias nesse caso) também não.
+    """
+
+    def __init__(self, nome, data_inicio=None, data_fim=None):
+        self.cache = obter_cache_placar()
+        self.chave = chave_cache_placar(nome, data_inicio, data_fim)
+        self.versao = None
+
+    def obter(self):
+        valor = self.cache.obter(self.chave)
+        if valor is None:
+            self.versao = self.cache.versao
+        return valor
+
+    def guardar(self, valor):
+        if not (has_app_context() and g.get('falha_supabase')):
+            self.cache.guardar(self.chave, valor, self.versao)
+
+def em_cache_placar(funcao):
+    """Passa funcao(data_inicio, data_fim) pelo cache dos placares (ver EntradaCachePlacar)"""
+    @functools.wraps(funcao)
+    def com_cache(data_inicio=None, data_fim=None):
+        entrada = EntradaCachePlacar(funcao.__name__, data_inicio, data_fim)
+        valor = entrada.obter()
+        if valor is None:
+            valor = funcao(data_inicio, data_fim)
+            entrada.guardar(valor)
+        return valor
+    return com_cache
+
+def invalidar_placar(liga_id=None, data_inicio=None, data_fim=None):
+    """Descarta do cache os placares afetados por uma gravação (ver CachePlacar.invalidar)"""
+    obter_cache_placar().invalidar(liga_id, data_inicio, data_fim)
+
+def pontos_por_posicao(posicao):
+    """Pontos do ranking (Placar 2) para uma posição em um quesito"""
+    if posicao == 1:
+        return PONTUACAO_RANKING['primeiro_lugar']
+    elif posicao == 2:
+        return PONTUACAO_RANKING['segundo_lugar']
+    elif posicao == 3:
+        return PONTUACAO_RANKING['terceiro_lugar']
+    return PONTUACAO_RANKING['demais_posicoes']
+
+def divisao_por_posicao(posicao):
+    """Divisão da equipe a partir da sua posição (1 = primeiro lugar) na liga atual"""
+    return 'A' if posicao <= liga_atual()['equipes_divisao_a'] else 'B'
+
+@em_cache_placar
 def get_equipes(data_inicio=None, data_fim=None):
     """Obtém todas as equipes ordenadas por pontuação (total ou por período)"""
     try:
+        espelho = obter_espelho()
         if data_inicio and data_fim:
             # Busca pontuação por período
             equipes = get_equipes_por_periodo(data_inicio, data_fim)
+        elif espelho:
+            equipes = espelho.equipes(liga_atual()['id'])
         else:
             # Busca pontuação total (comportamento original)
-            response = supabase.table('equipes').select('*').order('pontuacao_total', desc=True).execute()
+            response = _executar(supabase.table('equipes').select(COLUNAS['placar']).eq('liga_id', liga_atual()['id'])
+                                 .order('pontuacao_total', desc=True).order('id'))
             equipes = response.data
         
-        # Adiciona divisão baseada na posição
-        for i, equipe in enumerate(equipes):
-            equipe['divisao'] = 'A' if i < 5 else 'B'
-            equipe['posicao'] = i + 1
-        
-        return equipes
+        return numerar_equipes(equipes)
     except Exception as e:
         print(f"Erro ao obter equipes: {e}")
+        _marcar_falha()
         return []
 
+def numerar_equipes(equipes):
+    """Adiciona posição e divisão às equipes, que já vêm ordenadas"""
+    for i, equipe in enumerate(equipes):
+        equipe['divisao'] = divisao_por_posicao(i + 1)
+        equipe['posicao'] = i + 1
+    return equipes
+
+def fuso_horario():
+    """Fuso das datas digitadas no ?as_of= (PLACAR_FUSO_HORARIO, padrão America/Sao_Paulo)"""
+    from zoneinfo import ZoneInfo
+    return ZoneInfo(os.getenv('PLACAR_FUSO_HORARIO', 'America/Sao_Paulo'))
+
+def momento_em_utc(momento):
+    """Instante local (sem fuso = PLACAR_FUSO_HORARIO) em UTC sem fuso, como o NOW() grava no banco"""
+    if momento.tzinfo is None:
+        momento = momento.replace(tzinfo=fuso_horario())
+    return momento.astimezone(timezone.utc).replace(tzinfo=None)
+
+def momento_do_placar(texto):
+    """Instante local pedido em ?as_of= (ISO); só a data vale até o fim daquele dia (ValueError se inválido)"""
+    texto = (texto or '').strip()
+    if len(texto) > 10:
+        try:
+            return datetime.fromisoformat(texto)
+        except ValueError:
+            raise ValueError(f'Data inválida: "{texto}" (use AAAA-MM-DD ou AAAA-MM-DDTHH:MM)')
+    return datetime.combine(_data_importacao(texto, 'Data'), datetime.max.time())
+
+def get_equipes_em(momento):
+    """Placar geral como estava em `momento` (vazio antes do início do histórico)
+
+    O servidor parte do snapshot mais próximo e soma só os eventos de
+    registros posteriores a ele (ver migrations/0015_eventos_registros.sql).
+    data_evento e data_snapshot são gravados em UTC, então o fim do dia local
+    é convertido antes da consulta.
+    """
+    try:
+        response = _executar(supabase.rpc('placar_em', {
+            'p_data': momento_em_utc(momento).isoformat(),
+            'p_liga_id': liga_atual()['id']
+        }))
+        return numerar_equipes(response.data)
+    except Exception as e:
+        print(f"Erro ao obter placar em {momento}: {e}")
+        _marcar_falha()
+        return []
+
+def inicio_do_historico():
+    """Data local do primeiro snapshot da liga, onde começa o ?as_of= (None se não há ou deu erro)
+
+    Nas ligas que já existiam na migração 0015 é a data da migração: os
+    registros anteriores entram no snapshot inicial, sem a data de cada um.
+    """
+    try:
+        response = _executar(
+            supabase.table('placar_snapshots')
+            .select('data_snapshot')
+            .eq('liga_id', liga_atual()['id'])
+            .order('data_snapshot')
+            .limit(1)
+        )
+    except Exception as e:
+        print(f"Erro ao obter o início do histórico: {e}")
+        return None
+    if not response.data:
+        return None
+    inicio = datetime.fromisoformat(response.data[0]['data_snapshot'])
+    return inicio.replace(tzinfo=timezone.utc).astimezone(fuso_horario()).date()
+
+@em_cache_placar
 def get_equipes_por_periodo(data_inicio, data_fim):
     """Obtém equipes com pontuação calculada para um período específico (Placar 1)"""
     try:
-        # Busca todas as equipes
-        response_equipes = supabase.table('equipes').select('*').execute()
-        equipes = response_equipes.data
-        
-        # Para cada equipe, calcula pontuação no período
-        for equipe in equipes:
-            # Busca registros da equipe no período
-            response_registros = supabase.table('registros').select('pontuacao').eq('equipe_id', equipe['id']).gte('data_inicio', data_inicio).lte('data_fim', data_fim).execute()
-            
-            # Soma pontuação do período
-            pontuacao_periodo = sum(registro['pontuacao'] for registro in response_registros.data)
-            equipe['pontuacao_periodo'] = pontuacao_periodo
-            
-            # Conta registros no período
-            equipe['registros_periodo'] = len(response_registros.data)
-        
-        # Ordena por pontuação do período
-        equipes.sort(key=lambda x: x.get('pontuacao_periodo', 0), reverse=True)
-        
-        return equipes
+        espelho = obter_espelho(data_inicio)
+        if espelho:
+            return espelho.placar_periodo(data_inicio, data_fim, liga_atual()['id'])
+        
+        # Agregação feita no servidor (função placar_periodo, ver migrations/0008_placar_periodo.sql):
+        # uma única chamada, independente do número de equipes
+        response = _executar(supabase.rpc('placar_periodo', {
+            'p_data_inicio': data_inicio,
+            'p_data_fim': data_fim,
+            'p_liga_id': liga_atual()['id']
+        }))
+
+        # Já vem ordenado por pontuação do período
+        return response.data
     except Exception as e:
         print(f"Erro ao obter equipes por período: {e}")
+        _marcar_falha()
         return []
 
+@em_cache_placar
 def get_equipes_por_periodo_ranking(data_inicio, data_fim):
     """Obtém equipes com pontuação por ranking para um período específico (Placar 2)"""
     try:
-        # Busca todas as equipes
-        response_equipes = supabase.table('equipes').select('*').execute()
-        equipes = response_equipes.data
-        
-        # Busca todos os registros do período
-        response_registros = supabase.table('registros').select('*').gte('data_inicio', data_inicio).lte('data_fim', data_fim).execute()
-        registros_periodo = response_registros.data
-        
-        # Calcula pontuação por ranking
-        dados_ranking = calcular_pontuacao_ranking(registros_periodo)
-        
-        # Adiciona dados de ranking às equipes
-        for equipe in equipes:
-            equipe_id = equipe['id']
-            if equipe_id in dados_ranking:
-                equipe['pontuacao_ranking'] = dados_ranking[equipe_id]['pontuacao_ranking']
-                equipe['dados_ranking'] = dados_ranking[equipe_id]
-            else:
-                equipe['pontuacao_ranking'] = 0
-                equipe['dados_ranking'] = {
-                    'pessoas_novas': 0, 'celulas_realizadas': 0, 'celulas_elite': 0,
-                    'pessoas_terca': 0, 'pessoas_novas_terca': 0, 'pessoas_arena': 0,
-                    'pessoas_novas_arena': 0, 'pessoas_domingo': 0, 'pessoas_novas_domingo': 0,
-                    'valor_arrecadacao': 0, 'revisao_vidas': 0, 'pontuacao_ranking': 0
-                }
-        
-        # Ordena por pontuação de ranking
-        equipes.sort(key=lambda x: x.get('pontuacao_ranking', 0), reverse=True)
-        
+        # Totais, posições por quesito e pontuação final calculados no servidor
+        # (função placar_ranking_periodo, ver migrations/0009_placar_ranking_periodo.sql)
+        snapshot = get_snapshot_periodo(data_inicio, data_fim)
+        
+        # Monta dados_ranking no mesmo formato usado pelo template
+        equipes = []
+        for linha in snapshot.ranking:
+            equipe = {k: v for k, v in linha.items() if k not in QUESITOS_RANKING}
+            dados_ranking = {quesito: linha[quesito] for quesito in QUESITOS_RANKING}
+            dados_ranking['pontuacao_ranking'] = linha['pontuacao_ranking']
+            equipe['dados_ranking'] = dados_ranking
+            equipes.append(equipe)
+        
+        # Já vem ordenado por pontuação de ranking
         return equipes
     except Exception as e:
         print(f"Erro ao obter equipes por período (ranking): {e}")
+        _marcar_falha()
         return []
 
+@em_cache_placar
 def get_rankings_por_quesito(data_inicio, data_fim):
     """Obtém rankings detalhados por quesito para exibir vencedores"""
     try:
-        # Busca todos os registros do período
-        response_registros = supabase.table('registros').select('*').gte('data_inicio', data_inicio).lte('data_fim', data_fim).execute()
-        registros_periodo = response_registros.data
-        
-        if not registros_periodo:
-            return {}
-        
-        # Busca todas as equipes
-        response_equipes = supabase.table('equipes').select('*').execute()
-        equipes = response_equipes.data
-        equipes_dict = {e['id']: e for e in equipes}
-        
-        # Agrupa registros por equipe
-        dados_por_equipe = {}
-        for registro in registros_periodo:
-            equipe_id = registro['equipe_id']
-            if equipe_id not in dados_por_equipe:
-                dados_por_equipe[equipe_id] = {
-                    'pessoas_novas': 0, 'celulas_realizadas': 0, 'celulas_elite': 0,
-                    'pessoas_terca': 0, 'pessoas_novas_terca': 0, 'pessoas_arena': 0,
-                    'pessoas_novas_arena': 0, 'pessoas_domingo': 0, 'pessoas_novas_domingo': 0,
-                    'valor_arrecadacao': 0, 'revisao_vidas': 0
-                }
-            
-            dados = dados_por_equipe[equipe_id]
-            dados['pessoas_novas'] += registro.get('qtd_pessoas_novas', 0)
-            dados['celulas_realizadas'] += registro.get('qtd_celulas_realizadas', 0)
-            dados['celulas_elite'] += registro.get('qtd_celulas_elite', 0)
-            dados['pessoas_terca'] += registro.get('qtd_pessoas_terca', 0)
-            dados['pessoas_novas_terca'] += registro.get('qtd_pessoas_novas_terca', 0)
-            dados['pessoas_arena'] += registro.get('qtd_pessoas_arena', 0)
-            dados['pessoas_novas_arena'] += registro.get('qtd_pessoas_novas_arena', 0)
-            dados['pessoas_domingo'] += registro.get('qtd_pessoas_domingo', 0)
-            dados['pessoas_novas_domingo'] += registro.get('qtd_pessoas_novas_domingo', 0)
-            dados['valor_arrecadacao'] += registro.get('valor_arrecadacao_parceiro', 0)
-            dados['revisao_vidas'] += registro.get('qtd_revisao_vidas', 0)
+        # Reaproveita o ranking já carregado para o período nesta requisição
+        snapshot = get_snapshot_periodo(data_inicio, data_fim)
+        linhas = snapshot.ranking
         
         # Lista de quesitos para ranking
         quesitos = [
@@ -372,122 +933,132 @@ def get_rankings_por_quesito(data_inicio, data_fim):
         
         rankings = {}
         
-        # Para cada quesito, cria ranking
+        # Para cada quesito, monta os vencedores a partir das posições calculadas no servidor
         for quesito, nome, icone, cor in quesitos:
-            # Ordena equipes por este quesito (maior para menor)
+            # Só equipes com valor > 0 recebem posição no quesito
             ranking_quesito = sorted(
-                [(equipe_id, dados[quesito]) for equipe_id, dados in dados_por_equipe.items()],
-                key=lambda x: x[1],
-                reverse=True
+                [linha for linha in linhas if quesito in (linha.get('posicoes') or {})],
+                key=lambda linha: (linha['posicoes'][quesito], linha['id'])
             )
             
-            # Filtra apenas equipes com valor > 0
-            ranking_quesito = [(equipe_id, valor) for equipe_id, valor in ranking_quesito if valor > 0]
+            if not ranking_quesito:
+                continue
             
-            if ranking_quesito:
-                rankings[quesito] = {
-                    'nome': nome,
-                    'icone': icone,
-                    'cor': cor,
-                    'vencedores': []
-                }
-                
-                # Cria grupos de empate para exibição correta
-                grupos_empate = []
-                grupo_atual = []
-                valor_atual_grupo = None
-                
-                for equipe_id, valor in ranking_quesito:
-                    if valor_atual_grupo is None or valor == valor_atual_grupo:
-                        # Primeira equipe ou empate com o grupo atual
-                        grupo_atual.append((equipe_id, valor))
-                        valor_atual_grupo = valor
-                    else:
-                        # Valor diferente, finaliza grupo atual e inicia novo
-                        grupos_empate.append((valor_atual_grupo, grupo_atual))
-                        grupo_atual = [(equipe_id, valor)]
-                        valor_atual_grupo = valor
-                
-                # Adiciona o último grupo
-                if grupo_atual:
-                    grupos_empate.append((valor_atual_grupo, grupo_atual))
+            rankings[quesito] = {
+                'nome': nome,
+                'icone': icone,
+                'cor': cor,
+                'vencedores': []
+            }
+            
+            # Exibe as 3 primeiras equipes (empatadas dividem a mesma posição)
+            for linha in ranking_quesito[:3]:
+                posicao = linha['posicoes'][quesito]
+                valor = linha[quesito]
                 
-                # Processa grupos para exibir top 3 posições (considerando empates)
-                posicao_atual = 1
-                total_vencedores = 0
+                if quesito == 'valor_arrecadacao':
+                    valor_formatado = f"R$ {float(valor):.2f}"
+                else:
+                    valor_formatado = str(int(valor))
                 
-                for valor_grupo, equipes_grupo in grupos_empate:
-                    if total_vencedores >= 3:
-                        break
-                    
-                    # Determina quantos pontos este grupo recebe
-                    if posicao_atual == 1:
-                        pontos = 5
-                    elif posicao_atual == 2:
-                        pontos = 3
-                    elif posicao_atual == 3:
-                        pontos = 1
-                    else:
-                        pontos = 0
-                    
-                    # Adiciona todas as equipes do grupo empatado
-                    for equipe_id, valor in equipes_grupo:
-                        if total_vencedores >= 3:
-                            break
-                            
-                        equipe = equipes_dict.get(equipe_id, {'nome': 'Desconhecida', 'logo_url': ''})
-                        
-                        if quesito == 'valor_arrecadacao':
-                            valor_formatado = f"R$ {valor:.2f}"
-                        else:
-                            valor_formatado = str(int(valor))
-                        
-                        rankings[quesito]['vencedores'].append({
-                            'posicao': posicao_atual,
-                            'equipe_nome': equipe['nome'],
-                            'equipe_logo': equipe.get('logo_url', ''),
-                            'valor': valor_formatado,
-                            'pontos': pontos
-                        })
-                        
-                        total_vencedores += 1
-                    
-                    # Atualiza posição para o próximo grupo
-                    posicao_atual += len(equipes_grupo)
+                rankings[quesito]['vencedores'].append({
+                    'posicao': posicao,
+                    'equipe_nome': linha['nome'],
+                    'equipe_logo': linha.get('logo_url') or '',
+                    'valor': valor_formatado,
+                    'pontos': pontos_por_posicao(posicao)
+                })
         
         return rankings
     except Exception as e:
         print(f"Erro ao obter rankings por quesito: {e}")
+        _marcar_falha()
         return {}
 
 def get_equipe_by_id(equipe_id):
     """Obtém uma equipe específica pelo ID"""
     try:
-        response = supabase.table('equipes').select('*').eq('id', equipe_id).execute()
-        if response.data:
-            equipe = response.data[0]
-            # Adiciona divisão
-            todas_equipes = get_equipes()
-            for i, e in enumerate(todas_equipes):
-                if e['id'] == equipe['id']:
-                    equipe['divisao'] = 'A' if i < 5 else 'B'
-                    equipe['posicao'] = i + 1
-                    break
+        espelho = obter_espelho()
+        if espelho:
+            equipe = espelho.posicao_equipe(equipe_id)
+        else:
+            # Posição calculada no servidor pelo índice de ranking (ver migrations/0005_posicao_equipe.sql,
+            # por liga desde a 0014), sem carregar e ordenar todas as equipes. A função conta as
+            # equipes à frente no índice: o custo cresce com a posição (não é O(log n)), o que
+            # basta para as dezenas de equipes de uma liga
+            response = _executar(supabase.rpc('posicao_equipe', {'p_equipe_id': equipe_id}))
+            equipe = response.data[0] if response.data else None
+        # Equipes de outra liga não existem para esta
+        if equipe and equipe['liga_id'] == liga_atual()['id']:
+            equipe['divisao'] = divisao_por_posicao(equipe['posicao'])
             return equipe
         return None
     except Exception as e:
         print(f"Erro ao obter equipe: {e}")
         return None
 
+# Diretório de equipes de cada liga (id → nome e logo), para as listas de
+# seleção e para dar nome aos registros sem buscar e ordenar o placar inteiro
+DIRETORIO_EQUIPES_SEGUNDOS = 60
+_diretorio_equipes = {}
+_trava_diretorio_equipes = threading.Lock()
+
+def obter_diretorio_equipes(liga_id=None):
+    """Equipes da liga atual (ou de liga_id) por id: {id: {'id', 'nome', 'logo_url'}}, em ordem alfabética
+
+    Fica em memória e é relido no máximo a cada DIRETORIO_EQUIPES_SEGUNDOS.
+    Cadastrar, editar ou excluir uma equipe descarta o da liga na hora neste
+    processo; nos outros workers a mudança aparece depois desse tempo. Com o
+    Supabase fora continua o último diretório lido. O dicionário é o mesmo
+    para todas as requisições: não altere.
+    """
+    liga_id = liga_id or liga_atual()['id']
+    with _trava_diretorio_equipes:
+        carregado = _diretorio_equipes.get(liga_id)
+        if carregado and time.monotonic() - carregado[0] < DIRETORIO_EQUIPES_SEGUNDOS:
+            return carregado[1]
+        
+        try:
+            espelho = obter_espelho()
+            if espelho:
+                equipes = espelho.equipes(liga_id)
+            else:
+                equipes = _executar(supabase.table('equipes').select(COLUNAS['equipe_diretorio']).eq('liga_id', liga_id)).data
+            diretorio = {
+                equipe['id']: {'id': equipe['id'], 'nome': equipe['nome'], 'logo_url': equipe.get('logo_url')}
+                for equipe in sorted(equipes, key=lambda equipe: (equipe['nome'].lower(), equipe['id']))
+            }
+        except Exception as e:
+            print(f"Erro ao obter diretório de equipes: {e}")
+            if not carregado:
+                return {}
+            diretorio = carregado[1]
+        
+        _diretorio_equipes[liga_id] = (time.monotonic(), diretorio)
+        return diretorio
+
+def invalidar_diretorio_equipes(liga_id):
+    """Descarta o diretório da liga (relido na próxima chamada)"""
+    with _trava_diretorio_equipes:
+        _diretorio_equipes.pop(liga_id, None)
+
+def listar_equipes_para_selecao():
+    """Equipes da liga em ordem alfabética, para os <select> dos formulários"""
+    return list(obter_diretorio_equipes().values())
+
 def criar_equipe(nome, logo_url=None):
     """Cria uma nova equipe com logo opcional"""
     try:
         equipe_data = {
             'nome': nome,
+            'liga_id': liga_atual()['id'],
             'pontuacao_total': 0,
             'logo_url': logo_url or ''
         }
-        response = supabase.table('equipes').insert(equipe_data).execute()
+        response = _executar(supabase.table('equipes').insert(equipe_data))
+        sincronizar_espelho()
+        invalidar_placar(liga_atual()['id'])
+        invalidar_diretorio_equipes(liga_atual()['id'])
         if response.data:
             print(f"✅ Equipe '{nome}' criada com sucesso no Supabase!")
             return True
@@ -496,83 +1067,600 @@ def criar_equipe(nome, logo_url=None):
         print(f"❌ Erro ao criar equipe no Supabase: {e}")
         return False
 
-def atualizar_pontuacao_equipe(equipe_id, pontos_adicionais):
-    """Atualiza a pontuação de uma equipe"""
+def montar_dados_registro(dados):
+    """Monta os campos gravados em registros a partir dos dados do formulário"""
+    return {
+        'equipe_id': dados.get('equipe_id'),
+        'liga_id': liga_atual()['id'],
+        'data_inicio': dados['data_inicio'],
+        'data_fim': dados['data_fim'],
+        'qtd_pessoas': dados.get('qtd_pessoas', 0),
+        'qtd_pessoas_novas': dados.get('qtd_pessoas_novas', 0),
+        'qtd_celulas': dados.get('qtd_celulas', 0),
+        'qtd_celulas_realizadas': dados.get('qtd_celulas_realizadas', 0),
+        'qtd_celulas_elite': dados.get('qtd_celulas_elite', 0),
+        'qtd_pessoas_terca': dados.get('qtd_pessoas_terca', 0),
+        'qtd_pessoas_novas_terca': dados.get('qtd_pessoas_novas_terca', 0),
+        'qtd_pessoas_arena': dados.get('qtd_pessoas_arena', 0),
+        'qtd_pessoas_novas_arena': dados.get('qtd_pessoas_novas_arena', 0),
+        'qtd_pessoas_domingo': dados.get('qtd_pessoas_domingo', 0),
+        'qtd_pessoas_novas_domingo': dados.get('qtd_pessoas_novas_domingo', 0),
+        'valor_arrecadacao_parceiro': dados.get('valor_arrecadacao_parceiro', 0),
+        'qtd_revisao_vidas': dados.get('qtd_revisao_vidas', 0),
+        'pontuacao': calcular_pontuacao(dados)
+    }
+
+# Diário de registros (opcional, ver diario_registros.py). Com
+# DIARIO_REGISTROS definido, criar_registro só anota o registro no arquivo
+# SQLite e responde; o envio ao Supabase é feito em lotes por uma thread.
+TAMANHO_LOTE_DIARIO = 200
+_diario = None
+_diario_pid = None
+_trava_diario = threading.Lock()
+_acordar_envio = threading.Event()
+
+def obter_diario():
+    """Diário de registros do processo, ou None se estiver desligado
+
+    Como o espelho, é aberto por processo na primeira chamada, junto com a
+    thread que envia os pendentes a cada DIARIO_INTERVALO_SEGUNDOS (padrão 5)
+    ou assim que um registro novo é anotado.
+    """
+    global _diario, _diario_pid
+    carregar_env()
+    caminho = os.getenv('DIARIO_REGISTROS')
+    if not caminho:
+        return None
+
+    if _diario is None or _diario_pid != os.getpid():
+        with _trava_diario:
+            if _diario is None or _diario_pid != os.getpid():
+                from diario_registros import DiarioRegistros
+                _diario = DiarioRegistros(caminho)
+                _diario_pid = os.getpid()
+                threading.Thread(target=_enviar_diario_periodicamente, args=(_diario,), daemon=True).start()
+    return _diario
+
+def _enviar_diario_periodicamente(diario):
+    intervalo = float(os.getenv('DIARIO_INTERVALO_SEGUNDOS', '5'))
+    while True:
+        try:
+            # Lotes cheios indicam que ainda há fila: envia o próximo na sequência
+            while enviar_diario(diario) == TAMANHO_LOTE_DIARIO:
+                pass
+            diario.limpar_enviados()
+        except Exception as e:
+            print(f"Erro ao enviar o diário de registros: {e}")
+        _acordar_envio.wait(intervalo)
+        _acordar_envio.clear()
+
+def enviar_diario(diario, limite=TAMANHO_LOTE_DIARIO):
+    """Envia um lote de registros pendentes do diário. Retorna quantos foram enviados"""
+    lote = diario.reservar(limite)
+    if not lote:
+        return 0
+    
+    enviados = _enviar_lote(diario, lote)
+    if enviados:
+        sincronizar_espelho()
+        for _, registro in lote:
+            # Anotados antes das ligas não têm liga_id: vale para todas
+            invalidar_placar(registro.get('liga_id'), registro['data_inicio'], registro['data_fim'])
+    return enviados
+
+def _enviar_lote(diario, lote):
+    chaves = [chave for chave, _ in lote]
     try:
-        # Busca pontuação atual
-        response = supabase.table('equipes').select('pontuacao_total').eq('id', equipe_id).execute()
-        if response.data:
-            pontuacao_atual = response.data[0]['pontuacao_total']
-            nova_pontuacao = pontuacao_atual + pontos_adicionais
-            
-            # Atualiza pontuação
-            supabase.table('equipes').update({
-                'pontuacao_total': nova_pontuacao
-            }).eq('id', equipe_id).execute()
-            return True
-        return False
+        _executar(supabase.rpc('registrar_lote', {
+            'p_registros': [{**registro, 'chave_cliente': chave} for chave, registro in lote]
+        }))
     except Exception as e:
-        print(f"Erro ao atualizar pontuação: {e}")
-        return False
+        if _falha_de_conexao(e):
+            # Supabase fora do ar: tudo volta para a fila e espera a próxima rodada
+            diario.liberar(chaves, str(e))
+            return 0
+        if len(lote) == 1:
+            print(f"⚠️  Registro {chaves[0]} recusado pelo banco: {e}")
+            diario.liberar(chaves, str(e), tentativa=True)
+            return 0
+        # Um registro inválido recusa o lote inteiro: reenvia um a um para separar os bons
+        return sum(_enviar_lote(diario, [item]) for item in lote)
+    
+    diario.marcar_enviados(chaves)
+    return len(lote)
 
 def criar_registro(dados):
     """Cria um novo registro de atividade"""
     try:
-        # Calcula pontuação
-        pontuacao = calcular_pontuacao(dados)
-        
-        # Cria registro
-        response = supabase.table('registros').insert({
-            'equipe_id': dados['equipe_id'],
-            'data_inicio': dados['data_inicio'],
-            'data_fim': dados['data_fim'],
-            'qtd_pessoas': dados.get('qtd_pessoas', 0),
-            'qtd_pessoas_novas': dados.get('qtd_pessoas_novas', 0),
-            'qtd_celulas': dados.get('qtd_celulas', 0),
-            'qtd_celulas_realizadas': dados.get('qtd_celulas_realizadas', 0),
-            'qtd_celulas_elite': dados.get('qtd_celulas_elite', 0),
-            'qtd_pessoas_terca': dados.get('qtd_pessoas_terca', 0),
-            'qtd_pessoas_novas_terca': dados.get('qtd_pessoas_novas_terca', 0),
-            'qtd_pessoas_arena': dados.get('qtd_pessoas_arena', 0),
-            'qtd_pessoas_novas_arena': dados.get('qtd_pessoas_novas_arena', 0),
-            'qtd_pessoas_domingo': dados.get('qtd_pessoas_domingo', 0),
-            'qtd_pessoas_novas_domingo': dados.get('qtd_pessoas_novas_domingo', 0),
-            'valor_arrecadacao_parceiro': dados.get('valor_arrecadacao_parceiro', 0),
-            'qtd_revisao_vidas': dados.get('qtd_revisao_vidas', 0),
-            'pontuacao': pontuacao
-        }).execute()
+        registro = montar_dados_registro(dados)
+        diario = obter_diario()
+        if diario:
+            # Hora do envio do líder, não a do reenvio. Em UTC, como o NOW()
+            # do Supabase grava em data_registro (TIMESTAMP sem fuso)
+            registro['data_registro'] = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+            diario.anotar(registro)
+            _acordar_envio.set()
+            return registro['pontuacao']
+        
+        # Insere o registro e soma a pontuação da equipe em uma única
+        # chamada transacional (ver migrations/0003_registros_atomicos.sql)
+        response = _executar(supabase.rpc('criar_registro_atomico', {'p_registro': registro}))
+        sincronizar_espelho()
+        invalidar_placar(registro['liga_id'], registro['data_inicio'], registro['data_fim'])
         
         if response.data:
-            # Atualiza pontuação da equipe
-            atualizar_pontuacao_equipe(dados['equipe_id'], pontuacao)
-            return pontuacao
+            return registro['pontuacao']
         return False
     except Exception as e:
         print(f"Erro ao criar registro: {e}")
         return False
 
-def get_registros_por_periodo(data_inicio, data_fim, equipe_id=None):
-    """Obtém registros filtrados por período"""
+def get_registro(registro_id, colunas=COLUNAS['registro_edicao']):
+    """Obtém um registro da liga atual pelo ID (None se não existe ou é de outra liga)"""
+    response = _executar(supabase.table('registros').select(colunas).eq('id', registro_id).eq('liga_id', liga_atual()['id']))
+    return response.data[0] if response.data else None
+
+def editar_registro(registro_id, dados):
+    """Atualiza um registro da liga atual e ajusta a pontuação da equipe. Retorna o registro atualizado ou None"""
+    # As datas antigas também saem do cache do placar
+    anterior = get_registro(registro_id, 'data_inicio, data_fim')
+    if not anterior:
+        return None
+    
+    registro = montar_dados_registro(dados)
+    # a equipe (e com ela a liga) do registro não muda na edição
+    del registro['equipe_id']
+    del registro['liga_id']
+    
+    response = _executar(supabase.rpc('editar_registro_atomico', {
+        'p_registro_id': registro_id,
+        'p_registro': registro
+    }))
+    sincronizar_espelho()
+    invalidar_placar(liga_atual()['id'], anterior['data_inicio'], anterior['data_fim'])
+    invalidar_placar(liga_atual()['id'], registro['data_inicio'], registro['data_fim'])
+    return response.data[0] if response.data else None
+
+def excluir_registro(registro_id):
+    """Exclui um registro da liga atual e desconta sua pontuação da equipe. Retorna o registro excluído ou None"""
+    if not get_registro(registro_id, 'id'):
+        return None
+    
+    response = _executar(supabase.rpc('excluir_registro_atomico', {'p_registro_id': registro_id}))
+    sincronizar_espelho()
+    if not response.data:
+        return None
+    
+    registro = response.data[0]
+    invalidar_placar(liga_atual()['id'], registro['data_inicio'], registro['data_fim'])
+    return registro
+
+# Importação em lote (CSV, JSON ou JSONL). As linhas são lidas e validadas
+# uma a uma e enviadas em lotes pela função registrar_lote (ver
+# migrations/0012_registrar_lote.sql): uma chamada por lote, com o total de
+# cada equipe somado uma única vez por lote.
+TAMANHO_LOTE_IMPORTACAO = 500
+
+# Erros listados no resultado (os demais só entram na contagem)
+MAXIMO_ERROS_IMPORTACAO = 100
+
+# Campos inteiros aceitos na importação (os mesmos do formulário)
+CAMPOS_INTEIROS_IMPORTACAO = [
+    'qtd_pessoas', 'qtd_pessoas_novas', 'qtd_celulas', 'qtd_celulas_realizadas', 'qtd_celulas_elite',
+    'qtd_pessoas_terca', 'qtd_pessoas_novas_terca', 'qtd_pessoas_arena', 'qtd_pessoas_novas_arena',
+    'qtd_pessoas_domingo', 'qtd_pessoas_novas_domingo', 'qtd_revisao_vidas'
+]
+
+# A chave de cada linha importada é derivada só do seu conteúdo (equipe,
+# período e quesitos), não da posição no arquivo: importar o arquivo de novo
+# (por exemplo depois de uma falha no meio, ou com linhas incluídas ou
+# removidas) não duplica as linhas que já entraram.
+NAMESPACE_IMPORTACAO = uuid.UUID('6f0d8c52-4a43-4c1e-9a55-2b1f0e7c3d10')
+
+def ler_linhas_importacao(arquivo, formato):
+    """Gera (número da linha, dados) de um arquivo de texto CSV, JSON (lista) ou JSONL
+
+    No CSV o separador pode ser vírgula ou ponto e vírgula (Excel em português).
+    """
+    if formato == 'csv':
+        cabecalho = arquivo.readline()
+        separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+        leitor = csv.DictReader(itertools.chain([cabecalho], arquivo), delimiter=separador)
+        for linha in leitor:
+            yield leitor.line_num, {chave.strip(): valor for chave, valor in linha.items() if chave}
+    elif formato == 'jsonl':
+        for numero, texto in enumerate(arquivo, start=1):
+            if texto.strip():
+                yield numero, json.loads(texto)
+    elif formato == 'json':
+        dados = json.load(arquivo)
+        if not isinstance(dados, list):
+            raise ValueError('O JSON deve ser uma lista de registros')
+        yield from enumerate(dados, start=1)
+    else:
+        raise ValueError(f'Formato não suportado: {formato} (use csv, json ou jsonl)')
+
+def _data_importacao(valor, campo):
+    texto = str(valor or '').strip()
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f'{campo} inválida: "{texto}" (use AAAA-MM-DD ou DD/MM/AAAA)')
+
+def _numero_importacao(valor, campo, tipo):
+    texto = str(valor).strip().replace(',', '.') if valor is not None else ''
+    if not texto:
+        return tipo(0)
+    try:
+        numero = tipo(float(texto)) if tipo is float else int(texto)
+    except ValueError:
+        raise ValueError(f'{campo} inválido: "{valor}"')
+    if numero < 0:
+        raise ValueError(f'{campo} não pode ser negativo')
+    return numero
+
+def validar_linha_importacao(linha, ids_equipes, equipes_por_nome):
+    """Converte uma linha importada nos campos de registros (ValueError se inválida)
+
+    A equipe pode vir por `equipe_id` ou pelo nome em `equipe`.
+    """
+    if not isinstance(linha, dict):
+        raise ValueError('linha não é um objeto')
+
+    if linha.get('equipe_id') not in (None, ''):
+        equipe_id = _numero_importacao(linha['equipe_id'], 'equipe_id', int)
+        if equipe_id not in ids_equipes:
+            raise ValueError(f'equipe_id {equipe_id} não existe')
+    else:
+        nome = str(linha.get('equipe') or '').strip()
+        if not nome:
+            raise ValueError('informe equipe_id ou equipe')
+        equipe_id = equipes_por_nome.get(nome.casefold())
+        if equipe_id is None:
+            raise ValueError(f'equipe "{nome}" não encontrada')
+
+    data_inicio = _data_importacao(linha.get('data_inicio'), 'data_inicio')
+    data_fim = _data_importacao(linha.get('data_fim'), 'data_fim')
+    if data_fim < data_inicio:
+        raise ValueError('data_fim anterior a data_inicio')
+
+    dados = {'equipe_id': equipe_id, 'data_inicio': data_inicio.isoformat(), 'data_fim': data_fim.isoformat()}
+    for campo in CAMPOS_INTEIROS_IMPORTACAO:
+        dados[campo] = _numero_importacao(linha.get(campo), campo, int)
+    dados['valor_arrecadacao_parceiro'] = _numero_importacao(linha.get('valor_arrecadacao_parceiro'), 'valor_arrecadacao_parceiro', float)
+
+    registro = montar_dados_registro(dados)
+    if linha.get('data_registro'):
+        try:
+            registro['data_registro'] = datetime.fromisoformat(str(linha['data_registro']).strip()).isoformat()
+        except ValueError:
+            raise ValueError(f'data_registro inválida: "{linha["data_registro"]}"')
+    return registro
+
+def importar_registros(linhas, validar_apenas=False, tamanho_lote=TAMANHO_LOTE_IMPORTACAO):
+    """Valida e grava registros vindos de ler_linhas_importacao
+
+    Linhas inválidas são puladas e listadas em 'erros' como (linha, mensagem);
+    as válidas são gravadas em lotes de `tamanho_lote`. Com validar_apenas=True
+    nada é gravado. Se o Supabase falhar no meio, os lotes anteriores já
+    ficaram gravados (e o espelho e o cache já os mostram): basta importar
+    o mesmo arquivo de novo. Linhas iguais (mesma equipe, período e
+    quesitos) contam uma vez só, como 'ja_existiam'.
+    """
+    equipes = _executar(supabase.table('equipes').select('id, nome').eq('liga_id', liga_atual()['id'])).data
+    ids_equipes = {equipe['id'] for equipe in equipes}
+    equipes_por_nome = {equipe['nome'].strip().casefold(): equipe['id'] for equipe in equipes}
+
+    resultado = {'linhas': 0, 'validas': 0, 'importadas': 0, 'ja_existiam': 0, 'pontos': 0,
+                 'total_erros': 0, 'erros': []}
+    lote = []
+    chaves = set()
+
+    def enviar():
+        if not validar_apenas:
+            response = _executar(supabase.rpc('registrar_lote', {'p_registros': lote}))
+            inseridas = {str(linha['chave_cliente']) for linha in response.data}
+            resultado['importadas'] += len(inseridas)
+            resultado['ja_existiam'] += len(lote) - len(inseridas)
+            resultado['pontos'] += sum(r['pontuacao'] for r in lote if r['chave_cliente'] in inseridas)
+        lote.clear()
+
+    try:
+        for numero, linha in linhas:
+            resultado['linhas'] += 1
+            try:
+                registro = validar_linha_importacao(linha, ids_equipes, equipes_por_nome)
+            except ValueError as e:
+                resultado['total_erros'] += 1
+                if len(resultado['erros']) < MAXIMO_ERROS_IMPORTACAO:
+                    resultado['erros'].append((numero, str(e)))
+                continue
+
+            resultado['validas'] += 1
+            # Sem data_registro (opcional no arquivo) nem pontuação (calculada pela regra atual)
+            conteudo = {k: v for k, v in registro.items() if k not in ('data_registro', 'pontuacao')}
+            registro['chave_cliente'] = str(uuid.uuid5(NAMESPACE_IMPORTACAO, json.dumps(conteudo, sort_keys=True)))
+            if registro['chave_cliente'] in chaves:
+                resultado['ja_existiam'] += 1
+                continue
+            chaves.add(registro['chave_cliente'])
+            lote.append(registro)
+            if len(lote) >= tamanho_lote:
+                enviar()
+
+        if lote:
+            enviar()
+    finally:
+        # Também quando um lote falha no meio: os anteriores já estão gravados
+        if resultado['importadas']:
+            sincronizar_espelho()
+            invalidar_placar(liga_atual()['id'])
+    return resultado
+
+def query_registros_por_periodo(data_inicio, data_fim, equipe_id=None, colunas=COLUNAS['registro_relatorio'], cliente=None):
+    """Consulta de registros do período, no cliente síncrono ou no assíncrono"""
+    query = ((cliente or supabase).table('registros').select(colunas).eq('liga_id', liga_atual()['id'])
+             .gte('data_inicio', data_inicio).lte('data_fim', data_fim))
+    
+    if equipe_id:
+        query = query.eq('equipe_id', equipe_id)
+    return query
+
+def codificar_cursor(registro):
+    """Cursor da próxima página: (data_registro, id) do último registro exibido"""
+    return f"{registro['data_registro']}|{registro['id']}"
+
+def decodificar_cursor(cursor):
+    """Separa e valida um cursor gerado por codificar_cursor (ValueError se inválido)"""
+    data_registro, _, registro_id = cursor.rpartition('|')
+    datetime.fromisoformat(data_registro)
+    return data_registro, int(registro_id)
+
+def get_pagina_registros(montar_query, cursor=None, limite=REGISTROS_POR_PAGINA):
+    """Obtém uma página de registros, mais recentes primeiro (paginação por chave)
+
+    A página seguinte começa logo depois do (data_registro, id) do cursor, então
+    o custo é o mesmo em qualquer página, não importa o tamanho do histórico.
+    Retorna (registros, proximo_cursor); proximo_cursor é None na última página.
+    """
+    response = _executar(filtrar_pagina(montar_query(), cursor, limite))
+    return separar_pagina(response.data, limite)
+
+def filtrar_pagina(query, cursor=None, limite=REGISTROS_POR_PAGINA):
+    """Aplica o cursor, a ordem e o limite de uma página a uma consulta de registros"""
+    if cursor:
+        try:
+            data_registro, registro_id = decodificar_cursor(cursor)
+            query = query.or_(
+                f'data_registro.lt."{data_registro}",'
+                f'and(data_registro.eq."{data_registro}",id.lt.{registro_id})'
+            )
+        except ValueError:
+            # Cursor inválido: volta para a primeira página
+            pass
+    
+    # Busca um registro a mais só para saber se existe próxima página
+    return query.order('data_registro', desc=True).order('id', desc=True).limit(limite + 1)
+
+def separar_pagina(dados, limite=REGISTROS_POR_PAGINA):
+    """Separa a página do registro extra buscado por filtrar_pagina"""
+    registros = dados[:limite]
+    proximo_cursor = codificar_cursor(registros[-1]) if len(dados) > limite else None
+    return registros, proximo_cursor
+
+def get_pagina_registros_equipe(equipe_id, cursor=None):
+    """Obtém uma página do histórico de uma equipe"""
     try:
-        query = supabase.table('registros').select('*, equipes(nome)').gte('data_inicio', data_inicio).lte('data_fim', data_fim)
+        espelho = obter_espelho()
+        if espelho:
+            return pagina_do_espelho(espelho, COLUNAS['registro_historico'], cursor, equipe_id=equipe_id)
         
-        if equipe_id:
-            query = query.eq('equipe_id', equipe_id)
+        def montar_query():
+            return supabase.table('registros').select(COLUNAS['registro_historico']).eq('equipe_id', equipe_id)
         
-        response = query.order('data_registro', desc=True).execute()
-        return response.data
+        return get_pagina_registros(montar_query, cursor)
+    except Exception as e:
+        print(f"Erro ao obter registros da equipe: {e}")
+        return [], None
+
+def get_pagina_registros_por_periodo(data_inicio, data_fim, equipe_id=None, cursor=None):
+    """Obtém uma página do relatório de registros por período"""
+    try:
+        espelho = obter_espelho(data_inicio)
+        if espelho:
+            return pagina_do_espelho(espelho, COLUNAS['registro_relatorio'], cursor, equipe_id=equipe_id,
+                                     data_inicio=data_inicio, data_fim=data_fim, liga_id=liga_atual()['id'])
+        
+        def montar_query():
+            return query_registros_por_periodo(data_inicio, data_fim, equipe_id)
+        
+        return get_pagina_registros(montar_query, cursor)
     except Exception as e:
         print(f"Erro ao obter registros: {e}")
-        return []
+        return [], None
+
+def iterar_registros_por_periodo(data_inicio, data_fim, equipe_id=None, colunas=COLUNAS['registro_relatorio'],
+                                tamanho_pagina=TAMANHO_PAGINA_REGISTROS):
+    """Gera todos os registros do período, mais recentes primeiro, uma página por vez
+
+    Pagina pela chave (data_registro, id), como o relatório: registros
+    incluídos ou excluídos durante a leitura não fazem pular nem repetir
+    linhas, e só uma página fica em memória. colunas precisa ter id e
+    data_registro (o cursor).
+    """
+    espelho = obter_espelho(data_inicio)
+    cursor = None
+    while True:
+        if espelho:
+            registros, cursor = pagina_do_espelho(espelho, colunas, cursor, tamanho_pagina, equipe_id=equipe_id,
+                                                  data_inicio=data_inicio, data_fim=data_fim, liga_id=liga_atual()['id'])
+        else:
+            query = query_registros_por_periodo(data_inicio, data_fim, equipe_id, colunas)
+            response = _executar(filtrar_pagina(query, cursor, tamanho_pagina))
+            registros, cursor = separar_pagina(response.data, tamanho_pagina)
+        yield from registros
+        
+        if cursor is None:
+            return
 
-def get_registros_equipe(equipe_id):
-    """Obtém registros de uma equipe específica"""
+def get_resumo_registros(equipe_id=None, data_inicio=None, data_fim=None):
+    """Obtém os totais de cabeçalho (registros, pontos, etc.) calculados no servidor"""
     try:
-        response = supabase.table('registros').select('*').eq('equipe_id', equipe_id).order('data_registro', desc=True).execute()
-        return response.data
+        espelho = obter_espelho(data_inicio)
+        if espelho:
+            return espelho.resumo_registros(equipe_id, data_inicio, data_fim, liga_atual()['id'])
+        
+        response = _executar(supabase.rpc('resumo_registros', params_resumo(equipe_id, data_inicio, data_fim)))
+        return response.data[0]
     except Exception as e:
-        print(f"Erro ao obter registros da equipe: {e}")
-        return []
+        print(f"Erro ao obter resumo dos registros: {e}")
+        return resumo_vazio()
+
+def params_resumo(equipe_id=None, data_inicio=None, data_fim=None):
+    """Parâmetros da função resumo_registros (filtros vazios viram NULL)"""
+    return {
+        'p_equipe_id': int(equipe_id) if equipe_id else None,
+        'p_data_inicio': data_inicio,
+        'p_data_fim': data_fim,
+        'p_liga_id': liga_atual()['id']
+    }
+
+def resumo_vazio():
+    """Totais zerados, usados quando o resumo não pode ser obtido"""
+    return {
+        'total_registros': 0,
+        'total_pontos': 0,
+        'total_pessoas_novas': 0,
+        'total_arrecadacao': 0,
+        'total_revisao_vidas': 0,
+        'total_arquivados': 0
+    }
+
+# Consultas assíncronas. Cada worker mantém um event loop em uma thread
+# própria, com um cliente assíncrono do Supabase criado uma vez e ligado a ele
+# (mesmo pool keep-alive do cliente síncrono). As views continuam síncronas e
+# entregam ao loop só as consultas independentes que valem a pena disparar ao
+# mesmo tempo (asyncio.gather): a página espera pela mais lenta, não pela soma.
+_loop_async = None
+_loop_async_pid = None
+_cliente_async = None
+_trava_loop_async = threading.Lock()
+
+async def criar_cliente_supabase_async():
+    """Cria o cliente assíncrono, dentro do loop que vai usá-lo"""
+    import httpx
+    from supabase import acreate_client
+    from supabase.lib.client_options import AsyncClientOptions
+    
+    carregar_env()
+    pool_conexoes = int(os.getenv('SUPABASE_POOL_CONEXOES', '10'))
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_conexoes,
+            max_keepalive_connections=pool_conexoes,
+            keepalive_expiry=float(os.getenv('SUPABASE_KEEPALIVE_SEGUNDOS', '60'))
+        ),
+        http2=True,
+        timeout=timeout_supabase(),
+        follow_redirects=True
+    )
+    return await acreate_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'),
+                                options=AsyncClientOptions(httpx_client=http_client))
+
+def obter_loop_async():
+    """(loop, cliente assíncrono) do processo, criados na primeira chamada
+
+    O pid evita usar, depois do fork do gunicorn, um loop (e a thread dele)
+    criado no master.
+    """
+    global _loop_async, _loop_async_pid, _cliente_async
+    if _loop_async is None or _loop_async_pid != os.getpid():
+        with _trava_loop_async:
+            if _loop_async is None or _loop_async_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True).start()
+                try:
+                    _cliente_async = asyncio.run_coroutine_threadsafe(criar_cliente_supabase_async(), loop).result()
+                except Exception:
+                    loop.call_soon_threadsafe(loop.stop)
+                    raise
+                _loop_async, _loop_async_pid = loop, os.getpid()
+    return _loop_async, _cliente_async
+
+def rodar_async(consultas, tempo_limite=None):
+    """Executa consultas(cliente) no loop do processo e devolve o resultado
+
+    consultas recebe o cliente assíncrono e devolve o que aguardar (uma
+    corrotina ou um asyncio.gather). Roda com o contexto de quem chamou
+    (g, requisição, liga atual); a thread da requisição espera o resultado
+    por até `tempo_limite` segundos (padrão: o dobro de
+    SUPABASE_TIMEOUT_SEGUNDOS). Passado o limite, a tarefa é cancelada e
+    sobe TimeoutError. O loop é um só para todas as requisições do worker:
+    nada de E/S bloqueante (cache, espelho) dentro de consultas.
+    """
+    loop, cliente = obter_loop_async()
+    if tempo_limite is None:
+        tempo_limite = 2 * float(os.getenv('SUPABASE_TIMEOUT_SEGUNDOS', '8'))
+    contexto = contextvars.copy_context()
+    resultado = concurrent.futures.Future()
+    tarefas = []
+    
+    async def executar():
+        return await consultas(cliente)
+    
+    def terminou(tarefa):
+        if resultado.cancelled():
+            return
+        if tarefa.cancelled():
+            resultado.cancel()
+        elif tarefa.exception() is not None:
+            resultado.set_exception(tarefa.exception())
+        else:
+            resultado.set_result(tarefa.result())
+    
+    def iniciar():
+        if resultado.cancelled():
+            # Quem chamou já desistiu antes de o loop chegar aqui
+            return
+        # A tarefa copia o contexto ativo na criação: o da requisição
+        tarefa = contexto.run(loop.create_task, executar())
+        tarefa.add_done_callback(terminou)
+        tarefas.append(tarefa)
+    
+    def cancelar():
+        for tarefa in tarefas:
+            tarefa.cancel()
+    
+    loop.call_soon_threadsafe(iniciar)
+    try:
+        return resultado.result(timeout=tempo_limite)
+    except concurrent.futures.TimeoutError:
+        # iniciar e cancelar rodam na ordem em que foram agendados no loop
+        resultado.cancel()
+        loop.call_soon_threadsafe(cancelar)
+        _marcar_falha()
+        raise TimeoutError(f'Consultas ao Supabase passaram de {tempo_limite:g}s')
+
+async def get_pagina_registros_por_periodo_async(cliente, data_inicio, data_fim, equipe_id=None, cursor=None):
+    """Versão assíncrona de get_pagina_registros_por_periodo (sem espelho)"""
+    try:
+        query = query_registros_por_periodo(data_inicio, data_fim, equipe_id, cliente=cliente)
+        response = await _executar_async(filtrar_pagina(query, cursor))
+        return separar_pagina(response.data)
+    except Exception as e:
+        print(f"Erro ao obter registros: {e}")
+        return [], None
+
+async def get_resumo_registros_async(cliente, equipe_id=None, data_inicio=None, data_fim=None):
+    """Versão assíncrona de get_resumo_registros (sem espelho)"""
+    try:
+        response = await _executar_async(cliente.rpc('resumo_registros', params_resumo(equipe_id, data_inicio, data_fim)))
+        return response.data[0]
+    except Exception as e:
+        print(f"Erro ao obter resumo dos registros: {e}")
+        return resumo_vazio()
 
 def editar_equipe(equipe_id, nome, logo_url=None):
     """Edita o nome e/ou logo de uma equipe"""
@@ -580,7 +1668,10 @@ def editar_equipe(equipe_id, nome, logo_url=None):
         update_data = {'nome': nome, 'data_atualizacao': datetime.now().isoformat()}
         if logo_url is not None:
             update_data['logo_url'] = logo_url
-        response = supabase.table('equipes').update(update_data).eq('id', equipe_id).execute()
+        response = _executar(supabase.table('equipes').update(update_data).eq('id', equipe_id))
+        sincronizar_espelho()
+        invalidar_placar(liga_atual()['id'])
+        invalidar_diretorio_equipes(liga_atual()['id'])
         if response.data:
             print(f"✅ Equipe atualizada no Supabase!")
             return True
@@ -593,13 +1684,128 @@ def excluir_equipe(equipe_id):
     """Exclui uma equipe e todos seus registros"""
     try:
         # O CASCADE na foreign key já remove os registros automaticamente
-        response = supabase.table('equipes').delete().eq('id', equipe_id).execute()
+        response = _executar(supabase.table('equipes').delete().eq('id', equipe_id))
+        sincronizar_espelho()
+        invalidar_placar(liga_atual()['id'])
+        invalidar_diretorio_equipes(liga_atual()['id'])
         return len(response.data) > 0
     except Exception as e:
         print(f"Erro ao excluir equipe: {e}")
         return False
 
+def reconciliar_pontuacao_total(aplicar=False, liga_id=None):
+    """Compara pontuacao_total com a soma real dos registros de cada equipe
+
+    Retorna as equipes divergentes da liga (todas as ligas com liga_id=None).
+    Com aplicar=True corrige todas em um único UPDATE no servidor (ver
+    migrations/0004_reconciliar_pontuacao.sql).
+    """
+    response = _executar(supabase.rpc('reconciliar_pontuacao', {'p_aplicar': aplicar, 'p_liga_id': liga_id}))
+    if aplicar:
+        sincronizar_espelho()
+        invalidar_placar(liga_id)
+    return response.data
+
+def criar_snapshot_placar(liga_id=None):
+    """Grava um snapshot do placar da liga (de todas com liga_id=None)
+
+    Só ligas com eventos desde o último snapshot ganham um novo. Quanto mais
+    recente o snapshot, menos eventos o /placar?as_of= precisa somar (ver
+    migrations/0015_eventos_registros.sql). Retorna os snapshots criados.
+    """
+    response = _executar(supabase.rpc('criar_snapshot_placar', {'p_liga_id': liga_id}))
+    return response.data
+
+# Arquivamento de registros antigos (ver migrations/0013_arquivo_registros.sql)
+TAMANHO_LOTE_ARQUIVAMENTO = 5000
+
+def arquivar_registros(antes_de, tamanho_lote=TAMANHO_LOTE_ARQUIVAMENTO):
+    """Arquiva, em lotes, os registros com data_fim anterior a `antes_de`
+
+    Gera (lote, total movido até agora) a cada lote, até não sobrar nenhum.
+    """
+    total = 0
+    while True:
+        response = _executar(supabase.rpc('arquivar_registros', {
+            'p_antes_de': str(antes_de),
+            'p_limite': tamanho_lote
+        }))
+        movidos = response.data or 0
+        if not movidos:
+            break
+        total += movidos
+        yield movidos, total
+    if total:
+        sincronizar_espelho()
+
+def get_resumos_anuais(equipe_id):
+    """Resumos anuais dos registros arquivados de uma equipe (mais recentes primeiro)"""
+    try:
+        espelho = obter_espelho()
+        if espelho:
+            return espelho.resumos_anuais(equipe_id)
+        
+        response = _executar(supabase.table('registros_ano').select(
+            'ano, qtd_registros, pontuacao, qtd_pessoas_novas, valor_arrecadacao_parceiro, qtd_revisao_vidas'
+        ).eq('equipe_id', equipe_id).order('ano', desc=True))
+        return response.data
+    except Exception as e:
+        print(f"Erro ao obter resumos anuais: {e}")
+        return []
+
 # Rotas Flask
+# Último placar bom de cada página e período, salvo em instance/ultimo_placar/.
+# Se o Supabase falhar (ou o circuito estiver aberto), o telão continua
+# mostrando esses dados, com um aviso, em vez de uma liga vazia.
+PASTA_ULTIMO_PLACAR = os.path.join(app.instance_path, 'ultimo_placar')
+_ultimo_placar_salvo = {}
+
+def _arquivo_ultimo_placar(pagina, data_inicio, data_fim):
+    nome = re.sub(r'[^0-9A-Za-z_-]', '', f"{liga_atual()['slug']}_{pagina}_{data_inicio or 'geral'}_{data_fim or 'geral'}")
+    return os.path.join(PASTA_ULTIMO_PLACAR, f"{nome}.json")
+
+def salvar_ultimo_placar(pagina, data_inicio, data_fim, dados):
+    """Grava os dados de um placar que carregou sem erros (só se mudaram)"""
+    caminho = _arquivo_ultimo_placar(pagina, data_inicio, data_fim)
+    if _ultimo_placar_salvo.get(caminho) == dados:
+        return
+    
+    try:
+        os.makedirs(PASTA_ULTIMO_PLACAR, exist_ok=True)
+        # Grava em um arquivo temporário e troca: quem lê nunca vê meio arquivo
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'salvo_em': datetime.now().isoformat(timespec='seconds'), 'dados': dados}, f, default=str)
+        os.replace(temporario, caminho)
+        _ultimo_placar_salvo[caminho] = dados
+    except OSError as e:
+        print(f"Erro ao salvar último placar: {e}")
+
+def carregar_ultimo_placar(pagina, data_inicio, data_fim):
+    """Último placar salvo ({'salvo_em', 'dados'}) ou None"""
+    try:
+        with open(_arquivo_ultimo_placar(pagina, data_inicio, data_fim), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def com_ultimo_placar_bom(pagina, data_inicio, data_fim, dados):
+    """Guarda os dados como último placar bom ou, se alguma consulta desta
+    requisição falhou, troca pelos últimos salvos
+
+    Retorna (dados, salvo_em); salvo_em só vem preenchido quando os dados
+    são os salvos (desatualizados).
+    """
+    if not g.get('falha_supabase'):
+        salvar_ultimo_placar(pagina, data_inicio, data_fim, dados)
+        return dados, None
+    
+    salvo = carregar_ultimo_placar(pagina, data_inicio, data_fim)
+    if salvo is None:
+        return dados, None
+    print(f"⚠️  Supabase indisponível: exibindo {pagina} salvo em {salvo['salvo_em']}")
+    return salvo['dados'], salvo['salvo_em']
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -611,8 +1817,23 @@ def placar():
     data_fim = request.args.get('data_fim')
     sem_divisoes = request.args.get('sem_divisoes', '0') == '1'
     
-    # Obtém equipes (total ou por período)
-    equipes = get_equipes(data_inicio, data_fim)
+    # ?as_of=: placar geral como estava em uma data
+    as_of = request.args.get('as_of')
+    if as_of:
+        try:
+            momento = momento_do_placar(as_of)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('placar'))
+        data_inicio = data_fim = None
+        equipes, desatualizado_em = com_ultimo_placar_bom('placar_em', momento.isoformat(), None, get_equipes_em(momento))
+        if not equipes and not desatualizado_em:
+            inicio = inicio_do_historico()
+            desde = f' (o histórico começa em {inicio.strftime("%d/%m/%Y")})' if inicio else ''
+            flash(f'Não há histórico do placar em {momento.strftime("%d/%m/%Y")}{desde}.', 'warning')
+    else:
+        # Obtém equipes (total ou por período); com o Supabase fora, o último placar salvo
+        equipes, desatualizado_em = com_ultimo_placar_bom('placar', data_inicio, data_fim, get_equipes(data_inicio, data_fim))
     equipes_a = [e for e in equipes if e.get('divisao') == 'A']
     equipes_b = [e for e in equipes if e.get('divisao') == 'B']
     
@@ -620,7 +1841,9 @@ def placar():
     periodo_info = {
         'data_inicio': data_inicio,
         'data_fim': data_fim,
-        'is_periodo': bool(data_inicio and data_fim)
+        'is_periodo': bool(data_inicio and data_fim),
+        'as_of': as_of,
+        'as_of_formatado': momento.strftime('%d/%m/%Y') if as_of else None
     }
     
     return render_template('placar.html', 
@@ -628,7 +1851,8 @@ def placar():
                          equipes_b=equipes_b,
                          todas_equipes=equipes,
                          sem_divisoes=sem_divisoes,
-                         periodo=periodo_info)
+                         periodo=periodo_info,
+                         desatualizado_em=desatualizado_em)
 
 @app.route('/placar2')
 def placar2():
@@ -643,16 +1867,23 @@ def placar2():
         flash('O Placar 2 requer um período específico para calcular o ranking!', 'warning')
         return render_template('placar2_periodo.html')
     
-    # Obtém equipes com pontuação por ranking
+    # Obtém equipes com pontuação por ranking (uma única consulta, que fica no snapshot)
     equipes = get_equipes_por_periodo_ranking(data_inicio, data_fim)
     
-    # Obtém rankings por quesito
-    rankings_quesitos = get_rankings_por_quesito(data_inicio, data_fim)
+    # Obtém rankings por quesito a partir do mesmo snapshot (se o ranking não
+    # carregou, não tenta de novo)
+    rankings_quesitos = get_rankings_por_quesito(data_inicio, data_fim) if equipes else {}
     
     # Adiciona divisão baseada na posição
-    for i, equipe in enumerate(equipes):
-        equipe['divisao'] = 'A' if i < 5 else 'B'
-        equipe['posicao'] = i + 1
+    numerar_equipes(equipes)
+    
+    # Com o Supabase fora, o último Placar 2 salvo para o período
+    dados, desatualizado_em = com_ultimo_placar_bom('placar2', data_inicio, data_fim, {
+        'equipes': equipes,
+        'rankings_quesitos': rankings_quesitos
+    })
+    equipes = dados['equipes']
+    rankings_quesitos = dados['rankings_quesitos']
     
     equipes_a = [e for e in equipes if e.get('divisao') == 'A']
     equipes_b = [e for e in equipes if e.get('divisao') == 'B']
@@ -670,7 +1901,8 @@ def placar2():
                          todas_equipes=equipes,
                          rankings_quesitos=rankings_quesitos,
                          sem_divisoes=sem_divisoes,
-                         periodo=periodo_info)
+                         periodo=periodo_info,
+                         desatualizado_em=desatualizado_em)
 
 @app.route('/cadastrar_equipe', methods=['GET', 'POST'])
 def cadastrar_equipe():
@@ -717,8 +1949,47 @@ def registrar_atividade():
         
         return redirect(url_for('placar'))
     
-    equipes = get_equipes()
-    return render_template('registrar_atividade.html', equipes=equipes)
+    return render_template('registrar_atividade.html', equipes=listar_equipes_para_selecao())
+
+@app.route('/importar_registros', methods=['GET', 'POST'])
+def importar_registros_route():
+    """Importação de registros de várias equipes e períodos de uma vez
+
+    Aceita um arquivo (campo `arquivo`, .csv, .json ou .jsonl) pelo formulário
+    ou, para scripts, uma lista JSON no corpo da requisição (responde em JSON).
+    """
+    if request.method == 'GET':
+        return render_template('importar_registros.html')
+
+    validar_apenas = request.args.get('validar') == '1' or bool(request.form.get('validar'))
+    if request.is_json:
+        dados = request.get_json()
+        if not isinstance(dados, list):
+            return jsonify({'error': 'O JSON deve ser uma lista de registros'}), 400
+        try:
+            return jsonify(importar_registros(enumerate(dados, start=1), validar_apenas))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    arquivo = request.files.get('arquivo')
+    if not arquivo or not arquivo.filename:
+        flash('Escolha um arquivo CSV, JSON ou JSONL.', 'error')
+        return redirect(url_for('importar_registros_route'))
+
+    formato = arquivo.filename.rsplit('.', 1)[-1].lower()
+    try:
+        # utf-8-sig: o Excel grava o CSV com BOM
+        texto = io.TextIOWrapper(arquivo.stream, encoding='utf-8-sig', newline='')
+        resultado = importar_registros(ler_linhas_importacao(texto, formato), validar_apenas)
+    except (ValueError, UnicodeDecodeError) as e:
+        flash(f'Arquivo inválido: {e}', 'error')
+        return redirect(url_for('importar_registros_route'))
+    except Exception as e:
+        flash(f'Erro ao importar (as linhas já gravadas não se repetem ao importar de novo): {e}', 'error')
+        return redirect(url_for('importar_registros_route'))
+
+    return render_template('importar_registros.html', resultado=resultado, validar_apenas=validar_apenas,
+                           nome_arquivo=arquivo.filename)
 
 @app.route('/placar_periodo', methods=['POST'])
 def placar_periodo():
@@ -738,21 +2009,38 @@ def placar2_periodo():
 
 @app.route('/relatorios')
 def relatorios():
-    equipes = get_equipes()
-    return render_template('relatorios.html', equipes=equipes)
+    return render_template('relatorios.html', equipes=listar_equipes_para_selecao())
 
-@app.route('/relatorio_periodo', methods=['POST'])
+@app.route('/relatorio_periodo', methods=['GET', 'POST'])
 def relatorio_periodo():
-    data_inicio = request.form['data_inicio']
-    data_fim = request.form['data_fim']
-    equipe_id = request.form.get('equipe_id')
+    # GET é usado pelos links de paginação (mesmos campos do formulário + cursor)
+    data_inicio = request.values['data_inicio']
+    data_fim = request.values['data_fim']
+    equipe_id = request.values.get('equipe_id')
+    cursor = request.values.get('cursor')
     
-    registros = get_registros_por_periodo(data_inicio, data_fim, equipe_id)
-    equipes = get_equipes()
+    if obter_espelho(data_inicio):
+        # Leitura local: não há rede para esperar
+        registros, proximo_cursor = get_pagina_registros_por_periodo(data_inicio, data_fim, equipe_id, cursor)
+        resumo = get_resumo_registros(equipe_id, data_inicio, data_fim)
+    else:
+        # Página e totais são independentes: buscados ao mesmo tempo
+        try:
+            (registros, proximo_cursor), resumo = rodar_async(lambda cliente: asyncio.gather(
+                get_pagina_registros_por_periodo_async(cliente, data_inicio, data_fim, equipe_id, cursor),
+                get_resumo_registros_async(cliente, equipe_id, data_inicio, data_fim)
+            ))
+        except TimeoutError as e:
+            print(f"Erro ao obter o relatório: {e}")
+            (registros, proximo_cursor), resumo = ([], None), resumo_vazio()
+    nomes_equipes = {equipe_id: equipe['nome'] for equipe_id, equipe in obter_diretorio_equipes().items()}
     
     return render_template('relatorio_resultado.html', 
                          registros=registros, 
-                         equipes=equipes,
+                         resumo=resumo,
+                         proximo_cursor=proximo_cursor,
+                         pagina_inicial=not cursor,
+                         nomes_equipes=nomes_equipes,
                          data_inicio=datetime.strptime(data_inicio, '%Y-%m-%d').date(),
                          data_fim=datetime.strptime(data_fim, '%Y-%m-%d').date(),
                          equipe_selecionada=equipe_id)
@@ -760,8 +2048,7 @@ def relatorio_periodo():
 @app.route('/analise_ia')
 def analise_ia():
     """Página de análise com IA"""
-    equipes = get_equipes()
-    return render_template('analise_ia.html', equipes=equipes)
+    return render_template('analise_ia.html', equipes=listar_equipes_para_selecao())
 
 @app.route('/gerar_analise_ia', methods=['POST'])
 def gerar_analise_ia():
@@ -774,24 +2061,21 @@ def gerar_analise_ia():
         ocultar_posicoes = request.form.get('ocultar_posicoes') == '1'
         tipo_placar = request.form.get('tipo_placar', 'placar1')  # placar1 ou placar2
         
-        # Busca dados
-        registros = get_registros_por_periodo(data_inicio, data_fim, equipe_id)
+        # Placar 1 soma os pontos dos registros: das equipes só precisa do nome
+        # e do logo, que vêm do diretório. O Placar 2 precisa do ranking do período.
+        equipes = get_equipes_por_periodo_ranking(data_inicio, data_fim) if tipo_placar == 'placar2' else []
+        # Registros (só as colunas da análise) agregados conforme as páginas chegam
+        registros = iterar_registros_por_periodo(data_inicio, data_fim, equipe_id, COLUNAS['registro_analise'])
         
-        # Busca equipes baseado no tipo de placar
-        if tipo_placar == 'placar2':
-            equipes = get_equipes_por_periodo_ranking(data_inicio, data_fim)
-        else:
-            equipes = get_equipes(data_inicio, data_fim)
+        # Prepara dados para análise
+        analise_html = gerar_analise_com_ia(registros, equipes, tipo_analise, data_inicio, data_fim, ocultar_posicoes, tipo_placar)
         
-        if not registros:
+        if analise_html is None:
             return jsonify({
                 'success': False,
                 'error': 'Nenhum registro encontrado para o período selecionado'
             })
         
-        # Prepara dados para análise
-        analise_html = gerar_analise_com_ia(registros, equipes, tipo_analise, data_inicio, data_fim, ocultar_posicoes, tipo_placar)
-        
         return jsonify({
             'success': True,
             'html': analise_html
@@ -805,11 +2089,21 @@ def gerar_analise_ia():
         })
 
 def gerar_analise_com_ia(registros, equipes, tipo_analise, data_inicio, data_fim, ocultar_posicoes=False, tipo_placar='placar1'):
-    """Gera análise usando IA gratuita (Groq API)"""
+    """Gera análise usando IA gratuita (Groq API)
+
+    registros é percorrido uma única vez, conforme chega (vem de
+    iterar_registros_por_periodo, uma página por vez). equipes é o Placar 2
+    do período (pontuacao_ranking de cada equipe) e fica vazio no Placar 1;
+    nome e logo vêm do diretório de equipes. Retorna None quando não há
+    nenhum registro no período.
+    """
     
     # Agrupa dados por equipe
     dados_por_equipe = {}
     rankings_detalhados = {}
+    diretorio = obter_diretorio_equipes()
+    # Placar 2: pontos do ranking do período de cada equipe
+    pontos_ranking = {equipe['id']: equipe.get('pontuacao_ranking', 0) for equipe in equipes}
     
     # Para Placar 2, obtém rankings detalhados
     if tipo_placar == 'placar2':
@@ -818,15 +2112,12 @@ def gerar_analise_com_ia(registros, equipes, tipo_analise, data_inicio, data_fim
     for registro in registros:
         equipe_id = registro['equipe_id']
         if equipe_id not in dados_por_equipe:
-            equipe_info = next((e for e in equipes if e['id'] == equipe_id), None)
+            equipe_info = diretorio.get(equipe_id)
             equipe_nome = equipe_info['nome'] if equipe_info else 'Desconhecida'
-            equipe_logo = equipe_info.get('logo_url', '') if equipe_info else ''
+            equipe_logo = (equipe_info['logo_url'] or '') if equipe_info else ''
             
             # Para Placar 2, usa pontuação por ranking
-            if tipo_placar == 'placar2' and equipe_info:
-                total_pontos = equipe_info.get('pontuacao_ranking', 0)
-            else:
-                total_pontos = 0
+            total_pontos = pontos_ranking.get(equipe_id, 0) if tipo_placar == 'placar2' else 0
             
             dados_por_equipe[equipe_id] = {
                 'nome': equipe_nome,
@@ -866,6 +2157,9 @@ def gerar_analise_com_ia(registros, equipes, tipo_analise, data_inicio, data_fim
         dados['revisao_vidas'] += registro.get('qtd_revisao_vidas', 0)
         dados['registros_count'] += 1
     
+    if not dados_por_equipe:
+        return None
+    
     # Para Placar 2, identifica vitórias de cada equipe
     if tipo_placar == 'placar2' and rankings_detalhados:
         for equipe_id, dados in dados_por_equipe.items():
@@ -890,6 +2184,7 @@ def gerar_analise_com_ia(registros, equipes, tipo_analise, data_inicio, data_fim
 def gerar_analise_local(dados_por_equipe, tipo_analise, data_inicio, data_fim, ocultar_posicoes=False, tipo_placar='placar1'):
     """Gera análise inteligente local (sem API externa)"""
     
+    vagas_divisao_a = liga_atual()['equipes_divisao_a']
     sistema_pontuacao = "Sistema de Ranking (Placar 2)" if tipo_placar == 'placar2' else "Sistema Tradicional (Placar 1)"
     
     html = f"""
@@ -943,13 +2238,13 @@ def gerar_analise_local(dados_por_equipe, tipo_analise, data_inicio, data_fim, o
             
             # Determinar posição e divisão
             posicao = idx
-            divisao = "A" if posicao <= 5 else "B"
+            divisao = divisao_por_posicao(posicao)
             medal = '🥇' if posicao == 1 else ('🥈' if posicao == 2 else ('🥉' if posicao == 3 else ''))
             
-            # Calcular diferença para top 5 (sempre, para uso posterior)
+            # Calcular diferença para a Divisão A (sempre, para uso posterior)
             diff_para_top5 = 0
-            if posicao > 5 and len(ranking_list) >= 5:
-                diff_para_top5 = ranking_list[4][1]['total_pontos'] - dados['total_pontos']
+            if 0 < vagas_divisao_a < posicao:
+                diff_para_top5 = ranking_list[vagas_divisao_a - 1][1]['total_pontos'] - dados['total_pontos']
             
             # Análise de posição (oculta se modo surpresa ativado)
             if ocultar_posicoes:
@@ -959,8 +2254,8 @@ def gerar_analise_local(dados_por_equipe, tipo_analise, data_inicio, data_fim, o
                     explicacao_posicao = f"🏆 <strong>Líder Absoluto!</strong> A equipe {dados['nome']} conquistou o 1º lugar com <strong>{dados['total_pontos']} pontos</strong>, demonstrando excelência em todas as áreas."
                 elif posicao <= 3:
                     explicacao_posicao = f"{medal} <strong>Pódio Garantido!</strong> A equipe está em <strong>{posicao}º lugar</strong> na Divisão A com <strong>{dados['total_pontos']} pontos</strong>, mostrando desempenho excepcional."
-                elif posicao <= 5:
-                    explicacao_posicao = f"⭐ <strong>Divisão A!</strong> A equipe está em <strong>{posicao}º lugar</strong> entre as top 5, com <strong>{dados['total_pontos']} pontos</strong>. Continue assim para manter a posição!"
+                elif posicao <= vagas_divisao_a:
+                    explicacao_posicao = f"⭐ <strong>Divisão A!</strong> A equipe está em <strong>{posicao}º lugar</strong> entre as top {vagas_divisao_a}, com <strong>{dados['total_pontos']} pontos</strong>. Continue assim para manter a posição!"
                 else:
                     explicacao_posicao = f"🎯 <strong>Divisão B</strong> - Posição <strong>{posicao}º</strong> com <strong>{dados['total_pontos']} pontos</strong>. Faltam apenas <strong>{diff_para_top5} pontos</strong> para alcançar a Divisão A!"
             
@@ -1113,7 +2408,7 @@ def gerar_analise_local(dados_por_equipe, tipo_analise, data_inicio, data_fim, o
             if not ocultar_posicoes:
                 if posicao == 1:
                     recomendacoes.append("🏆 Manter o ritmo e servir de exemplo para outras equipes")
-                elif posicao > 5 and diff_para_top5 > 0:
+                elif posicao > vagas_divisao_a and diff_para_top5 > 0:
                     recomendacoes.append(f"🎯 Foco total nos próximos {diff_para_top5} pontos para alcançar Divisão A")
             
             if not pontos_fortes:
@@ -1133,8 +2428,8 @@ def gerar_analise_local(dados_por_equipe, tipo_analise, data_inicio, data_fim, o
                 card_bg = 'bg-primary'
                 card_text = 'text-white'
             else:
-                card_bg = 'bg-warning' if posicao <= 3 else ('bg-success' if posicao <= 5 else 'bg-light')
-                card_text = 'text-white' if posicao <= 5 else 'text-dark'
+                card_bg = 'bg-warning' if posicao <= 3 else ('bg-success' if posicao <= vagas_divisao_a else 'bg-light')
+                card_text = 'text-white' if posicao <= vagas_divisao_a else 'text-dark'
             
             # Wrapper do carousel APENAS se modo surpresa ativo
             carousel_item_start = f'<div class="carousel-item {"active" if idx == 1 else ""}">' if usar_carousel else ''
@@ -1142,19 +2437,19 @@ def gerar_analise_local(dados_por_equipe, tipo_analise, data_inicio, data_fim, o
             
             html += f"""
             {carousel_item_start}
-            <div class="card mb-4 border-{'' if posicao <= 5 and not ocultar_posicoes else 'secondary'}">
+            <div class="card mb-4 border-{'' if posicao <= vagas_divisao_a and not ocultar_posicoes else 'secondary'}">
                 <div class="card-header {card_bg} {card_text}">
                     <h5 class="mb-0 d-flex align-items-center {'justify-content-center' if ocultar_posicoes else 'justify-content-between'}">
                         <span class="d-flex align-items-center">
                             {logo_html}
                             {'' if ocultar_posicoes else medal} {dados['nome']}
                         </span>
-                        {'' if ocultar_posicoes else f'<span class="badge {"bg-light text-dark" if posicao <= 5 else "bg-success"}">Divisão {divisao} - {dados["total_pontos"]} pts</span>'}
+                        {'' if ocultar_posicoes else f'<span class="badge {"bg-light text-dark" if posicao <= vagas_divisao_a else "bg-success"}">Divisão {divisao} - {dados["total_pontos"]} pts</span>'}
                     </h5>
                 </div>
                 <div class="card-body">
                     <!-- Explicação da Posição -->
-                    <div class="alert alert-{'success' if posicao <= 5 else 'info'} mb-3">
+                    <div class="alert alert-{'success' if posicao <= vagas_divisao_a else 'info'} mb-3">
                         <h6 class="alert-heading"><i class="fas fa-map-marked-alt"></i> Por que esta posição?</h6>
                         <p class="mb-0">{explicacao_posicao}</p>
                     </div>
@@ -1420,22 +2715,23 @@ def historico_equipe(equipe_id):
         flash('Equipe não encontrada!', 'error')
         return redirect(url_for('placar'))
     
-    registros = get_registros_equipe(equipe_id)
-    return render_template('historico.html', equipe=equipe, registros=registros)
+    cursor = request.args.get('cursor')
+    registros, proximo_cursor = get_pagina_registros_equipe(equipe_id, cursor)
+    resumo = get_resumo_registros(equipe_id=equipe_id)
+    resumos_anuais = get_resumos_anuais(equipe_id) if resumo.get('total_arquivados') else []
+    
+    return render_template('historico.html',
+                         equipe=equipe,
+                         registros=registros,
+                         resumo=resumo,
+                         resumos_anuais=resumos_anuais,
+                         proximo_cursor=proximo_cursor,
+                         pagina_inicial=not cursor)
 
 @app.route('/editar_registro/<int:registro_id>', methods=['GET', 'POST'])
 def editar_registro_route(registro_id):
     """Rota para editar um registro"""
     try:
-        # Busca o registro
-        response = supabase.table('registros').select('*').eq('id', registro_id).execute()
-        if not response.data:
-            flash('Registro não encontrado!', 'error')
-            return redirect(url_for('placar'))
-        
-        registro = response.data[0]
-        equipe = get_equipe_by_id(registro['equipe_id'])
-        
         if request.method == 'POST':
             # Atualiza os dados
             dados_atualizados = {
@@ -1456,26 +2752,23 @@ def editar_registro_route(registro_id):
                 'qtd_revisao_vidas': int(request.form.get('qtd_revisao_vidas', 0))
             }
             
-            # Recalcula pontuação
-            nova_pontuacao = calcular_pontuacao(dados_atualizados)
-            dados_atualizados['pontuacao'] = nova_pontuacao
-            
-            # Pontuação antiga
-            pontuacao_antiga = registro['pontuacao']
-            diferenca = nova_pontuacao - pontuacao_antiga
+            # Atualiza registro e pontuação total da equipe em uma única chamada
+            registro = editar_registro(registro_id, dados_atualizados)
+            if not registro:
+                flash('Registro não encontrado!', 'error')
+                return redirect(url_for('placar'))
             
-            # Atualiza registro
-            supabase.table('registros').update(dados_atualizados).eq('id', registro_id).execute()
-            
-            # Atualiza pontuação total da equipe
-            equipe_response = supabase.table('equipes').select('pontuacao_total').eq('id', registro['equipe_id']).execute()
-            if equipe_response.data:
-                nova_pontuacao_total = equipe_response.data[0]['pontuacao_total'] + diferenca
-                supabase.table('equipes').update({'pontuacao_total': nova_pontuacao_total}).eq('id', registro['equipe_id']).execute()
-            
-            flash(f'Registro atualizado! Nova pontuação: {nova_pontuacao}', 'success')
+            flash(f'Registro atualizado! Nova pontuação: {registro["pontuacao"]}', 'success')
             return redirect(url_for('historico_equipe', equipe_id=registro['equipe_id']))
         
+        # Busca o registro
+        registro = get_registro(registro_id)
+        if not registro:
+            flash('Registro não encontrado!', 'error')
+            return redirect(url_for('placar'))
+        
+        equipe = get_equipe_by_id(registro['equipe_id'])
+        
         return render_template('editar_registro.html', registro=registro, equipe=equipe)
     
     except Exception as e:
@@ -1487,53 +2780,219 @@ def editar_registro_route(registro_id):
 def excluir_registro_route(registro_id):
     """Rota para excluir um registro"""
     try:
-        # Busca o registro
-        response = supabase.table('registros').select('*').eq('id', registro_id).execute()
-        if not response.data:
+        # Exclui o registro e subtrai a pontuação da equipe em uma única chamada
+        registro = excluir_registro(registro_id)
+        if not registro:
             flash('Registro não encontrado!', 'error')
             return redirect(url_for('placar'))
         
-        registro = response.data[0]
-        equipe_id = registro['equipe_id']
-        pontuacao = registro['pontuacao']
-        
-        # Exclui o registro
-        supabase.table('registros').delete().eq('id', registro_id).execute()
-        
-        # Atualiza pontuação da equipe (subtrai)
-        equipe_response = supabase.table('equipes').select('pontuacao_total').eq('id', equipe_id).execute()
-        if equipe_response.data:
-            nova_pontuacao_total = max(0, equipe_response.data[0]['pontuacao_total'] - pontuacao)
-            supabase.table('equipes').update({'pontuacao_total': nova_pontuacao_total}).eq('id', equipe_id).execute()
-        
         flash('Registro excluído com sucesso!', 'success')
-        return redirect(url_for('historico_equipe', equipe_id=equipe_id))
+        return redirect(url_for('historico_equipe', equipe_id=registro['equipe_id']))
     
     except Exception as e:
         print(f"Erro ao excluir registro: {e}")
         flash('Erro ao excluir registro.', 'error')
         return redirect(url_for('placar'))
 
+@app.route('/admin/reconciliar_pontuacao', methods=['GET', 'POST'])
+def reconciliar_pontuacao_route():
+    """Relatório de divergências de pontuação (GET) ou correção (POST)"""
+    aplicar = request.method == 'POST'
+    try:
+        divergencias = reconciliar_pontuacao_total(aplicar, liga_atual()['id'])
+        return jsonify({
+            'success': True,
+            'aplicado': aplicar,
+            'equipes_divergentes': len(divergencias),
+            'divergencias': divergencias
+        })
+    except Exception as e:
+        print(f"Erro ao reconciliar pontuação: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def definir_liga_do_comando(slug):
+    """Define a liga dos comandos do CLI (opção --liga; sem ela, a principal)"""
+    ligas = obter_ligas()
+    if slug is None:
+        g.liga = resolver_liga(None)
+    else:
+        g.liga = next((liga for liga in ligas if liga['slug'] == slug), None)
+        if g.liga is None:
+            raise click.BadParameter(f"liga '{slug}' não existe (cadastradas: {', '.join(l['slug'] for l in ligas)})",
+                                     param_hint='--liga')
+    return g.liga
+
+@app.cli.command('reconciliar-pontuacao')
+@click.option('--aplicar', is_flag=True, help='Corrige as divergências (sem a opção, apenas relata).')
+@click.option('--liga', help='Slug da liga (padrão: todas).')
+def reconciliar_pontuacao_command(aplicar, liga):
+    """Reconcilia equipes.pontuacao_total com a soma dos registros"""
+    liga_id = definir_liga_do_comando(liga)['id'] if liga else None
+    divergencias = reconciliar_pontuacao_total(aplicar, liga_id)
+    
+    if not divergencias:
+        print("✅ Nenhuma divergência encontrada.")
+        return
+    
+    for d in divergencias:
+        print(f"{'🔧' if aplicar else '⚠️ '} {d['nome']} (id {d['equipe_id']}): "
+              f"armazenado {d['pontuacao_armazenada']} → real {d['pontuacao_real']} ({d['diferenca']:+d})")
+    
+    if aplicar:
+        print(f"✅ {len(divergencias)} equipe(s) corrigida(s).")
+    else:
+        print(f"📋 {len(divergencias)} equipe(s) divergente(s). Use --aplicar para corrigir.")
+
+@app.cli.command('snapshot-placar')
+@click.option('--liga', help='Slug da liga (padrão: todas).')
+def snapshot_placar_command(liga):
+    """Grava um snapshot do placar (base do /placar?as_of=; rode uma vez por dia)"""
+    liga_id = definir_liga_do_comando(liga)['id'] if liga else None
+    criados = criar_snapshot_placar(liga_id)
+    
+    if not criados:
+        print("✅ Nenhum evento desde o último snapshot.")
+        return
+    
+    nomes = {l['id']: l['nome'] for l in obter_ligas()}
+    for snapshot in criados:
+        print(f"📸 {nomes.get(snapshot['liga_id'], snapshot['liga_id'])}: snapshot {snapshot['snapshot_id']} "
+              f"({snapshot['eventos']} evento(s) desde o anterior)")
+
+@app.cli.command('importar-registros')
+@click.argument('arquivo', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--formato', type=click.Choice(['csv', 'json', 'jsonl']),
+              help='Formato do arquivo (padrão: pela extensão).')
+@click.option('--validar', is_flag=True, help='Só valida as linhas, sem gravar nada.')
+@click.option('--liga', help='Slug da liga das equipes (padrão: a principal).')
+def importar_registros_command(arquivo, formato, validar, liga):
+    """Importa registros de um arquivo CSV, JSON ou JSONL"""
+    print(f"🏆 Liga: {definir_liga_do_comando(liga)['nome']}")
+    formato = formato or arquivo.name.rsplit('.', 1)[-1].lower()
+    inicio = time.perf_counter()
+    resultado = importar_registros(ler_linhas_importacao(arquivo, formato), validar_apenas=validar)
+    
+    for numero, mensagem in resultado['erros']:
+        print(f"❌ Linha {numero}: {mensagem}")
+    if resultado['total_erros'] > len(resultado['erros']):
+        print(f"   ... e mais {resultado['total_erros'] - len(resultado['erros'])} erro(s)")
+    
+    print(f"📋 {resultado['linhas']} linha(s) lida(s), {resultado['validas']} válida(s), "
+          f"{resultado['total_erros']} com erro ({time.perf_counter() - inicio:.1f}s)")
+    if validar:
+        print("🔎 Apenas validação: nada foi gravado.")
+    else:
+        print(f"✅ {resultado['importadas']} registro(s) importado(s), {resultado['pontos']} ponto(s); "
+              f"{resultado['ja_existiam']} já existiam.")
+
+@app.cli.command('arquivar-registros')
+@click.option('--antes-de', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Arquiva registros com data_fim anterior a esta data (AAAA-MM-DD).')
+@click.option('--anos', type=int, default=2, show_default=True,
+              help='Sem --antes-de: quantos anos manter (o atual conta), arquivando desde 1º de janeiro.')
+@click.option('--lote', type=int, default=TAMANHO_LOTE_ARQUIVAMENTO, show_default=True,
+              help='Registros movidos por chamada.')
+def arquivar_registros_command(antes_de, anos, lote):
+    """Move registros antigos para o arquivo, mantendo os resumos anuais"""
+    corte = antes_de.date() if antes_de else date(date.today().year - anos + 1, 1, 1)
+    print(f"📦 Arquivando registros com data_fim antes de {corte.strftime('%d/%m/%Y')}...")
+    
+    total = 0
+    for movidos, total in arquivar_registros(corte, lote):
+        print(f"   {movidos} registro(s) movido(s) ({total} no total)")
+    
+    if total:
+        print(f"✅ {total} registro(s) arquivado(s). Os totais e placares continuam os mesmos.")
+    else:
+        print("✅ Nenhum registro para arquivar.")
+
+@app.cli.command('configurar-liga')
+@click.argument('slug')
+@click.option('--nome', help='Nome exibido no placar (obrigatório ao criar).')
+@click.option('--dominio', help='Domínio que abre esta liga (ex.: norte.placar.com.br).')
+@click.option('--divisao-a', type=click.IntRange(min=0),
+              help=f'Equipes na Divisão A (padrão ao criar: {EQUIPES_DIVISAO_A}).')
+def configurar_liga_command(slug, nome, dominio, divisao_a):
+    """Cria uma liga ou altera o nome, domínio ou Divisão A de uma existente"""
+    if not re.fullmatch(r'[a-z0-9-]+', slug):
+        raise click.BadParameter('use só letras minúsculas, números e hífen', param_hint='SLUG')
+    
+    dados = {'nome': nome, 'dominio': dominio, 'equipes_divisao_a': divisao_a}
+    dados = {campo: valor for campo, valor in dados.items() if valor is not None}
+    existente = _executar(supabase.table('ligas').select('id').eq('slug', slug)).data
+    if existente:
+        if not dados:
+            raise click.UsageError('Nada para alterar: informe --nome, --dominio ou --divisao-a.')
+        _executar(supabase.table('ligas').update(dados).eq('slug', slug))
+        print(f"✅ Liga '{slug}' atualizada.")
+    else:
+        if not nome:
+            raise click.UsageError('Informe --nome para criar a liga.')
+        _executar(supabase.table('ligas').insert({'slug': slug, 'equipes_divisao_a': EQUIPES_DIVISAO_A, **dados}))
+        print(f"✅ Liga '{slug}' criada. Os servidores passam a vê-la em até {LIGAS_CACHE_SEGUNDOS}s.")
+
+# Health checks. /status/live só diz que o processo responde (é o que o
+# Render consulta a cada poucos segundos); /status/ready e /status também
+# verificam o Supabase, com um HEAD + count=exact que não baixa nenhuma
+# linha e cujo resultado fica em cache por STATUS_CACHE_SEGUNDOS.
+STATUS_CACHE_SEGUNDOS = 10
+_status_cache = {'verificado_em': None, 'dados': None}
+_trava_status = threading.Lock()
+
+def verificar_supabase():
+    """Resultado (em cache) da verificação de conexão com o Supabase"""
+    with _trava_status:
+        verificado_em = _status_cache['verificado_em']
+        if verificado_em is not None and time.monotonic() - verificado_em < STATUS_CACHE_SEGUNDOS:
+            return _status_cache['dados']
+        
+        # A trava faz requisições simultâneas esperarem uma única verificação
+        try:
+            response = _executar(supabase.table('equipes').select('id', count='exact', head=True))
+            dados = {'supabase_connected': True, 'equipes_cadastradas': response.count}
+        except Exception as e:
+            dados = {'supabase_connected': False, 'error': str(e)}
+        
+        _status_cache['verificado_em'] = time.monotonic()
+        _status_cache['dados'] = dados
+        return dados
+
+@app.route('/status/live')
+def status_live():
+    """Liveness: o processo está de pé (não consulta o Supabase)"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/status/ready')
+def status_ready():
+    """Readiness: o Supabase responde (503 se não)"""
+    dados = verificar_supabase()
+    return jsonify({
+        **dados,
+        'circuito': circuito_supabase.estado,
+        'latencia_supabase': percentis_latencia()
+    }), 200 if dados['supabase_connected'] else 503
+
 @app.route('/status')
 def status():
     """Rota para verificar status da conexão"""
-    try:
-        # Testa conexão
-        response = supabase.table('equipes').select('count').execute()
-        equipes_count = len(get_equipes())
-        
-        status_info = {
-            'supabase_connected': True,
-            'supabase_url': SUPABASE_URL,
-            'equipes_cadastradas': equipes_count,
-            'modo': 'producao'
-        }
-    except Exception as e:
-        status_info = {
-            'supabase_connected': False,
-            'error': str(e),
-            'modo': 'erro'
-        }
+    dados = verificar_supabase()
+    status_info = {
+        **dados,
+        'modo': 'producao' if dados['supabase_connected'] else 'erro',
+        'circuito': circuito_supabase.estado,
+        'latencia_supabase': percentis_latencia(),
+        'cache_placar': obter_cache_placar().status()
+    }
+    if dados['supabase_connected']:
+        status_info['supabase_url'] = os.getenv('SUPABASE_URL')
+    # Só o que o processo já abriu: o status não cria o espelho nem o diário (nem as threads deles)
+    if _espelho is not None and _espelho_pid == os.getpid():
+        status_info['espelho'] = _espelho.status()
+    if _diario is not None and _diario_pid == os.getpid():
+        status_info['diario_registros'] = _diario.status()
     
     return jsonify(status_info)
 
@@ -1542,8 +3001,9 @@ def api_pontuacao_config():
     return jsonify(PONTUACAO_CONFIG)
 
 if __name__ == '__main__':
+    app = create_app()
     print("🚀 ZERO 1 iniciado com Supabase!")
-    print(f"🔗 Conectando em: {SUPABASE_URL}")
+    print(f"🔗 Conectando em: {os.getenv('SUPABASE_URL')}")
     
     # Inicializa banco
     if init_database():
@@ -0,0 +1,101 @@
+"""Mede a vazão (requisições/s) e a latência de um servidor do placar
+
+Dispara requisições GET em paralelo contra as URLs informadas durante um
+tempo fixo e mostra req/s e percentis de latência. Serve para comparar
+configurações do gunicorn (ver BENCHMARK.md); não precisa de nada além do
+httpx, que já vem com o supabase.
+
+Exemplo:
+    python benchmark_http.py http://localhost:5004 --concorrencia 8 --duracao 30
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import httpx
+
+# Páginas mais acessadas (placar geral e placar por período)
+CAMINHOS_PADRAO = [
+    '/placar',
+    '/placar?data_inicio=2025-01-01&data_fim=2025-12-31',
+    '/placar2?data_inicio=2025-01-01&data_fim=2025-12-31',
+]
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de uma lista já ordenada"""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[indice]
+
+
+def executar(base_url, caminhos, concorrencia, duracao, aquecimento):
+    """Roda o teste e retorna (latências em segundos, erros, duração medida)"""
+    latencias = []
+    erros = [0]
+    trava = threading.Lock()
+    inicio_medicao = time.perf_counter() + aquecimento
+    fim = inicio_medicao + duracao
+
+    def trabalhador(n):
+        # Cada "usuário" mantém sua conexão aberta, como um navegador
+        with httpx.Client(base_url=base_url, timeout=60) as cliente:
+            i = n
+            while True:
+                agora = time.perf_counter()
+                if agora >= fim:
+                    return
+                caminho = caminhos[i % len(caminhos)]
+                i += 1
+                try:
+                    resposta = cliente.get(caminho)
+                    ok = resposta.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                decorrido = time.perf_counter() - agora
+
+                # Requisições do aquecimento não entram na conta
+                if agora < inicio_medicao:
+                    continue
+                with trava:
+                    if ok:
+                        latencias.append(decorrido)
+                    else:
+                        erros[0] += 1
+
+    threads = [threading.Thread(target=trabalhador, args=(n,)) for n in range(concorrencia)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return sorted(latencias), erros[0], duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base_url', help='ex.: http://localhost:5004')
+    parser.add_argument('--caminho', action='append', dest='caminhos',
+                        help='caminho a requisitar (pode repetir); padrão: placares')
+    parser.add_argument('--concorrencia', type=int, default=8, help='usuários simultâneos')
+    parser.add_argument('--duracao', type=float, default=30, help='segundos medidos')
+    parser.add_argument('--aquecimento', type=float, default=5, help='segundos descartados no início')
+    args = parser.parse_args()
+
+    caminhos = args.caminhos or CAMINHOS_PADRAO
+    latencias, erros, duracao = executar(args.base_url, caminhos, args.concorrencia,
+                                         args.duracao, args.aquecimento)
+
+    print(f"URL: {args.base_url}  concorrência: {args.concorrencia}  duração: {duracao:.0f}s")
+    print(f"Requisições: {len(latencias)}  erros: {erros}")
+    print(f"Vazão: {len(latencias) / duracao:.1f} req/s")
+    if latencias:
+        print(f"Latência média: {statistics.mean(latencias) * 1000:.0f} ms")
+        for p in (50, 95, 99):
+            print(f"  p{p}: {percentil(latencias, p) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
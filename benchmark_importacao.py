@@ -0,0 +1,90 @@
+"""Relatório do tempo de import do app (python -X importtime)
+
+Importa app_supabase em processos novos (como um worker do gunicorn depois
+que o Render acorda o serviço) e mostra o tempo total e os módulos mais
+pesados. Também confere que os pacotes pesados não entram no import: se
+algum deles aparecer, ou se o tempo passar de --limite-ms, sai com erro.
+
+Exemplo:
+    python benchmark_importacao.py --repeticoes 5 --limite-ms 600
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULO = 'app_supabase'
+
+# Só devem ser importados na primeira consulta (ver obter_cliente_supabase)
+MODULOS_ADIADOS = ('supabase', 'postgrest', 'httpx', 'dotenv')
+
+
+def medir_import(modulo=MODULO):
+    """Importa o módulo em um processo novo e retorna {modulo: (proprio_us, acumulado_us, nivel)}
+
+    nivel 0 é o próprio módulo, 1 são os imports diretos dele, e assim por diante.
+    """
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=pasta, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise SystemExit(f"Erro ao importar {modulo}:\n{resultado.stderr}")
+
+    # O -X importtime lista cada módulo depois dos que ele importou; guarda
+    # só a subárvore de `modulo` (o que o interpretador carrega ao iniciar
+    # fica de fora)
+    tempos = {}
+    for linha in resultado.stderr.splitlines():
+        # Formato: "import time:  self [us] | cumulative | imported package"
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        tempos[nome.strip()] = (int(proprio), int(acumulado), nivel)
+        if nivel == 0:
+            if nome.strip() == modulo:
+                return tempos
+            tempos = {}
+    raise SystemExit(f"{modulo} não apareceu no -X importtime")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='quantos módulos pesados listar')
+    parser.add_argument('--limite-ms', type=float, help='falha se a mediana passar disso')
+    args = parser.parse_args()
+
+    medicoes = [medir_import() for _ in range(args.repeticoes)]
+    totais = [m[MODULO][1] / 1000 for m in medicoes]
+    mediana = statistics.median(totais)
+
+    print(f"Import de {MODULO}: mediana {mediana:.0f} ms "
+          f"(mín {min(totais):.0f}, máx {max(totais):.0f}, {args.repeticoes} processos)")
+
+    # Imports diretos mais pesados da última medição (tempo acumulado)
+    ultima = medicoes[-1]
+    diretos = {nome: t for nome, t in ultima.items() if t[2] == 1}
+    print("\nImports diretos mais pesados:")
+    for nome, (_, acumulado, _) in sorted(diretos.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {acumulado / 1000:8.1f} ms  {nome}")
+
+    falhou = False
+    adiados = sorted(nome for nome in ultima if nome.split('.')[0] in MODULOS_ADIADOS)
+    if adiados:
+        print(f"\n❌ Importados cedo demais: {', '.join(adiados[:10])}")
+        falhou = True
+    if args.limite_ms is not None and mediana > args.limite_ms:
+        print(f"\n❌ Import acima do limite de {args.limite_ms:.0f} ms")
+        falhou = True
+
+    if falhou:
+        sys.exit(1)
+    print("\n✅ OK")
+
+
+if __name__ == '__main__':
+    main()
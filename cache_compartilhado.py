@@ -0,0 +1,237 @@
+"""Cache dos placares compartilhado entre os workers (SQLite)
+
+Opcional, ligado por PLACAR_CACHE_SQLITE (caminho do arquivo). Sem ele, cada
+worker do gunicorn tem o seu CachePlacar em memória: N cópias frias do mesmo
+placar, e uma gravação só descarta o cache do worker que a recebeu (os
+outros mostram o placar antigo até a validade vencer).
+
+Com o arquivo, todos os workers da máquina leem e gravam as mesmas entradas:
+um placar calculado por um worker serve a todos, e uma gravação em qualquer
+um descarta as entradas afetadas para todos. O arquivo guarda também a
+versão dos dados, um contador global que sobe a cada invalidação; um cálculo
+que começou antes dela (em qualquer worker) não é guardado.
+
+Os valores são guardados em JSON (são listas e dicionários vindos do
+Supabase ou do espelho), então cada leitura já devolve uma cópia.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Versão do esquema abaixo (PRAGMA user_version). O cache pode ser refeito a
+# qualquer momento: um arquivo de outra versão é apagado e criado de novo.
+VERSAO_ESQUEMA = 1
+
+# Datas ausentes (placar geral) viram '' na chave: NULL não entra na chave primária
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    nome TEXT NOT NULL,
+    liga_id INTEGER NOT NULL,
+    data_inicio TEXT NOT NULL,
+    data_fim TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    guardado_em REAL NOT NULL,
+    PRIMARY KEY (nome, liga_id, data_inicio, data_fim)
+);
+CREATE INDEX IF NOT EXISTS idx_entradas_guardado_em ON entradas (guardado_em);
+
+-- Versão dos dados: uma linha só, incrementada a cada invalidação
+CREATE TABLE IF NOT EXISTS versao_dados (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    versao INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO versao_dados (id, versao) VALUES (1, 0)
+"""
+
+
+class CacheCompartilhado:
+    """Mesma interface do CachePlacar (app_supabase.py), guardada em um arquivo SQLite
+
+    Uma conexão por thread, em modo WAL: as leituras não esperam as
+    gravações. Guardar e invalidar são transações BEGIN IMMEDIATE, então a
+    conferência da versão e a gravação acontecem juntas em todos os workers.
+    Como a validade precisa valer entre processos, ela é medida pelo relógio
+    (time.time) e não pelo monotonic. A entrada que sai quando passa de
+    `maximo` é a guardada há mais tempo (com validade de segundos, a
+    diferença para a menos usada não compensa uma gravação a cada leitura).
+
+    Falhas do SQLite (disco cheio, arquivo travado além do tempo limite) não
+    derrubam a página: a leitura vira falta e a gravação é ignorada. Os
+    contadores de acertos e faltas são do processo; as entradas e a versão
+    são as do arquivo.
+    """
+
+    def __init__(self, caminho, maximo=128, segundos=30):
+        self.caminho = caminho
+        self.maximo = maximo
+        self.segundos = segundos
+        self.acertos = 0
+        self.faltas = 0
+        self.invalidacoes = 0
+        self.ultimo_erro = None
+        self._local = threading.local()
+        self._trava = threading.Lock()
+
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        self._criar_esquema()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            # É só um cache: perder as últimas gravações numa queda de energia não importa
+            conexao.execute('PRAGMA synchronous=OFF')
+            self._local.conexao = conexao
+        return conexao
+
+    def _criar_esquema(self):
+        conexao = self._conexao()
+        # Um worker por vez: os outros esperam e encontram o arquivo já na versão certa
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            if conexao.execute('PRAGMA user_version').fetchone()[0] != VERSAO_ESQUEMA:
+                tabelas = [linha[0] for linha in conexao.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                )]
+                for tabela in tabelas:
+                    conexao.execute(f'DROP TABLE {tabela}')
+                for comando in ESQUEMA.split(';'):
+                    conexao.execute(comando)
+                conexao.execute(f'PRAGMA user_version = {VERSAO_ESQUEMA}')
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+
+    def _contar(self, contador, quantidade=1):
+        with self._trava:
+            setattr(self, contador, getattr(self, contador) + quantidade)
+
+    def _falhou(self, acao, erro):
+        self.ultimo_erro = f'{acao}: {erro}'
+        print(f"Erro ao {acao} no cache compartilhado: {erro}")
+
+    @staticmethod
+    def _chave(chave):
+        nome, liga_id, data_inicio, data_fim = chave
+        return nome, liga_id, data_inicio or '', data_fim or ''
+
+    @property
+    def versao(self):
+        """Versão atual dos dados (None se o arquivo não pôde ser lido: nada será guardado)"""
+        try:
+            return self._conexao().execute("SELECT versao FROM versao_dados WHERE id = 1").fetchone()[0]
+        except sqlite3.Error as e:
+            self._falhou('ler a versão', e)
+            return None
+
+    def obter(self, chave):
+        """Valor guardado (uma cópia nova), ou None se não há (ou venceu)"""
+        try:
+            linha = self._conexao().execute(
+                """
+                SELECT valor FROM entradas
+                WHERE nome = ? AND liga_id = ? AND data_inicio = ? AND data_fim = ? AND guardado_em > ?
+                """,
+                (*self._chave(chave), time.time() - self.segundos)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._falhou('ler', e)
+            linha = None
+        if linha is None:
+            self._contar('faltas')
+            return None
+        self._contar('acertos')
+        return json.loads(linha[0])
+
+    def guardar(self, chave, valor, versao):
+        """Guarda o valor calculado desde `versao` (descartado se houve invalidação no meio, em qualquer worker)"""
+        if versao is None:
+            return
+        valor = json.dumps(valor, default=str)
+        conexao = self._conexao()
+        try:
+            conexao.execute('BEGIN IMMEDIATE')
+            try:
+                atual = conexao.execute("SELECT versao FROM versao_dados WHERE id = 1").fetchone()[0]
+                if atual == versao:
+                    agora = time.time()
+                    conexao.execute(
+                        "INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?, ?, ?)",
+                        (*self._chave(chave), valor, agora)
+                    )
+                    conexao.execute("DELETE FROM entradas WHERE guardado_em <= ?", (agora - self.segundos,))
+                    conexao.execute(
+                        """
+                        DELETE FROM entradas WHERE rowid IN (
+                            SELECT rowid FROM entradas ORDER BY guardado_em DESC LIMIT -1 OFFSET ?
+                        )
+                        """,
+                        (self.maximo,)
+                    )
+                conexao.execute('COMMIT')
+            except Exception:
+                conexao.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            self._falhou('guardar', e)
+
+    def invalidar(self, liga_id=None, data_inicio=None, data_fim=None):
+        """Descarta os placares afetados por uma gravação, para todos os workers
+
+        Mesmas regras do CachePlacar: sem datas, todos os da liga (de todas
+        as ligas com liga_id=None); com as datas de um registro, os placares
+        gerais da liga e os períodos que se sobrepõem a elas.
+        """
+        condicoes, params = [], []
+        if liga_id is not None:
+            condicoes.append('liga_id = ?')
+            params.append(liga_id)
+        if data_inicio:
+            condicoes.append("(data_inicio = '' OR data_fim = '' OR (data_inicio <= ? AND data_fim >= ?))")
+            params += [str(data_fim), str(data_inicio)]
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ''
+
+        conexao = self._conexao()
+        try:
+            conexao.execute('BEGIN IMMEDIATE')
+            try:
+                conexao.execute("UPDATE versao_dados SET versao = versao + 1 WHERE id = 1")
+                removidas = conexao.execute(f"DELETE FROM entradas{where}", params).rowcount
+                conexao.execute('COMMIT')
+            except Exception:
+                conexao.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            # Os outros workers podem mostrar o placar antigo até a validade vencer
+            self._falhou('invalidar', e)
+            return
+        self._contar('invalidacoes', removidas)
+
+    def status(self):
+        try:
+            conexao = self._conexao()
+            entradas = conexao.execute(
+                "SELECT COUNT(*) FROM entradas WHERE guardado_em > ?", (time.time() - self.segundos,)
+            ).fetchone()[0]
+            versao = conexao.execute("SELECT versao FROM versao_dados WHERE id = 1").fetchone()[0]
+        except sqlite3.Error as e:
+            entradas = versao = None
+            self._falhou('ler o status', e)
+        with self._trava:
+            total = self.acertos + self.faltas
+            return {
+                'compartilhado': True,
+                'arquivo': self.caminho,
+                'entradas': entradas,
+                'versao_dados': versao,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'invalidacoes': self.invalidacoes,
+                'taxa_acerto': round(self.acertos / total, 3) if total else None,
+                'ultimo_erro': self.ultimo_erro
+            }
@@ -0,0 +1,137 @@
+"""Diário local (SQLite) dos registros de atividade ainda não enviados
+
+Opcional, ligado por DIARIO_REGISTROS (caminho do arquivo). Com ele, o
+registro de atividade é anotado aqui e confirmado na hora para o líder; uma
+thread em segundo plano envia os pendentes ao Supabase em lotes pela função
+registrar_lote (ver migrations/0012_registrar_lote.sql).
+
+Cada registro leva uma chave (UUID) gerada no app. O Supabase ignora chaves
+que já recebeu, então reenviar um lote depois de uma queda no meio do envio,
+ou dois workers enviando o mesmo lote, não duplica registros nem pontos.
+"""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS diario (
+    chave TEXT PRIMARY KEY,
+    dados TEXT NOT NULL,
+    criado_em TEXT NOT NULL,
+    reservado_ate TEXT,
+    enviado_em TEXT,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    erro TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_diario_pendentes ON diario (criado_em) WHERE enviado_em IS NULL;
+"""
+
+# Por quanto tempo um lote reservado por um worker fica fora do alcance dos
+# outros. Se o worker morrer no meio do envio, outro reenvia depois disso.
+SEGUNDOS_RESERVA = 60
+
+# Registros enviados ficam no diário por este tempo (para conferência) e depois são apagados
+DIAS_MANTER_ENVIADOS = 7
+
+# Depois de tantas tentativas recusadas pelo banco (dado inválido, equipe
+# excluída...) o registro para de ser reenviado e aparece em /status
+TENTATIVAS_MAXIMAS = 5
+
+
+class DiarioRegistros:
+    """Fila durável de registros a enviar, compartilhável entre workers
+
+    Uma conexão por thread, em modo WAL com synchronous=FULL: quando anotar()
+    retorna, o registro já está no disco.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        self._conexao().executescript(ESQUEMA)
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=FULL')
+            self._local.conexao = conexao
+        return conexao
+
+    def anotar(self, registro):
+        """Grava um registro no diário e retorna a chave gerada para ele"""
+        chave = str(uuid.uuid4())
+        self._conexao().execute(
+            "INSERT INTO diario (chave, dados, criado_em) VALUES (?, ?, ?)",
+            (chave, json.dumps(registro, default=str), datetime.now().isoformat())
+        )
+        return chave
+
+    def reservar(self, limite):
+        """Reserva até `limite` pendentes para este envio e retorna [(chave, registro)]
+
+        A reserva e a leitura acontecem na mesma transação (BEGIN IMMEDIATE),
+        então dois workers não pegam o mesmo lote enquanto a reserva vale.
+        """
+        conexao = self._conexao()
+        agora = datetime.now()
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            linhas = conexao.execute(
+                """
+                SELECT chave, dados FROM diario
+                WHERE enviado_em IS NULL AND tentativas < ?
+                  AND (reservado_ate IS NULL OR reservado_ate < ?)
+                ORDER BY criado_em
+                LIMIT ?
+                """,
+                (TENTATIVAS_MAXIMAS, agora.isoformat(), limite)
+            ).fetchall()
+            reservado_ate = (agora + timedelta(seconds=SEGUNDOS_RESERVA)).isoformat()
+            conexao.executemany(
+                "UPDATE diario SET reservado_ate = ? WHERE chave = ?",
+                [(reservado_ate, linha['chave']) for linha in linhas]
+            )
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+        return [(linha['chave'], json.loads(linha['dados'])) for linha in linhas]
+
+    def marcar_enviados(self, chaves):
+        self._conexao().executemany(
+            "UPDATE diario SET enviado_em = ?, reservado_ate = NULL, erro = NULL WHERE chave = ?",
+            [(datetime.now().isoformat(), chave) for chave in chaves]
+        )
+
+    def liberar(self, chaves, erro=None, tentativa=False):
+        """Devolve registros à fila; com tentativa=True conta como recusa do banco"""
+        self._conexao().executemany(
+            "UPDATE diario SET reservado_ate = NULL, erro = ?, tentativas = tentativas + ? WHERE chave = ?",
+            [(erro, 1 if tentativa else 0, chave) for chave in chaves]
+        )
+
+    def limpar_enviados(self, dias=DIAS_MANTER_ENVIADOS):
+        limite = (datetime.now() - timedelta(days=dias)).isoformat()
+        self._conexao().execute("DELETE FROM diario WHERE enviado_em IS NOT NULL AND enviado_em < ?", (limite,))
+
+    def status(self):
+        """Contagens do diário para o /status"""
+        linha = self._conexao().execute(
+            """
+            SELECT COUNT(*) FILTER (WHERE enviado_em IS NULL AND tentativas < ?) AS pendentes,
+                   COUNT(*) FILTER (WHERE enviado_em IS NULL AND tentativas >= ?) AS recusados,
+                   MIN(criado_em) FILTER (WHERE enviado_em IS NULL) AS pendente_desde
+            FROM diario
+            """,
+            (TENTATIVAS_MAXIMAS, TENTATIVAS_MAXIMAS)
+        ).fetchone()
+        return dict(linha)
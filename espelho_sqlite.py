@@ -0,0 +1,425 @@
+"""Espelho local (SQLite) das tabelas equipes e registros
+
+Opcional, ligado por ESPELHO_SQLITE (caminho do arquivo). As leituras do
+placar, do histórico e dos relatórios passam a ser feitas aqui, sem ir à
+rede; as gravações continuam indo para o Supabase e o espelho é atualizado
+depois delas e, em segundo plano, a cada ESPELHO_INTERVALO_SEGUNDOS.
+
+A sincronização é incremental: cada tabela guarda a marca da transação
+(xid) a partir da qual ainda pode haver mudanças e busca só as linhas
+gravadas por transações a partir dela, em páginas por chave (ver
+migrations/0016_marca_espelho_xid.sql). Exclusões chegam pela tabela
+exclusoes (ver migrations/0011_sincronizacao_espelho.sql). Se o Supabase
+cair, o espelho continua respondendo com os últimos dados sincronizados.
+
+Todas as leituras são de uma liga (liga_id, ver migrations/0014_ligas.sql):
+o espelho guarda todas e filtra pelos mesmos índices por liga do banco.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Colunas copiadas de cada tabela (as lidas pelas telas, ver COLUNAS em app_supabase.py)
+COLUNAS_EQUIPES = ['id', 'liga_id', 'nome', 'logo_url', 'pontuacao_total', 'data_atualizacao']
+COLUNAS_REGISTROS = [
+    'id', 'equipe_id', 'liga_id', 'data_inicio', 'data_fim', 'data_registro',
+    'qtd_pessoas', 'qtd_pessoas_novas', 'qtd_celulas', 'qtd_celulas_realizadas', 'qtd_celulas_elite',
+    'qtd_pessoas_terca', 'qtd_pessoas_novas_terca', 'qtd_pessoas_arena', 'qtd_pessoas_novas_arena',
+    'qtd_pessoas_domingo', 'qtd_pessoas_novas_domingo', 'valor_arrecadacao_parceiro',
+    'qtd_revisao_vidas', 'pontuacao', 'data_atualizacao'
+]
+COLUNAS_REGISTROS_ANO = [
+    'id', 'equipe_id', 'liga_id', 'ano', 'qtd_registros', 'pontuacao', 'qtd_pessoas_novas', 'qtd_celulas_realizadas',
+    'qtd_celulas_elite', 'qtd_pessoas_terca', 'qtd_pessoas_novas_terca', 'qtd_pessoas_arena',
+    'qtd_pessoas_novas_arena', 'qtd_pessoas_domingo', 'qtd_pessoas_novas_domingo',
+    'valor_arrecadacao_parceiro', 'qtd_revisao_vidas', 'data_atualizacao'
+]
+
+# Versão do esquema abaixo (PRAGMA user_version). O espelho é só uma cópia:
+# um arquivo de outra versão é apagado e copiado de novo do Supabase.
+VERSAO_ESQUEMA = 3
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS equipes (
+    id INTEGER PRIMARY KEY,
+    liga_id INTEGER NOT NULL,
+    nome TEXT NOT NULL,
+    logo_url TEXT,
+    pontuacao_total INTEGER NOT NULL DEFAULT 0,
+    data_atualizacao TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_equipes_liga_ranking ON equipes (liga_id, pontuacao_total DESC, id);
+
+CREATE TABLE IF NOT EXISTS registros (
+    id INTEGER PRIMARY KEY,
+    equipe_id INTEGER NOT NULL,
+    liga_id INTEGER NOT NULL,
+    data_inicio TEXT NOT NULL,
+    data_fim TEXT NOT NULL,
+    data_registro TEXT,
+    qtd_pessoas INTEGER DEFAULT 0,
+    qtd_pessoas_novas INTEGER DEFAULT 0,
+    qtd_celulas INTEGER DEFAULT 0,
+    qtd_celulas_realizadas INTEGER DEFAULT 0,
+    qtd_celulas_elite INTEGER DEFAULT 0,
+    qtd_pessoas_terca INTEGER DEFAULT 0,
+    qtd_pessoas_novas_terca INTEGER DEFAULT 0,
+    qtd_pessoas_arena INTEGER DEFAULT 0,
+    qtd_pessoas_novas_arena INTEGER DEFAULT 0,
+    qtd_pessoas_domingo INTEGER DEFAULT 0,
+    qtd_pessoas_novas_domingo INTEGER DEFAULT 0,
+    valor_arrecadacao_parceiro REAL DEFAULT 0,
+    qtd_revisao_vidas INTEGER DEFAULT 0,
+    pontuacao INTEGER DEFAULT 0,
+    data_atualizacao TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_registros_equipe_recentes ON registros (equipe_id, data_registro DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_registros_liga_periodo ON registros (liga_id, data_inicio, data_fim);
+CREATE INDEX IF NOT EXISTS idx_registros_liga_recentes ON registros (liga_id, data_registro DESC, id DESC);
+
+-- Resumo anual dos registros arquivados (ver migrations/0013_arquivo_registros.sql)
+CREATE TABLE IF NOT EXISTS registros_ano (
+    id INTEGER PRIMARY KEY,
+    equipe_id INTEGER NOT NULL,
+    liga_id INTEGER NOT NULL,
+    ano INTEGER NOT NULL,
+    qtd_registros INTEGER DEFAULT 0,
+    pontuacao INTEGER DEFAULT 0,
+    qtd_pessoas_novas INTEGER DEFAULT 0,
+    qtd_celulas_realizadas INTEGER DEFAULT 0,
+    qtd_celulas_elite INTEGER DEFAULT 0,
+    qtd_pessoas_terca INTEGER DEFAULT 0,
+    qtd_pessoas_novas_terca INTEGER DEFAULT 0,
+    qtd_pessoas_arena INTEGER DEFAULT 0,
+    qtd_pessoas_novas_arena INTEGER DEFAULT 0,
+    qtd_pessoas_domingo INTEGER DEFAULT 0,
+    qtd_pessoas_novas_domingo INTEGER DEFAULT 0,
+    valor_arrecadacao_parceiro REAL DEFAULT 0,
+    qtd_revisao_vidas INTEGER DEFAULT 0,
+    data_atualizacao TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_registros_ano_equipe ON registros_ano (equipe_id, ano);
+
+CREATE TABLE IF NOT EXISTS arquivamentos (
+    id INTEGER PRIMARY KEY,
+    antes_de TEXT NOT NULL,
+    qtd_registros INTEGER,
+    executado_em TEXT
+);
+
+-- Marca (xid, ver marca_espelho no Supabase) da próxima sincronização de cada tabela
+CREATE TABLE IF NOT EXISTS sincronizacao (
+    tabela TEXT PRIMARY KEY,
+    marca TEXT,
+    sincronizado_em TEXT
+);
+"""
+
+# Origem de cada tabela do espelho: (tabela no Supabase, colunas, coluna do id).
+# A ordem da paginação é (COLUNA_MARCA, id).
+ORIGENS = {
+    'equipes': ('equipes', COLUNAS_EQUIPES, 'id'),
+    'registros': ('registros', COLUNAS_REGISTROS, 'id'),
+    'registros_ano': ('registros_ano', COLUNAS_REGISTROS_ANO, 'id'),
+    'arquivamentos': ('arquivamentos', ['id', 'antes_de', 'qtd_registros', 'executado_em'], 'id'),
+    'exclusoes': ('exclusoes', ['tabela', 'registro_id', 'excluido_em'], 'registro_id'),
+}
+
+# Transação que gravou a linha por último (ver migrations/0016_marca_espelho_xid.sql)
+COLUNA_MARCA = 'xid_alteracao'
+
+# Linhas por página na sincronização (abaixo do max-rows do PostgREST)
+TAMANHO_PAGINA_SINCRONIZACAO = 500
+
+
+class EspelhoSQLite:
+    """Cópia local de equipes e registros, com as leituras usadas pelo app
+
+    Uma conexão SQLite por thread, em modo WAL: leitores não esperam a
+    sincronização e vários workers do gunicorn podem usar o mesmo arquivo.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._trava_sincronizacao = threading.Lock()
+        self.ultima_sincronizacao = None
+        self.ultimo_erro = None
+        self._pronto = False
+
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        self._criar_esquema()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao = conexao
+        return conexao
+
+    def _criar_esquema(self):
+        conexao = self._conexao()
+        # Um worker por vez: os outros esperam e encontram o arquivo já na versão certa
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            if conexao.execute('PRAGMA user_version').fetchone()[0] != VERSAO_ESQUEMA:
+                tabelas = [linha[0] for linha in conexao.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                )]
+                for tabela in tabelas:
+                    conexao.execute(f'DROP TABLE {tabela}')
+                for comando in ESQUEMA.split(';'):
+                    conexao.execute(comando)
+                conexao.execute(f'PRAGMA user_version = {VERSAO_ESQUEMA}')
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+
+    def _consultar(self, sql, params=()):
+        return [dict(linha) for linha in self._conexao().execute(sql, params)]
+
+    @property
+    def pronto(self):
+        """True depois que a primeira sincronização completa terminou (neste ou em outro processo)"""
+        if not self._pronto:
+            linha = self._conexao().execute(
+                "SELECT COUNT(*) FROM sincronizacao WHERE sincronizado_em IS NOT NULL"
+            ).fetchone()
+            self._pronto = linha[0] == len(ORIGENS)
+        return self._pronto
+
+    # Sincronização
+
+    def sincronizar(self, cliente, executar):
+        """Copia do Supabase o que mudou desde a última sincronização
+
+        `cliente` é o cliente Supabase síncrono e `executar` a função que roda
+        as consultas (_executar do app, que passa pelo circuito). As
+        exclusões vêm por último: uma linha copiada nesta mesma rodada e
+        excluída logo depois é apagada em seguida. Retorna quantas linhas
+        foram copiadas ou apagadas.
+
+        A marca da próxima rodada é o menor xid em andamento no Supabase,
+        lido antes de qualquer tabela: o que terminar depois desta leitura
+        (inclusive uma transação longa que já tinha começado) tem xid maior
+        ou igual a ela e entra na próxima rodada.
+        """
+        with self._trava_sincronizacao:
+            try:
+                proxima_marca = executar(cliente.rpc('marca_espelho', {})).data
+                alteradas = 0
+                for tabela in ORIGENS:
+                    alteradas += self._sincronizar_tabela(tabela, cliente, executar, proxima_marca)
+                self.ultima_sincronizacao = time.time()
+                self.ultimo_erro = None
+                return alteradas
+            except Exception as e:
+                self.ultimo_erro = str(e)
+                raise
+
+    def _sincronizar_tabela(self, tabela, cliente, executar, proxima_marca):
+        origem, colunas, coluna_id = ORIGENS[tabela]
+        conexao = self._conexao()
+        linha = conexao.execute("SELECT marca FROM sincronizacao WHERE tabela = ?", (tabela,)).fetchone()
+        desde = linha['marca'] if linha else None
+
+        alteradas = 0
+        cursor = None
+        while True:
+            query = cliente.table(origem).select(', '.join(colunas + [COLUNA_MARCA]))
+            if cursor:
+                # Próxima página: logo depois da última linha lida (mesma ordem)
+                query = query.or_(
+                    f'{COLUNA_MARCA}.gt."{cursor[0]}",'
+                    f'and({COLUNA_MARCA}.eq."{cursor[0]}",{coluna_id}.gt.{cursor[1]})'
+                )
+            elif desde:
+                query = query.gte(COLUNA_MARCA, desde)
+            query = query.order(COLUNA_MARCA).order(coluna_id).limit(TAMANHO_PAGINA_SINCRONIZACAO)
+            dados = executar(query).data
+
+            if dados:
+                self._gravar(tabela, colunas, dados)
+                alteradas += len(dados)
+                cursor = (dados[-1][COLUNA_MARCA], dados[-1][coluna_id])
+            if len(dados) < TAMANHO_PAGINA_SINCRONIZACAO:
+                break
+
+        conexao.execute(
+            "INSERT INTO sincronizacao (tabela, marca, sincronizado_em) VALUES (?, ?, ?) "
+            "ON CONFLICT (tabela) DO UPDATE SET marca = excluded.marca, sincronizado_em = excluded.sincronizado_em",
+            (tabela, proxima_marca, datetime.now().isoformat(timespec='seconds'))
+        )
+        return alteradas
+
+    def _gravar(self, tabela, colunas, dados):
+        conexao = self._conexao()
+        # BEGIN IMMEDIATE: com vários workers, quem chega depois espera em vez de falhar no meio
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            if tabela == 'exclusoes':
+                for linha in dados:
+                    if linha['tabela'] == 'equipes':
+                        conexao.execute("DELETE FROM registros WHERE equipe_id = ?", (linha['registro_id'],))
+                        conexao.execute("DELETE FROM registros_ano WHERE equipe_id = ?", (linha['registro_id'],))
+                    if linha['tabela'] in ('equipes', 'registros'):
+                        conexao.execute(f"DELETE FROM {linha['tabela']} WHERE id = ?", (linha['registro_id'],))
+            else:
+                marcadores = ', '.join('?' for _ in colunas)
+                conexao.executemany(
+                    f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) VALUES ({marcadores})",
+                    [tuple(linha.get(coluna) for coluna in colunas) for linha in dados]
+                )
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+
+    # Leituras (mesmos formatos das consultas ao Supabase)
+
+    def equipes(self, liga_id):
+        """Equipes do placar geral da liga, por pontuação total"""
+        return self._consultar(
+            "SELECT id, nome, logo_url, pontuacao_total FROM equipes WHERE liga_id = ? "
+            "ORDER BY pontuacao_total DESC, id",
+            (liga_id,)
+        )
+
+    def placar_periodo(self, data_inicio, data_fim, liga_id):
+        """Mesmo resultado da função placar_periodo do banco"""
+        return self._consultar(
+            """
+            SELECT e.id, e.nome, e.logo_url, e.pontuacao_total,
+                   COALESCE(t.pontuacao_periodo, 0) AS pontuacao_periodo,
+                   COALESCE(t.registros_periodo, 0) AS registros_periodo
+            FROM equipes e
+            LEFT JOIN (
+                SELECT equipe_id, SUM(pontuacao) AS pontuacao_periodo, COUNT(*) AS registros_periodo
+                FROM registros
+                WHERE liga_id = ? AND data_inicio >= ? AND data_fim <= ?
+                GROUP BY equipe_id
+            ) t ON t.equipe_id = e.id
+            WHERE e.liga_id = ?
+            ORDER BY COALESCE(t.pontuacao_periodo, 0) DESC, e.id
+            """,
+            (liga_id, data_inicio, data_fim, liga_id)
+        )
+
+    def posicao_equipe(self, equipe_id):
+        """Mesmo resultado da função posicao_equipe do banco (None se não existe)"""
+        linhas = self._consultar(
+            """
+            SELECT e.id, e.nome, e.logo_url, e.pontuacao_total,
+                   1 + (SELECT COUNT(*) FROM equipes f
+                        WHERE f.liga_id = e.liga_id
+                          AND (f.pontuacao_total > e.pontuacao_total
+                               OR (f.pontuacao_total = e.pontuacao_total AND f.id < e.id))) AS posicao,
+                   e.liga_id
+            FROM equipes e
+            WHERE e.id = ?
+            """,
+            (equipe_id,)
+        )
+        return linhas[0] if linhas else None
+
+    def _filtros_registros(self, equipe_id=None, data_inicio=None, data_fim=None, liga_id=None):
+        condicoes, params = [], []
+        if liga_id:
+            condicoes.append('liga_id = ?')
+            params.append(int(liga_id))
+        if equipe_id:
+            condicoes.append('equipe_id = ?')
+            params.append(int(equipe_id))
+        if data_inicio:
+            condicoes.append('data_inicio >= ?')
+            params.append(data_inicio)
+        if data_fim:
+            condicoes.append('data_fim <= ?')
+            params.append(data_fim)
+        return condicoes, params
+
+    def registros(self, colunas, equipe_id=None, data_inicio=None, data_fim=None, cursor=None, limite=None,
+                  liga_id=None):
+        """Registros filtrados, mais recentes primeiro
+
+        cursor é o (data_registro, id) já decodificado da última linha exibida;
+        as colunas são as mesmas strings de COLUNAS usadas no select do Supabase.
+        """
+        condicoes, params = self._filtros_registros(equipe_id, data_inicio, data_fim, liga_id)
+        if cursor:
+            condicoes.append('(data_registro < ? OR (data_registro = ? AND id < ?))')
+            params.extend([cursor[0], cursor[0], cursor[1]])
+
+        sql = f"SELECT {colunas} FROM registros"
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        sql += ' ORDER BY data_registro DESC, id DESC'
+        if limite:
+            sql += ' LIMIT ?'
+            params.append(limite)
+        return self._consultar(sql, params)
+
+    def resumo_registros(self, equipe_id=None, data_inicio=None, data_fim=None, liga_id=None):
+        """Mesmo resultado da função resumo_registros do banco
+
+        Com período, vale só para períodos depois do corte do arquivo (ver
+        corte_arquivo): os registros arquivados não são copiados.
+        """
+        condicoes, params = self._filtros_registros(equipe_id, data_inicio, data_fim, liga_id)
+        sql = """
+            SELECT COUNT(*) AS total_registros,
+                   COALESCE(SUM(pontuacao), 0) AS total_pontos,
+                   COALESCE(SUM(qtd_pessoas_novas), 0) AS total_pessoas_novas,
+                   COALESCE(SUM(valor_arrecadacao_parceiro), 0) AS total_arrecadacao,
+                   COALESCE(SUM(qtd_revisao_vidas), 0) AS total_revisao_vidas,
+                   0 AS total_arquivados
+            FROM registros
+        """
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        resumo = self._consultar(sql, params)[0]
+
+        if not data_inicio and not data_fim:
+            # Sem período a parte arquivada vem do resumo anual, como no banco
+            for ano in self.resumos_anuais(equipe_id, liga_id):
+                resumo['total_registros'] += ano['qtd_registros']
+                resumo['total_pontos'] += ano['pontuacao']
+                resumo['total_pessoas_novas'] += ano['qtd_pessoas_novas']
+                resumo['total_arrecadacao'] += ano['valor_arrecadacao_parceiro']
+                resumo['total_revisao_vidas'] += ano['qtd_revisao_vidas']
+                resumo['total_arquivados'] += ano['qtd_registros']
+        return resumo
+
+    def resumos_anuais(self, equipe_id=None, liga_id=None):
+        """Resumos anuais dos registros arquivados, do ano mais recente ao mais antigo"""
+        condicoes, params = self._filtros_registros(equipe_id, liga_id=liga_id)
+        sql = f"SELECT {', '.join(COLUNAS_REGISTROS_ANO[1:-1])} FROM registros_ano"
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        return self._consultar(sql + ' ORDER BY ano DESC, equipe_id', params)
+
+    def corte_arquivo(self):
+        """Data antes da qual há registros arquivados (AAAA-MM-DD), ou None"""
+        return self._conexao().execute("SELECT MAX(antes_de) FROM arquivamentos").fetchone()[0]
+
+    def status(self):
+        """Situação do espelho para o /status"""
+        marcas = {
+            linha['tabela']: linha['sincronizado_em']
+            for linha in self._consultar("SELECT tabela, sincronizado_em FROM sincronizacao")
+        }
+        return {
+            'pronto': self.pronto,
+            'sincronizado_em': marcas,
+            'segundos_desde_sincronizacao': (
+                round(time.time() - self.ultima_sincronizacao, 1) if self.ultima_sincronizacao else None
+            ),
+            'erro': self.ultimo_erro
+        }
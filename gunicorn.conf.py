@@ -0,0 +1,48 @@
+"""Configuração do gunicorn para produção
+
+Uso: gunicorn -c gunicorn.conf.py
+
+Cada worker atende várias requisições ao mesmo tempo com threads (o app
+passa quase todo o tempo esperando o Supabase, não na CPU), e todas as
+threads de um worker compartilham o pool de conexões do cliente Supabase.
+Os valores podem ser ajustados por variáveis de ambiente sem editar este
+arquivo; a metodologia para escolher os números está em BENCHMARK.md.
+"""
+import os
+
+# Fábrica do app: carrega o .env; o Supabase só é importado no worker
+wsgi_app = 'app_supabase:create_app()'
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5004')}"
+
+# WEB_CONCURRENCY é a variável padrão do Render e do gunicorn para workers.
+# O plano gratuito tem 512 MB: 2 workers cabem com folga.
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Importa o app uma vez no master (boot mais rápido e memória compartilhada
+# por copy-on-write); o cliente Supabase é criado em cada worker abaixo.
+preload_app = True
+
+# A IA e o relatório podem demorar; o padrão (30s) derrubaria o worker
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+# Mantém a conexão com o proxy do Render aberta entre requisições
+keepalive = 5
+
+# Recicla workers de tempos em tempos (evita acúmulo de memória)
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    """Cada worker cria o próprio cliente Supabase e pool de conexões
+
+    A criação (e o import do pacote supabase) roda em segundo plano, então
+    o worker já aceita requisições enquanto o cliente fica pronto.
+    """
+    import app_supabase
+    app_supabase.reiniciar_cliente_supabase(aquecer=True)
+    server.log.info("Criando cliente Supabase no worker %s", worker.pid)
@@ -0,0 +1,255 @@
+"""Migrações do banco do placar (PostgreSQL / Supabase)
+
+Aplica em ordem os arquivos numerados de migrations/ e guarda quais já
+rodaram na tabela schema_migrations. Conecta direto no PostgreSQL pela
+variável DATABASE_URL (no Supabase: Project Settings > Database > Connection
+string), então também funciona com um PostgreSQL local para testes.
+
+Uso:
+    python migracoes.py status
+    python migracoes.py aplicar
+    python migracoes.py verificar-indices
+
+Precisa do psycopg (pip install "psycopg[binary]"), que o app não usa.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+
+import click
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PASTA_MIGRACOES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Nome dos arquivos: 0001_descricao.sql
+PADRAO_ARQUIVO = re.compile(r'^(\d{4})_[a-z0-9_]+\.sql$')
+
+# Chave do pg_advisory_xact_lock que impede dois "aplicar" ao mesmo tempo
+TRAVA_MIGRACOES = 2025_0001
+
+# Formato das consultas que app_supabase.py (via PostgREST) e as funções do
+# servidor fazem em registros e equipes. As de período e de placar filtram
+# pela liga (liga_id), que abre os índices delas. verificar-indices roda
+# EXPLAIN em cada uma.
+CONSULTAS_REGISTROS = [
+    ('historico_equipe',
+     "SELECT * FROM registros WHERE equipe_id = 1 "
+     "ORDER BY data_registro DESC, id DESC LIMIT 51"),
+    ('historico_equipe_cursor',
+     "SELECT * FROM registros WHERE equipe_id = 1 "
+     "AND (data_registro < '2025-06-01' OR (data_registro = '2025-06-01' AND id < 100)) "
+     "ORDER BY data_registro DESC, id DESC LIMIT 51"),
+    ('relatorio_periodo',
+     "SELECT * FROM registros WHERE liga_id = 1 AND data_inicio >= '2025-01-01' AND data_fim <= '2025-01-31' "
+     "ORDER BY data_registro DESC, id DESC LIMIT 51"),
+    ('relatorio_periodo_equipe',
+     "SELECT * FROM registros WHERE liga_id = 1 AND data_inicio >= '2025-01-01' AND data_fim <= '2025-01-31' "
+     "AND equipe_id = 1 ORDER BY data_registro DESC, id DESC LIMIT 51"),
+    # Análise com IA: o período inteiro, página a página pela mesma chave (iterar_registros_por_periodo)
+    ('analise_periodo_cursor',
+     "SELECT * FROM registros WHERE liga_id = 1 AND data_inicio >= '2025-01-01' AND data_fim <= '2025-12-31' "
+     "AND (data_registro < '2025-06-01' OR (data_registro = '2025-06-01' AND id < 100)) "
+     "ORDER BY data_registro DESC, id DESC LIMIT 501"),
+    ('totais_periodo',
+     "SELECT equipe_id, COUNT(*), SUM(pontuacao) FROM registros "
+     "WHERE liga_id = 1 AND data_inicio >= '2025-01-02' AND data_fim <= '2025-01-30' GROUP BY equipe_id"),
+    ('totais_periodo_semanal',
+     "SELECT equipe_id, SUM(pontuacao) FROM registros_semana "
+     "WHERE liga_id = 1 AND semana_inicio >= '2025-01-06' AND semana_fim <= '2025-01-27' GROUP BY equipe_id"),
+    ('totais_periodo_arquivo',
+     "SELECT equipe_id, COUNT(*), SUM(pontuacao) FROM registros_arquivo "
+     "WHERE liga_id = 1 AND data_inicio >= '2023-01-02' AND data_fim <= '2023-01-30' GROUP BY equipe_id"),
+    ('resumos_anuais',
+     "SELECT * FROM registros_ano WHERE equipe_id = 1 ORDER BY ano DESC"),
+    ('resumo_liga',
+     "SELECT COUNT(*), SUM(pontuacao) FROM registros WHERE liga_id = 1"),
+    ('placar_geral',
+     "SELECT * FROM equipes WHERE liga_id = 1 ORDER BY pontuacao_total DESC, id"),
+    ('diretorio_equipes',
+     "SELECT id, nome, logo_url FROM equipes WHERE liga_id = 1"),
+    ('placar_em_snapshot',
+     "SELECT * FROM placar_snapshots WHERE liga_id = 1 AND data_snapshot <= '2025-06-01' "
+     "ORDER BY data_snapshot DESC LIMIT 1"),
+    ('placar_em_eventos',
+     "SELECT equipe_id, SUM(delta_pontos) FROM eventos_registros "
+     "WHERE liga_id = 1 AND id > 1000 AND data_evento <= '2025-06-01' GROUP BY equipe_id"),
+    ('resumo_equipe',
+     "SELECT COUNT(*), SUM(pontuacao) FROM registros WHERE equipe_id = 1"),
+    ('reconciliar_pontuacao',
+     "SELECT equipe_id, SUM(pontuacao) FROM registros GROUP BY equipe_id"),
+    ('editar_registro',
+     "SELECT * FROM registros WHERE id = 1"),
+    ('sincronizar_espelho',
+     "SELECT * FROM registros WHERE xid_alteracao >= '1000' "
+     "ORDER BY xid_alteracao, id LIMIT 500"),
+]
+
+
+# Tabelas em que verificar-indices não aceita Seq Scan
+TABELAS_INDEXADAS = ('registros', 'registros_semana', 'registros_arquivo', 'registros_ano', 'equipes',
+                     'eventos_registros', 'placar_snapshots')
+
+
+def conectar():
+    """Abre a conexão com o PostgreSQL de DATABASE_URL"""
+    try:
+        import psycopg
+    except ImportError:
+        raise click.ClickException('Instale o psycopg: pip install "psycopg[binary]"')
+
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        raise click.ClickException('Defina DATABASE_URL com a connection string do PostgreSQL')
+    return psycopg.connect(url)
+
+
+def listar_migracoes(pasta=PASTA_MIGRACOES):
+    """Lista (versao, nome_arquivo, caminho) das migrações, em ordem"""
+    migracoes = []
+    for nome in sorted(os.listdir(pasta)):
+        encontrado = PADRAO_ARQUIVO.match(nome)
+        if encontrado:
+            migracoes.append((encontrado.group(1), nome, os.path.join(pasta, nome)))
+    return migracoes
+
+
+def checksum(sql):
+    """Identifica o conteúdo aplicado para avisar se o arquivo mudou depois"""
+    return hashlib.sha256(sql.encode('utf-8')).hexdigest()
+
+
+def garantir_tabela_controle(conn):
+    """Cria schema_migrations se ainda não existir"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versao TEXT PRIMARY KEY,
+            arquivo TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            aplicada_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def migracoes_aplicadas(conn):
+    """Dicionário versao -> checksum das migrações já registradas"""
+    cursor = conn.execute('SELECT versao, checksum FROM schema_migrations')
+    return dict(cursor.fetchall())
+
+
+def aplicar_migracoes(conn, pasta=PASTA_MIGRACOES, saida=print):
+    """Aplica as migrações pendentes, cada uma em sua própria transação
+
+    Retorna a lista de arquivos aplicados. Se uma migração falha, a
+    transação dela é desfeita e as seguintes não rodam.
+    """
+    with conn.transaction():
+        garantir_tabela_controle(conn)
+
+    aplicados = []
+    for versao, arquivo, caminho in listar_migracoes(pasta):
+        with open(caminho, encoding='utf-8') as f:
+            sql = f.read()
+
+        with conn.transaction():
+            conn.execute('SELECT pg_advisory_xact_lock(%s)', (TRAVA_MIGRACOES,))
+            # Relê dentro da trava: outro processo pode ter acabado de aplicar
+            aplicadas = migracoes_aplicadas(conn)
+            if versao in aplicadas:
+                if aplicadas[versao] != checksum(sql):
+                    saida(f"⚠️  {arquivo} foi alterado depois de aplicado (não será reaplicado)")
+                continue
+
+            saida(f"▶️  Aplicando {arquivo}...")
+            conn.execute(sql)
+            conn.execute(
+                'INSERT INTO schema_migrations (versao, arquivo, checksum) VALUES (%s, %s, %s)',
+                (versao, arquivo, checksum(sql))
+            )
+            aplicados.append(arquivo)
+
+    return aplicados
+
+
+def varreduras_sequenciais(plano, tabelas):
+    """Tabelas de `tabelas` lidas com Seq Scan em um plano EXPLAIN (FORMAT JSON)"""
+    encontradas = []
+    no = plano.get('Plan', plano)
+    if no.get('Node Type') == 'Seq Scan' and no.get('Relation Name') in tabelas:
+        encontradas.append(no['Relation Name'])
+    for filho in no.get('Plans', []):
+        encontradas.extend(varreduras_sequenciais(filho, tabelas))
+    return encontradas
+
+
+def verificar_indices(conn, consultas=CONSULTAS_REGISTROS, tabelas=TABELAS_INDEXADAS):
+    """Roda EXPLAIN em cada consulta e retorna [(nome, tabelas_com_seq_scan)]
+
+    O Seq Scan é desencorajado (enable_seqscan = off) para que o resultado não
+    dependa do tamanho da tabela: se ainda assim aparecer, não existe índice
+    que atenda a consulta.
+    """
+    problemas = []
+    for nome, sql in consultas:
+        with conn.transaction(force_rollback=True):
+            conn.execute('SET LOCAL enable_seqscan = off')
+            resultado = conn.execute(f'EXPLAIN (FORMAT JSON) {sql}').fetchone()[0]
+        plano = resultado[0] if isinstance(resultado, list) else json.loads(resultado)[0]
+        tabelas_seq = varreduras_sequenciais(plano, tabelas)
+        if tabelas_seq:
+            problemas.append((nome, tabelas_seq))
+    return problemas
+
+
+@click.group()
+def cli():
+    """Migrações do banco do placar"""
+
+
+@cli.command()
+def status():
+    """Mostra quais migrações já foram aplicadas"""
+    with conectar() as conn:
+        with conn.transaction():
+            garantir_tabela_controle(conn)
+            aplicadas = migracoes_aplicadas(conn)
+
+    for versao, arquivo, _ in listar_migracoes():
+        marca = '✅' if versao in aplicadas else '⏳'
+        click.echo(f"{marca} {arquivo}")
+
+
+@cli.command()
+def aplicar():
+    """Aplica as migrações pendentes em ordem"""
+    with conectar() as conn:
+        aplicados = aplicar_migracoes(conn, saida=click.echo)
+
+    if aplicados:
+        click.echo(f"✅ {len(aplicados)} migração(ões) aplicada(s)")
+    else:
+        click.echo("✅ Banco já está atualizado")
+
+
+@cli.command('verificar-indices')
+def verificar_indices_cmd():
+    """Falha se alguma consulta do app precisar de Seq Scan em registros"""
+    with conectar() as conn:
+        problemas = verificar_indices(conn)
+
+    for nome, _ in CONSULTAS_REGISTROS:
+        tabelas = dict(problemas).get(nome)
+        if tabelas:
+            click.echo(f"❌ {nome}: Seq Scan em {', '.join(tabelas)}")
+        else:
+            click.echo(f"✅ {nome}")
+
+    if problemas:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
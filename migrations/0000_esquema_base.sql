@@ -0,0 +1,61 @@
+-- Esquema base: tabelas equipes e registros
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Idempotente: em um projeto que já tem as tabelas (criadas pelo
+-- SUPABASE_SETUP.md) nada é recriado, só o que faltar é adicionado.
+CREATE TABLE IF NOT EXISTS equipes (
+    id SERIAL PRIMARY KEY,
+    nome VARCHAR(100) NOT NULL,
+    logo_url TEXT,
+    pontuacao_total INTEGER DEFAULT 0,
+    data_criacao TIMESTAMP DEFAULT NOW(),
+    data_atualizacao TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS registros (
+    id SERIAL PRIMARY KEY,
+    equipe_id INTEGER REFERENCES equipes(id) ON DELETE CASCADE,
+    data_inicio DATE NOT NULL,
+    data_fim DATE NOT NULL,
+    data_registro TIMESTAMP DEFAULT NOW(),
+    qtd_pessoas INTEGER DEFAULT 0,
+    qtd_pessoas_novas INTEGER DEFAULT 0,
+    qtd_celulas_elite INTEGER DEFAULT 0,
+    qtd_pessoas_terca INTEGER DEFAULT 0,
+    qtd_pessoas_novas_terca INTEGER DEFAULT 0,
+    qtd_pessoas_arena INTEGER DEFAULT 0,
+    qtd_pessoas_novas_arena INTEGER DEFAULT 0,
+    qtd_pessoas_domingo INTEGER DEFAULT 0,
+    qtd_pessoas_novas_domingo INTEGER DEFAULT 0,
+    valor_arrecadacao_parceiro DECIMAL(10,2) DEFAULT 0,
+    pontuacao INTEGER DEFAULT 0
+);
+
+-- Colunas adicionadas depois da primeira versão das tabelas
+ALTER TABLE equipes ADD COLUMN IF NOT EXISTS logo_url TEXT;
+ALTER TABLE equipes ADD COLUMN IF NOT EXISTS data_atualizacao TIMESTAMP DEFAULT NOW();
+
+-- Habilitar RLS (Row Level Security)
+ALTER TABLE equipes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE registros ENABLE ROW LEVEL SECURITY;
+
+-- Política para permitir todas as operações (para desenvolvimento)
+DROP POLICY IF EXISTS "Enable all operations for equipes" ON equipes;
+CREATE POLICY "Enable all operations for equipes" ON equipes FOR ALL USING (true);
+DROP POLICY IF EXISTS "Enable all operations for registros" ON registros;
+CREATE POLICY "Enable all operations for registros" ON registros FOR ALL USING (true);
+
+-- Trigger para atualização automática de data
+CREATE OR REPLACE FUNCTION update_modified_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.data_atualizacao = NOW();
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_equipes_modtime ON equipes;
+CREATE TRIGGER update_equipes_modtime
+    BEFORE UPDATE ON equipes
+    FOR EACH ROW
+    EXECUTE FUNCTION update_modified_column();
@@ -0,0 +1,14 @@
+-- Script para adicionar as colunas de células na tabela registros
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+-- (mesmo SQL do Passo 1 de ATUALIZACAO_CELULAS.md)
+
+-- Adicionar campo qtd_celulas (informativo - quantidade planejada)
+ALTER TABLE registros
+ADD COLUMN IF NOT EXISTS qtd_celulas INTEGER DEFAULT 0;
+
+-- Adicionar campo qtd_celulas_realizadas (pontua 10 cada)
+ALTER TABLE registros
+ADD COLUMN IF NOT EXISTS qtd_celulas_realizadas INTEGER DEFAULT 0;
+
+COMMENT ON COLUMN registros.qtd_celulas IS 'Quantidade de células planejadas (informativo)';
+COMMENT ON COLUMN registros.qtd_celulas_realizadas IS 'Quantidade de células que aconteceram (10 pontos cada)';
@@ -1,5 +1,5 @@
 -- Script para adicionar coluna qtd_revisao_vidas na tabela registros
--- Execute este script no painel do Supabase
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
 
 -- Adicionar coluna qtd_revisao_vidas na tabela registros
 ALTER TABLE registros 
@@ -0,0 +1,119 @@
+-- Script para criar as funções de escrita atômica de registros
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Cada função grava o registro e ajusta equipes.pontuacao_total na mesma
+-- transação, em uma única chamada. O ajuste é um incremento feito pelo
+-- próprio banco (pontuacao_total = pontuacao_total + delta), então dois
+-- líderes enviando ao mesmo tempo não perdem pontos um do outro.
+-- A pontuação do registro continua sendo calculada em Python
+-- (calcular_pontuacao) e chega pronta no campo "pontuacao".
+
+-- Ajusta a pontuação total de uma equipe somando um delta
+CREATE OR REPLACE FUNCTION ajustar_pontuacao_equipe(p_equipe_id INTEGER, p_delta INTEGER)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    UPDATE equipes
+    SET pontuacao_total = pontuacao_total + p_delta
+    WHERE id = p_equipe_id
+    RETURNING pontuacao_total;
+$$;
+
+-- Insere um registro e soma sua pontuação à equipe
+CREATE OR REPLACE FUNCTION criar_registro_atomico(p_registro JSONB)
+RETURNS SETOF registros
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    novo registros;
+BEGIN
+    INSERT INTO registros (
+        equipe_id, data_inicio, data_fim,
+        qtd_pessoas, qtd_pessoas_novas, qtd_celulas, qtd_celulas_realizadas, qtd_celulas_elite,
+        qtd_pessoas_terca, qtd_pessoas_novas_terca,
+        qtd_pessoas_arena, qtd_pessoas_novas_arena,
+        qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+        valor_arrecadacao_parceiro, qtd_revisao_vidas, pontuacao
+    )
+    SELECT d.equipe_id, d.data_inicio, d.data_fim,
+           d.qtd_pessoas, d.qtd_pessoas_novas, d.qtd_celulas, d.qtd_celulas_realizadas, d.qtd_celulas_elite,
+           d.qtd_pessoas_terca, d.qtd_pessoas_novas_terca,
+           d.qtd_pessoas_arena, d.qtd_pessoas_novas_arena,
+           d.qtd_pessoas_domingo, d.qtd_pessoas_novas_domingo,
+           d.valor_arrecadacao_parceiro, d.qtd_revisao_vidas, d.pontuacao
+    FROM jsonb_populate_record(NULL::registros, p_registro) d
+    RETURNING * INTO novo;
+
+    UPDATE equipes
+    SET pontuacao_total = pontuacao_total + novo.pontuacao
+    WHERE id = novo.equipe_id;
+
+    RETURN NEXT novo;
+END;
+$$;
+
+-- Atualiza um registro e aplica a diferença de pontuação à equipe.
+-- Não retorna linhas se o registro não existir.
+CREATE OR REPLACE FUNCTION editar_registro_atomico(p_registro_id INTEGER, p_registro JSONB)
+RETURNS SETOF registros
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    antigo registros;
+    novo registros;
+BEGIN
+    SELECT * INTO antigo FROM registros WHERE id = p_registro_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    UPDATE registros r
+    SET data_inicio = d.data_inicio,
+        data_fim = d.data_fim,
+        qtd_pessoas = d.qtd_pessoas,
+        qtd_pessoas_novas = d.qtd_pessoas_novas,
+        qtd_celulas = d.qtd_celulas,
+        qtd_celulas_realizadas = d.qtd_celulas_realizadas,
+        qtd_celulas_elite = d.qtd_celulas_elite,
+        qtd_pessoas_terca = d.qtd_pessoas_terca,
+        qtd_pessoas_novas_terca = d.qtd_pessoas_novas_terca,
+        qtd_pessoas_arena = d.qtd_pessoas_arena,
+        qtd_pessoas_novas_arena = d.qtd_pessoas_novas_arena,
+        qtd_pessoas_domingo = d.qtd_pessoas_domingo,
+        qtd_pessoas_novas_domingo = d.qtd_pessoas_novas_domingo,
+        valor_arrecadacao_parceiro = d.valor_arrecadacao_parceiro,
+        qtd_revisao_vidas = d.qtd_revisao_vidas,
+        pontuacao = d.pontuacao
+    FROM jsonb_populate_record(NULL::registros, p_registro) d
+    WHERE r.id = p_registro_id
+    RETURNING r.* INTO novo;
+
+    UPDATE equipes
+    SET pontuacao_total = pontuacao_total + (novo.pontuacao - antigo.pontuacao)
+    WHERE id = novo.equipe_id;
+
+    RETURN NEXT novo;
+END;
+$$;
+
+-- Exclui um registro e subtrai sua pontuação da equipe.
+-- Não retorna linhas se o registro não existir.
+CREATE OR REPLACE FUNCTION excluir_registro_atomico(p_registro_id INTEGER)
+RETURNS SETOF registros
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    antigo registros;
+BEGIN
+    DELETE FROM registros WHERE id = p_registro_id RETURNING * INTO antigo;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    UPDATE equipes
+    SET pontuacao_total = pontuacao_total - antigo.pontuacao
+    WHERE id = antigo.equipe_id;
+
+    RETURN NEXT antigo;
+END;
+$$;
@@ -0,0 +1,58 @@
+-- Script para criar a função reconciliar_pontuacao
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Compara equipes.pontuacao_total com SUM(registros.pontuacao) de cada
+-- equipe em uma única consulta agrupada e retorna as equipes divergentes.
+-- Com p_aplicar = TRUE corrige todas elas em um único UPDATE.
+--
+-- Ao aplicar, a tabela equipes é travada contra escritas concorrentes
+-- (SHARE ROW EXCLUSIVE) antes de somar: registros sendo gravados ao mesmo
+-- tempo esperam a correção terminar e então somam o seu delta por cima.
+CREATE OR REPLACE FUNCTION reconciliar_pontuacao(p_aplicar BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (
+    equipe_id INTEGER,
+    nome TEXT,
+    pontuacao_armazenada INTEGER,
+    pontuacao_real INTEGER,
+    diferenca INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF p_aplicar THEN
+        LOCK TABLE equipes IN SHARE ROW EXCLUSIVE MODE;
+    END IF;
+
+    RETURN QUERY
+    WITH reais AS (
+        SELECT e.id, COALESCE(SUM(r.pontuacao), 0)::INTEGER AS total
+        FROM equipes e
+        LEFT JOIN registros r ON r.equipe_id = e.id
+        GROUP BY e.id
+    ),
+    divergentes AS (
+        SELECT e.id, e.nome, e.pontuacao_total, reais.total
+        FROM equipes e
+        JOIN reais ON reais.id = e.id
+        WHERE e.pontuacao_total IS DISTINCT FROM reais.total
+    ),
+    corrigidas AS (
+        UPDATE equipes e
+        SET pontuacao_total = d.total
+        FROM divergentes d
+        WHERE p_aplicar AND e.id = d.id
+        RETURNING e.id
+    )
+    SELECT d.id,
+           d.nome::TEXT,
+           d.pontuacao_total,
+           d.total,
+           d.total - COALESCE(d.pontuacao_total, 0)
+    FROM divergentes d
+    ORDER BY abs(d.total - COALESCE(d.pontuacao_total, 0)) DESC, d.id;
+END;
+$$;
+
+-- Relatório (sem alterar nada)
+SELECT * FROM reconciliar_pontuacao(FALSE);
@@ -0,0 +1,42 @@
+-- Script para criar o índice de ranking e a função posicao_equipe
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Índice na mesma ordem do placar geral (pontuação desc, id como desempate).
+-- Serve tanto para listar o placar quanto para contar quem está à frente
+-- de uma equipe sem percorrer a tabela inteira.
+CREATE INDEX IF NOT EXISTS idx_equipes_ranking
+    ON equipes (pontuacao_total DESC, id);
+
+-- Retorna uma equipe com sua posição no placar geral.
+-- A posição é 1 + quantidade de equipes à frente no índice acima,
+-- resolvida com uma busca por faixa no índice (O(log n) + equipes à frente).
+CREATE OR REPLACE FUNCTION posicao_equipe(p_equipe_id INTEGER)
+RETURNS TABLE (
+    id INTEGER,
+    nome TEXT,
+    logo_url TEXT,
+    pontuacao_total INTEGER,
+    posicao BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT e.id,
+           e.nome::TEXT,
+           e.logo_url,
+           e.pontuacao_total,
+           1 + (
+               SELECT COUNT(*)
+               FROM equipes f
+               WHERE f.pontuacao_total > e.pontuacao_total
+           ) + (
+               SELECT COUNT(*)
+               FROM equipes f
+               WHERE f.pontuacao_total = e.pontuacao_total
+                 AND f.id < e.id
+           )
+    FROM equipes e
+    WHERE e.id = p_equipe_id;
+$$;
+
+-- Verificar se a função foi criada
+SELECT * FROM posicao_equipe((SELECT MIN(id) FROM equipes));
@@ -0,0 +1,34 @@
+-- Script para criar a função resumo_registros
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Totais de cabeçalho do histórico e do relatório por período, calculados
+-- no servidor. As páginas listam os registros aos poucos (paginação por
+-- data_registro, id), então os totais não podem mais ser somados no template.
+-- Filtros nulos são ignorados (ex.: só equipe, só período ou ambos).
+CREATE OR REPLACE FUNCTION resumo_registros(
+    p_equipe_id INTEGER DEFAULT NULL,
+    p_data_inicio DATE DEFAULT NULL,
+    p_data_fim DATE DEFAULT NULL
+)
+RETURNS TABLE (
+    total_registros BIGINT,
+    total_pontos BIGINT,
+    total_pessoas_novas BIGINT,
+    total_arrecadacao NUMERIC,
+    total_revisao_vidas BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT COUNT(*),
+           COALESCE(SUM(r.pontuacao), 0)::BIGINT,
+           COALESCE(SUM(r.qtd_pessoas_novas), 0)::BIGINT,
+           COALESCE(SUM(r.valor_arrecadacao_parceiro), 0)::NUMERIC,
+           COALESCE(SUM(r.qtd_revisao_vidas), 0)::BIGINT
+    FROM registros r
+    WHERE (p_equipe_id IS NULL OR r.equipe_id = p_equipe_id)
+      AND (p_data_inicio IS NULL OR r.data_inicio >= p_data_inicio)
+      AND (p_data_fim IS NULL OR r.data_fim <= p_data_fim);
+$$;
+
+-- Verificar se a função foi criada
+SELECT * FROM resumo_registros(NULL, CURRENT_DATE - 30, CURRENT_DATE);
@@ -0,0 +1,242 @@
+-- Script para criar o resumo semanal de registros (registros_semana)
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+-- (0008 e 0009 leem daqui através de totais_periodo)
+
+-- Somas por equipe e semana de todos os quesitos e da pontuação.
+-- A semana é a do início e a do fim do registro (segunda-feira, padrão ISO),
+-- assim um período que começa numa segunda e termina num domingo pode ser
+-- respondido só com este resumo, com o mesmo resultado do filtro
+-- data_inicio >= início AND data_fim <= fim sobre a tabela registros.
+CREATE TABLE IF NOT EXISTS registros_semana (
+    equipe_id INTEGER NOT NULL REFERENCES equipes(id) ON DELETE CASCADE,
+    semana_inicio DATE NOT NULL,
+    semana_fim DATE NOT NULL,
+    qtd_registros INTEGER NOT NULL DEFAULT 0,
+    pontuacao BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_novas BIGINT NOT NULL DEFAULT 0,
+    qtd_celulas_realizadas BIGINT NOT NULL DEFAULT 0,
+    qtd_celulas_elite BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_terca BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_novas_terca BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_arena BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_novas_arena BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_domingo BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_novas_domingo BIGINT NOT NULL DEFAULT 0,
+    valor_arrecadacao_parceiro NUMERIC NOT NULL DEFAULT 0,
+    qtd_revisao_vidas BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (equipe_id, semana_inicio, semana_fim)
+);
+
+CREATE INDEX IF NOT EXISTS idx_registros_semana_periodo
+    ON registros_semana (semana_inicio, semana_fim);
+
+ALTER TABLE registros_semana ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for registros_semana" ON registros_semana;
+CREATE POLICY "Enable all operations for registros_semana" ON registros_semana FOR ALL USING (true);
+
+-- Soma (p_sinal = 1) ou subtrai (p_sinal = -1) um registro do resumo.
+-- A subtração só atualiza linhas existentes: quando a equipe inteira é
+-- excluída, o resumo dela já saiu pelo ON DELETE CASCADE e não há o que
+-- descontar (nem equipe para referenciar).
+CREATE OR REPLACE FUNCTION acumular_registro_semana(r registros, p_sinal INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_semana_inicio DATE := date_trunc('week', r.data_inicio)::DATE;
+    v_semana_fim DATE := date_trunc('week', r.data_fim)::DATE;
+BEGIN
+    IF p_sinal < 0 THEN
+        UPDATE registros_semana s SET
+            qtd_registros = s.qtd_registros - 1,
+            pontuacao = s.pontuacao - COALESCE(r.pontuacao, 0),
+            qtd_pessoas_novas = s.qtd_pessoas_novas - COALESCE(r.qtd_pessoas_novas, 0),
+            qtd_celulas_realizadas = s.qtd_celulas_realizadas - COALESCE(r.qtd_celulas_realizadas, 0),
+            qtd_celulas_elite = s.qtd_celulas_elite - COALESCE(r.qtd_celulas_elite, 0),
+            qtd_pessoas_terca = s.qtd_pessoas_terca - COALESCE(r.qtd_pessoas_terca, 0),
+            qtd_pessoas_novas_terca = s.qtd_pessoas_novas_terca - COALESCE(r.qtd_pessoas_novas_terca, 0),
+            qtd_pessoas_arena = s.qtd_pessoas_arena - COALESCE(r.qtd_pessoas_arena, 0),
+            qtd_pessoas_novas_arena = s.qtd_pessoas_novas_arena - COALESCE(r.qtd_pessoas_novas_arena, 0),
+            qtd_pessoas_domingo = s.qtd_pessoas_domingo - COALESCE(r.qtd_pessoas_domingo, 0),
+            qtd_pessoas_novas_domingo = s.qtd_pessoas_novas_domingo - COALESCE(r.qtd_pessoas_novas_domingo, 0),
+            valor_arrecadacao_parceiro = s.valor_arrecadacao_parceiro - COALESCE(r.valor_arrecadacao_parceiro, 0),
+            qtd_revisao_vidas = s.qtd_revisao_vidas - COALESCE(r.qtd_revisao_vidas, 0)
+        WHERE s.equipe_id = r.equipe_id
+          AND s.semana_inicio = v_semana_inicio
+          AND s.semana_fim = v_semana_fim;
+
+        -- Semana que ficou sem registros sai do resumo
+        DELETE FROM registros_semana s
+        WHERE s.equipe_id = r.equipe_id
+          AND s.semana_inicio = v_semana_inicio
+          AND s.semana_fim = v_semana_fim
+          AND s.qtd_registros <= 0;
+        RETURN;
+    END IF;
+
+    INSERT INTO registros_semana AS s (
+        equipe_id, semana_inicio, semana_fim, qtd_registros, pontuacao,
+        qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+        qtd_pessoas_terca, qtd_pessoas_novas_terca,
+        qtd_pessoas_arena, qtd_pessoas_novas_arena,
+        qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+        valor_arrecadacao_parceiro, qtd_revisao_vidas
+    )
+    VALUES (
+        r.equipe_id, v_semana_inicio, v_semana_fim, 1, COALESCE(r.pontuacao, 0),
+        COALESCE(r.qtd_pessoas_novas, 0),
+        COALESCE(r.qtd_celulas_realizadas, 0),
+        COALESCE(r.qtd_celulas_elite, 0),
+        COALESCE(r.qtd_pessoas_terca, 0),
+        COALESCE(r.qtd_pessoas_novas_terca, 0),
+        COALESCE(r.qtd_pessoas_arena, 0),
+        COALESCE(r.qtd_pessoas_novas_arena, 0),
+        COALESCE(r.qtd_pessoas_domingo, 0),
+        COALESCE(r.qtd_pessoas_novas_domingo, 0),
+        COALESCE(r.valor_arrecadacao_parceiro, 0),
+        COALESCE(r.qtd_revisao_vidas, 0)
+    )
+    ON CONFLICT (equipe_id, semana_inicio, semana_fim) DO UPDATE SET
+        qtd_registros = s.qtd_registros + EXCLUDED.qtd_registros,
+        pontuacao = s.pontuacao + EXCLUDED.pontuacao,
+        qtd_pessoas_novas = s.qtd_pessoas_novas + EXCLUDED.qtd_pessoas_novas,
+        qtd_celulas_realizadas = s.qtd_celulas_realizadas + EXCLUDED.qtd_celulas_realizadas,
+        qtd_celulas_elite = s.qtd_celulas_elite + EXCLUDED.qtd_celulas_elite,
+        qtd_pessoas_terca = s.qtd_pessoas_terca + EXCLUDED.qtd_pessoas_terca,
+        qtd_pessoas_novas_terca = s.qtd_pessoas_novas_terca + EXCLUDED.qtd_pessoas_novas_terca,
+        qtd_pessoas_arena = s.qtd_pessoas_arena + EXCLUDED.qtd_pessoas_arena,
+        qtd_pessoas_novas_arena = s.qtd_pessoas_novas_arena + EXCLUDED.qtd_pessoas_novas_arena,
+        qtd_pessoas_domingo = s.qtd_pessoas_domingo + EXCLUDED.qtd_pessoas_domingo,
+        qtd_pessoas_novas_domingo = s.qtd_pessoas_novas_domingo + EXCLUDED.qtd_pessoas_novas_domingo,
+        valor_arrecadacao_parceiro = s.valor_arrecadacao_parceiro + EXCLUDED.valor_arrecadacao_parceiro,
+        qtd_revisao_vidas = s.qtd_revisao_vidas + EXCLUDED.qtd_revisao_vidas;
+END;
+$$;
+
+-- Mantém o resumo em dia a cada insert/update/delete em registros
+CREATE OR REPLACE FUNCTION atualizar_registros_semana()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM acumular_registro_semana(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM acumular_registro_semana(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Reconstrói o resumo a partir dos registros existentes e liga o trigger.
+-- Pode ser executado de novo a qualquer momento para recalcular tudo; o
+-- arquivo inteiro roda numa única transação (migracoes.py ou SQL Editor).
+LOCK TABLE registros IN SHARE MODE;
+
+DROP TRIGGER IF EXISTS registros_semana_sync ON registros;
+TRUNCATE registros_semana;
+
+INSERT INTO registros_semana (
+    equipe_id, semana_inicio, semana_fim, qtd_registros, pontuacao,
+    qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+    qtd_pessoas_terca, qtd_pessoas_novas_terca,
+    qtd_pessoas_arena, qtd_pessoas_novas_arena,
+    qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+    valor_arrecadacao_parceiro, qtd_revisao_vidas
+)
+SELECT r.equipe_id,
+       date_trunc('week', r.data_inicio)::DATE,
+       date_trunc('week', r.data_fim)::DATE,
+       COUNT(*),
+       COALESCE(SUM(r.pontuacao), 0),
+       COALESCE(SUM(r.qtd_pessoas_novas), 0),
+       COALESCE(SUM(r.qtd_celulas_realizadas), 0),
+       COALESCE(SUM(r.qtd_celulas_elite), 0),
+       COALESCE(SUM(r.qtd_pessoas_terca), 0),
+       COALESCE(SUM(r.qtd_pessoas_novas_terca), 0),
+       COALESCE(SUM(r.qtd_pessoas_arena), 0),
+       COALESCE(SUM(r.qtd_pessoas_novas_arena), 0),
+       COALESCE(SUM(r.qtd_pessoas_domingo), 0),
+       COALESCE(SUM(r.qtd_pessoas_novas_domingo), 0),
+       COALESCE(SUM(r.valor_arrecadacao_parceiro), 0),
+       COALESCE(SUM(r.qtd_revisao_vidas), 0)
+FROM registros r
+GROUP BY 1, 2, 3;
+
+CREATE TRIGGER registros_semana_sync
+    AFTER INSERT OR UPDATE OR DELETE ON registros
+    FOR EACH ROW
+    EXECUTE FUNCTION atualizar_registros_semana();
+
+-- Totais por equipe de um período. Quando o período vai de uma segunda a um
+-- domingo lê o resumo semanal (dezenas de linhas por temporada); senão soma
+-- os registros do período como antes.
+CREATE OR REPLACE FUNCTION totais_periodo(p_data_inicio DATE, p_data_fim DATE)
+RETURNS TABLE (
+    equipe_id INTEGER,
+    registros_periodo BIGINT,
+    pontuacao_periodo BIGINT,
+    pessoas_novas BIGINT,
+    celulas_realizadas BIGINT,
+    celulas_elite BIGINT,
+    pessoas_terca BIGINT,
+    pessoas_novas_terca BIGINT,
+    pessoas_arena BIGINT,
+    pessoas_novas_arena BIGINT,
+    pessoas_domingo BIGINT,
+    pessoas_novas_domingo BIGINT,
+    valor_arrecadacao NUMERIC,
+    revisao_vidas BIGINT
+)
+LANGUAGE plpgsql STABLE
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF EXTRACT(ISODOW FROM p_data_inicio) = 1 AND EXTRACT(ISODOW FROM p_data_fim) = 7 THEN
+        RETURN QUERY
+        SELECT s.equipe_id,
+               SUM(s.qtd_registros)::BIGINT,
+               SUM(s.pontuacao)::BIGINT,
+               SUM(s.qtd_pessoas_novas)::BIGINT,
+               SUM(s.qtd_celulas_realizadas)::BIGINT,
+               SUM(s.qtd_celulas_elite)::BIGINT,
+               SUM(s.qtd_pessoas_terca)::BIGINT,
+               SUM(s.qtd_pessoas_novas_terca)::BIGINT,
+               SUM(s.qtd_pessoas_arena)::BIGINT,
+               SUM(s.qtd_pessoas_novas_arena)::BIGINT,
+               SUM(s.qtd_pessoas_domingo)::BIGINT,
+               SUM(s.qtd_pessoas_novas_domingo)::BIGINT,
+               SUM(s.valor_arrecadacao_parceiro)::NUMERIC,
+               SUM(s.qtd_revisao_vidas)::BIGINT
+        FROM registros_semana s
+        WHERE s.semana_inicio >= p_data_inicio
+          AND s.semana_fim <= p_data_fim - 6
+        GROUP BY s.equipe_id;
+    ELSE
+        RETURN QUERY
+        SELECT r.equipe_id,
+               COUNT(*)::BIGINT,
+               COALESCE(SUM(r.pontuacao), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_celulas_realizadas), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_celulas_elite), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_terca), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_terca), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_arena), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_arena), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_domingo), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_domingo), 0)::BIGINT,
+               COALESCE(SUM(r.valor_arrecadacao_parceiro), 0)::NUMERIC,
+               COALESCE(SUM(r.qtd_revisao_vidas), 0)::BIGINT
+        FROM registros r
+        WHERE r.data_inicio >= p_data_inicio
+          AND r.data_fim <= p_data_fim
+        GROUP BY r.equipe_id;
+    END IF;
+END;
+$$;
+
+-- Verificar: as duas formas devem dar o mesmo resultado numa semana fechada
+SELECT * FROM totais_periodo(date_trunc('week', CURRENT_DATE)::DATE - 7,
+                             date_trunc('week', CURRENT_DATE)::DATE - 1);
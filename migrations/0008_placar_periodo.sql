@@ -0,0 +1,30 @@
+-- Script para criar a função placar_periodo (Placar 1 por período)
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Retorna todas as equipes com a pontuação e a quantidade de registros
+-- do período, agregadas em uma única consulta no servidor. Os totais vêm de
+-- totais_periodo, que usa o resumo semanal quando o período fecha semanas.
+CREATE OR REPLACE FUNCTION placar_periodo(p_data_inicio DATE, p_data_fim DATE)
+RETURNS TABLE (
+    id INTEGER,
+    nome TEXT,
+    logo_url TEXT,
+    pontuacao_total INTEGER,
+    pontuacao_periodo BIGINT,
+    registros_periodo BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT e.id,
+           e.nome::TEXT,
+           e.logo_url,
+           e.pontuacao_total,
+           COALESCE(t.pontuacao_periodo, 0)::BIGINT,
+           COALESCE(t.registros_periodo, 0)::BIGINT
+    FROM equipes e
+    LEFT JOIN totais_periodo(p_data_inicio, p_data_fim) t ON t.equipe_id = e.id
+    ORDER BY COALESCE(t.pontuacao_periodo, 0) DESC, e.id;
+$$;
+
+-- Verificar se a função foi criada
+SELECT * FROM placar_periodo(CURRENT_DATE - 7, CURRENT_DATE);
@@ -0,0 +1,105 @@
+-- Script para criar a função placar_ranking_periodo (Placar 2 por período)
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Retorna todas as equipes com os totais de cada quesito no período, a
+-- posição da equipe em cada quesito e a pontuação final por ranking.
+-- Regras iguais às de calcular_pontuacao_ranking em app_supabase.py:
+--   * só concorrem equipes com valor > 0 no quesito;
+--   * empatadas dividem a mesma posição e a próxima posição pula o
+--     tamanho do grupo (RANK(), não DENSE_RANK());
+--   * 1º, 2º e 3º lugares recebem os pontos de PONTUACAO_RANKING.
+CREATE OR REPLACE FUNCTION placar_ranking_periodo(
+    p_data_inicio DATE,
+    p_data_fim DATE,
+    p_pontos_primeiro INTEGER DEFAULT 5,
+    p_pontos_segundo INTEGER DEFAULT 3,
+    p_pontos_terceiro INTEGER DEFAULT 1,
+    p_pontos_demais INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER,
+    nome TEXT,
+    logo_url TEXT,
+    pontuacao_total INTEGER,
+    pessoas_novas BIGINT,
+    celulas_realizadas BIGINT,
+    celulas_elite BIGINT,
+    pessoas_terca BIGINT,
+    pessoas_novas_terca BIGINT,
+    pessoas_arena BIGINT,
+    pessoas_novas_arena BIGINT,
+    pessoas_domingo BIGINT,
+    pessoas_novas_domingo BIGINT,
+    valor_arrecadacao NUMERIC,
+    revisao_vidas BIGINT,
+    posicoes JSONB,
+    pontuacao_ranking BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH totais AS (
+        -- Resumo semanal quando o período fecha semanas (ver 0007_registros_semana.sql)
+        SELECT * FROM totais_periodo(p_data_inicio, p_data_fim)
+    ),
+    quesitos AS (
+        SELECT t.equipe_id, q.quesito, q.valor
+        FROM totais t
+        CROSS JOIN LATERAL (VALUES
+            ('pessoas_novas', t.pessoas_novas::NUMERIC),
+            ('celulas_realizadas', t.celulas_realizadas::NUMERIC),
+            ('celulas_elite', t.celulas_elite::NUMERIC),
+            ('pessoas_terca', t.pessoas_terca::NUMERIC),
+            ('pessoas_novas_terca', t.pessoas_novas_terca::NUMERIC),
+            ('pessoas_arena', t.pessoas_arena::NUMERIC),
+            ('pessoas_novas_arena', t.pessoas_novas_arena::NUMERIC),
+            ('pessoas_domingo', t.pessoas_domingo::NUMERIC),
+            ('pessoas_novas_domingo', t.pessoas_novas_domingo::NUMERIC),
+            ('valor_arrecadacao', t.valor_arrecadacao),
+            ('revisao_vidas', t.revisao_vidas::NUMERIC)
+        ) AS q(quesito, valor)
+        WHERE q.valor > 0
+    ),
+    ranking AS (
+        SELECT q.equipe_id,
+               q.quesito,
+               RANK() OVER (PARTITION BY q.quesito ORDER BY q.valor DESC) AS posicao
+        FROM quesitos q
+    ),
+    pontos AS (
+        SELECT rk.equipe_id,
+               jsonb_object_agg(rk.quesito, rk.posicao) AS posicoes,
+               SUM(CASE rk.posicao
+                       WHEN 1 THEN p_pontos_primeiro
+                       WHEN 2 THEN p_pontos_segundo
+                       WHEN 3 THEN p_pontos_terceiro
+                       ELSE p_pontos_demais
+                   END)::BIGINT AS pontuacao_ranking
+        FROM ranking rk
+        GROUP BY rk.equipe_id
+    )
+    SELECT e.id,
+           e.nome::TEXT,
+           e.logo_url,
+           e.pontuacao_total,
+           COALESCE(t.pessoas_novas, 0),
+           COALESCE(t.celulas_realizadas, 0),
+           COALESCE(t.celulas_elite, 0),
+           COALESCE(t.pessoas_terca, 0),
+           COALESCE(t.pessoas_novas_terca, 0),
+           COALESCE(t.pessoas_arena, 0),
+           COALESCE(t.pessoas_novas_arena, 0),
+           COALESCE(t.pessoas_domingo, 0),
+           COALESCE(t.pessoas_novas_domingo, 0),
+           COALESCE(t.valor_arrecadacao, 0),
+           COALESCE(t.revisao_vidas, 0),
+           COALESCE(p.posicoes, '{}'::JSONB),
+           COALESCE(p.pontuacao_ranking, 0)
+    FROM equipes e
+    LEFT JOIN totais t ON t.equipe_id = e.id
+    LEFT JOIN pontos p ON p.equipe_id = e.id
+    ORDER BY COALESCE(p.pontuacao_ranking, 0) DESC, e.id;
+$$;
+
+-- Verificar se a função foi criada
+SELECT id, nome, pontuacao_ranking, posicoes
+FROM placar_ranking_periodo(CURRENT_DATE - 7, CURRENT_DATE);
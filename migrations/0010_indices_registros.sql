@@ -0,0 +1,26 @@
+-- Índices de registros para as consultas do app_supabase.py
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+-- Confira com `python migracoes.py verificar-indices` (nenhum Seq Scan).
+
+-- Histórico da equipe e relatório filtrado por equipe:
+--   WHERE equipe_id = ? [AND cursor] ORDER BY data_registro DESC, id DESC
+-- A página sai direto do índice, já na ordem, sem ordenar nada. O INCLUDE
+-- deixa a reconciliação (SUM(pontuacao) GROUP BY equipe_id) só no índice,
+-- e a coluna líder também atende o ON DELETE CASCADE de equipes.
+CREATE INDEX IF NOT EXISTS idx_registros_equipe_recentes
+    ON registros (equipe_id, data_registro DESC, id DESC)
+    INCLUDE (pontuacao);
+
+-- Filtro de período usado pelo relatório, pelo resumo e por totais_periodo:
+--   WHERE data_inicio >= ? AND data_fim <= ?
+-- data_fim fica no índice e é filtrada sem visitar a tabela.
+CREATE INDEX IF NOT EXISTS idx_registros_periodo
+    ON registros (data_inicio, data_fim);
+
+-- Relatório por período de todas as equipes, paginado por (data_registro, id):
+-- o planejador pode percorrer este índice na ordem e parar após uma página
+-- quando o período cobre boa parte dos registros.
+CREATE INDEX IF NOT EXISTS idx_registros_recentes
+    ON registros (data_registro DESC, id DESC);
+
+ANALYZE registros;
@@ -0,0 +1,63 @@
+-- Marcas de alteração e exclusão para o espelho SQLite (espelho_sqlite.py)
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- O espelho busca só o que mudou desde a última sincronização, pela marca
+-- (data_atualizacao, id). equipes já tem data_atualizacao (trigger
+-- update_equipes_modtime); registros passa a ter também.
+ALTER TABLE registros ADD COLUMN IF NOT EXISTS data_atualizacao TIMESTAMP;
+UPDATE registros SET data_atualizacao = COALESCE(data_registro, NOW())
+WHERE data_atualizacao IS NULL;
+ALTER TABLE registros ALTER COLUMN data_atualizacao SET DEFAULT NOW();
+ALTER TABLE registros ALTER COLUMN data_atualizacao SET NOT NULL;
+
+DROP TRIGGER IF EXISTS update_registros_modtime ON registros;
+CREATE TRIGGER update_registros_modtime
+    BEFORE UPDATE ON registros
+    FOR EACH ROW
+    EXECUTE FUNCTION update_modified_column();
+
+CREATE INDEX IF NOT EXISTS idx_registros_atualizacao
+    ON registros (data_atualizacao, id);
+CREATE INDEX IF NOT EXISTS idx_equipes_atualizacao
+    ON equipes (data_atualizacao, id);
+
+-- Linhas excluídas não aparecem mais na consulta por data_atualizacao: cada
+-- exclusão deixa aqui uma marca para o espelho apagar a sua cópia
+-- (inclusive os registros removidos pelo ON DELETE CASCADE de equipes).
+CREATE TABLE IF NOT EXISTS exclusoes (
+    tabela TEXT NOT NULL,
+    registro_id INTEGER NOT NULL,
+    excluido_em TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (tabela, registro_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_exclusoes_excluido_em
+    ON exclusoes (excluido_em, registro_id);
+
+ALTER TABLE exclusoes ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for exclusoes" ON exclusoes;
+CREATE POLICY "Enable all operations for exclusoes" ON exclusoes FOR ALL USING (true);
+
+CREATE OR REPLACE FUNCTION registrar_exclusao()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO exclusoes (tabela, registro_id)
+    VALUES (TG_TABLE_NAME, OLD.id)
+    ON CONFLICT (tabela, registro_id) DO UPDATE SET excluido_em = NOW();
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS registros_exclusao ON registros;
+CREATE TRIGGER registros_exclusao
+    AFTER DELETE ON registros
+    FOR EACH ROW
+    EXECUTE FUNCTION registrar_exclusao();
+
+DROP TRIGGER IF EXISTS equipes_exclusao ON equipes;
+CREATE TRIGGER equipes_exclusao
+    AFTER DELETE ON equipes
+    FOR EACH ROW
+    EXECUTE FUNCTION registrar_exclusao();
@@ -0,0 +1,49 @@
+-- Script para criar a função registrar_lote (envio do diário de registros)
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Cada registro anotado no diário local (diario_registros.py) leva uma
+-- chave gerada no app. A chave é única: reenviar um lote que já chegou
+-- (resposta perdida, dois workers enviando o mesmo lote) não duplica nada.
+ALTER TABLE registros ADD COLUMN IF NOT EXISTS chave_cliente UUID;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_registros_chave_cliente
+    ON registros (chave_cliente);
+
+-- Insere um lote de registros e soma a pontuação de cada equipe uma única
+-- vez, na mesma transação. Registros cuja chave já existe são ignorados
+-- (e não somam pontos de novo). Retorna as chaves inseridas agora.
+-- data_registro vem do app (hora em que o líder enviou, não a do reenvio).
+CREATE OR REPLACE FUNCTION registrar_lote(p_registros JSONB)
+RETURNS TABLE (chave_cliente UUID, registro_id INTEGER)
+LANGUAGE sql
+AS $$
+    WITH novos AS (
+        INSERT INTO registros (
+            chave_cliente, equipe_id, data_inicio, data_fim, data_registro,
+            qtd_pessoas, qtd_pessoas_novas, qtd_celulas, qtd_celulas_realizadas, qtd_celulas_elite,
+            qtd_pessoas_terca, qtd_pessoas_novas_terca,
+            qtd_pessoas_arena, qtd_pessoas_novas_arena,
+            qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+            valor_arrecadacao_parceiro, qtd_revisao_vidas, pontuacao
+        )
+        SELECT d.chave_cliente, d.equipe_id, d.data_inicio, d.data_fim, COALESCE(d.data_registro, NOW()),
+               d.qtd_pessoas, d.qtd_pessoas_novas, d.qtd_celulas, d.qtd_celulas_realizadas, d.qtd_celulas_elite,
+               d.qtd_pessoas_terca, d.qtd_pessoas_novas_terca,
+               d.qtd_pessoas_arena, d.qtd_pessoas_novas_arena,
+               d.qtd_pessoas_domingo, d.qtd_pessoas_novas_domingo,
+               d.valor_arrecadacao_parceiro, d.qtd_revisao_vidas, d.pontuacao
+        FROM jsonb_populate_recordset(NULL::registros, p_registros) d
+        ON CONFLICT (chave_cliente) DO NOTHING
+        RETURNING registros.chave_cliente, registros.id, registros.equipe_id, registros.pontuacao
+    ),
+    totais AS (
+        UPDATE equipes e
+        SET pontuacao_total = e.pontuacao_total + t.pontos
+        FROM (
+            SELECT equipe_id, SUM(pontuacao)::INTEGER AS pontos
+            FROM novos
+            GROUP BY equipe_id
+        ) t
+        WHERE e.id = t.equipe_id
+    )
+    SELECT novos.chave_cliente, novos.id FROM novos;
+$$;
@@ -0,0 +1,368 @@
+-- Script para criar o arquivamento de registros antigos
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Registros com data_fim anterior a um corte saem da tabela registros
+-- (que volta a ficar pequena para o histórico, os relatórios e a
+-- reconciliação) e vão para registros_arquivo. Antes de sair, cada um é
+-- somado ao resumo anual da sua equipe (registros_ano), que responde os
+-- totais sem precisar dos registros:
+--   * pontuacao_total das equipes não muda;
+--   * registros_semana continua com as semanas arquivadas, então os placares
+--     de períodos que fecham semanas continuam iguais;
+--   * totais_periodo, resumo_registros e reconciliar_pontuacao passam a
+--     somar também a parte arquivada (ver abaixo).
+-- Rodado por `flask --app app_supabase arquivar-registros`.
+
+-- Resumo anual (ano de data_fim) dos registros arquivados de cada equipe
+CREATE TABLE IF NOT EXISTS registros_ano (
+    id SERIAL PRIMARY KEY,
+    equipe_id INTEGER NOT NULL REFERENCES equipes(id) ON DELETE CASCADE,
+    ano INTEGER NOT NULL,
+    qtd_registros INTEGER NOT NULL DEFAULT 0,
+    pontuacao BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_novas BIGINT NOT NULL DEFAULT 0,
+    qtd_celulas_realizadas BIGINT NOT NULL DEFAULT 0,
+    qtd_celulas_elite BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_terca BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_novas_terca BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_arena BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_novas_arena BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_domingo BIGINT NOT NULL DEFAULT 0,
+    qtd_pessoas_novas_domingo BIGINT NOT NULL DEFAULT 0,
+    valor_arrecadacao_parceiro NUMERIC NOT NULL DEFAULT 0,
+    qtd_revisao_vidas BIGINT NOT NULL DEFAULT 0,
+    data_atualizacao TIMESTAMP NOT NULL DEFAULT NOW(),
+    UNIQUE (equipe_id, ano)
+);
+
+CREATE INDEX IF NOT EXISTS idx_registros_ano_atualizacao
+    ON registros_ano (data_atualizacao, id);
+
+-- Os registros arquivados, completos (mesmas colunas de registros)
+CREATE TABLE IF NOT EXISTS registros_arquivo (
+    LIKE registros,
+    arquivado_em TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id),
+    FOREIGN KEY (equipe_id) REFERENCES equipes(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_registros_arquivo_periodo
+    ON registros_arquivo (data_inicio, data_fim);
+CREATE INDEX IF NOT EXISTS idx_registros_arquivo_equipe
+    ON registros_arquivo (equipe_id);
+
+-- Cada rodada de arquivamento (o maior antes_de é o corte atual)
+CREATE TABLE IF NOT EXISTS arquivamentos (
+    id SERIAL PRIMARY KEY,
+    antes_de DATE NOT NULL,
+    qtd_registros INTEGER NOT NULL,
+    executado_em TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_arquivamentos_executado_em
+    ON arquivamentos (executado_em, id);
+
+ALTER TABLE registros_ano ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for registros_ano" ON registros_ano;
+CREATE POLICY "Enable all operations for registros_ano" ON registros_ano FOR ALL USING (true);
+ALTER TABLE registros_arquivo ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for registros_arquivo" ON registros_arquivo;
+CREATE POLICY "Enable all operations for registros_arquivo" ON registros_arquivo FOR ALL USING (true);
+ALTER TABLE arquivamentos ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for arquivamentos" ON arquivamentos;
+CREATE POLICY "Enable all operations for arquivamentos" ON arquivamentos FOR ALL USING (true);
+
+-- O resumo semanal ignora as exclusões feitas pelo arquivamento (marcadas
+-- com placar.arquivando = 'on' na transação): as semanas arquivadas ficam
+-- no resumo. A exclusão continua indo para exclusoes, então o espelho
+-- SQLite também tira esses registros da sua cópia.
+CREATE OR REPLACE FUNCTION atualizar_registros_semana()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF current_setting('placar.arquivando', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM acumular_registro_semana(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM acumular_registro_semana(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Move até p_limite registros com data_fim < p_antes_de para o arquivo e
+-- retorna quantos foram movidos (chame de novo até retornar 0). Em lotes,
+-- cada chamada trava as gravações de registros só por um instante.
+CREATE OR REPLACE FUNCTION arquivar_registros(p_antes_de DATE, p_limite INTEGER DEFAULT 5000)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_movidos INTEGER;
+BEGIN
+    -- Gravações concorrentes esperam o lote terminar
+    LOCK TABLE registros IN SHARE ROW EXCLUSIVE MODE;
+    PERFORM set_config('placar.arquivando', 'on', true);
+
+    -- Tudo em um único comando (e uma única transação): o resumo anual,
+    -- a cópia e a exclusão entram juntos ou nenhum entra
+    WITH movidos AS (
+        DELETE FROM registros r
+        WHERE r.id IN (
+            SELECT id FROM registros
+            WHERE data_fim < p_antes_de AND equipe_id IS NOT NULL
+            ORDER BY data_fim, id
+            LIMIT p_limite
+        )
+        RETURNING r.*
+    ),
+    anuais AS (
+        INSERT INTO registros_ano AS a (
+            equipe_id, ano, qtd_registros, pontuacao,
+            qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+            qtd_pessoas_terca, qtd_pessoas_novas_terca,
+            qtd_pessoas_arena, qtd_pessoas_novas_arena,
+            qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+            valor_arrecadacao_parceiro, qtd_revisao_vidas
+        )
+        SELECT m.equipe_id,
+               EXTRACT(YEAR FROM m.data_fim)::INTEGER,
+               COUNT(*),
+               COALESCE(SUM(m.pontuacao), 0),
+               COALESCE(SUM(m.qtd_pessoas_novas), 0),
+               COALESCE(SUM(m.qtd_celulas_realizadas), 0),
+               COALESCE(SUM(m.qtd_celulas_elite), 0),
+               COALESCE(SUM(m.qtd_pessoas_terca), 0),
+               COALESCE(SUM(m.qtd_pessoas_novas_terca), 0),
+               COALESCE(SUM(m.qtd_pessoas_arena), 0),
+               COALESCE(SUM(m.qtd_pessoas_novas_arena), 0),
+               COALESCE(SUM(m.qtd_pessoas_domingo), 0),
+               COALESCE(SUM(m.qtd_pessoas_novas_domingo), 0),
+               COALESCE(SUM(m.valor_arrecadacao_parceiro), 0),
+               COALESCE(SUM(m.qtd_revisao_vidas), 0)
+        FROM movidos m
+        GROUP BY 1, 2
+        ON CONFLICT (equipe_id, ano) DO UPDATE SET
+            qtd_registros = a.qtd_registros + EXCLUDED.qtd_registros,
+            pontuacao = a.pontuacao + EXCLUDED.pontuacao,
+            qtd_pessoas_novas = a.qtd_pessoas_novas + EXCLUDED.qtd_pessoas_novas,
+            qtd_celulas_realizadas = a.qtd_celulas_realizadas + EXCLUDED.qtd_celulas_realizadas,
+            qtd_celulas_elite = a.qtd_celulas_elite + EXCLUDED.qtd_celulas_elite,
+            qtd_pessoas_terca = a.qtd_pessoas_terca + EXCLUDED.qtd_pessoas_terca,
+            qtd_pessoas_novas_terca = a.qtd_pessoas_novas_terca + EXCLUDED.qtd_pessoas_novas_terca,
+            qtd_pessoas_arena = a.qtd_pessoas_arena + EXCLUDED.qtd_pessoas_arena,
+            qtd_pessoas_novas_arena = a.qtd_pessoas_novas_arena + EXCLUDED.qtd_pessoas_novas_arena,
+            qtd_pessoas_domingo = a.qtd_pessoas_domingo + EXCLUDED.qtd_pessoas_domingo,
+            qtd_pessoas_novas_domingo = a.qtd_pessoas_novas_domingo + EXCLUDED.qtd_pessoas_novas_domingo,
+            valor_arrecadacao_parceiro = a.valor_arrecadacao_parceiro + EXCLUDED.valor_arrecadacao_parceiro,
+            qtd_revisao_vidas = a.qtd_revisao_vidas + EXCLUDED.qtd_revisao_vidas,
+            data_atualizacao = NOW()
+    ),
+    copiados AS (
+        -- Pelo nome das colunas (registros ganhou colunas com ALTER TABLE ao longo do tempo)
+        INSERT INTO registros_arquivo
+        SELECT (jsonb_populate_record(NULL::registros_arquivo, to_jsonb(m) || jsonb_build_object('arquivado_em', NOW()))).*
+        FROM movidos m
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_movidos FROM copiados;
+
+    IF v_movidos > 0 THEN
+        INSERT INTO arquivamentos (antes_de, qtd_registros) VALUES (p_antes_de, v_movidos);
+    END IF;
+
+    PERFORM set_config('placar.arquivando', 'off', true);
+    RETURN v_movidos;
+END;
+$$;
+
+-- Totais por período: o caminho pelos registros soma também os arquivados
+-- (o índice de período do arquivo não encontra nada em períodos recentes)
+CREATE OR REPLACE FUNCTION totais_periodo(p_data_inicio DATE, p_data_fim DATE)
+RETURNS TABLE (
+    equipe_id INTEGER,
+    registros_periodo BIGINT,
+    pontuacao_periodo BIGINT,
+    pessoas_novas BIGINT,
+    celulas_realizadas BIGINT,
+    celulas_elite BIGINT,
+    pessoas_terca BIGINT,
+    pessoas_novas_terca BIGINT,
+    pessoas_arena BIGINT,
+    pessoas_novas_arena BIGINT,
+    pessoas_domingo BIGINT,
+    pessoas_novas_domingo BIGINT,
+    valor_arrecadacao NUMERIC,
+    revisao_vidas BIGINT
+)
+LANGUAGE plpgsql STABLE
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF EXTRACT(ISODOW FROM p_data_inicio) = 1 AND EXTRACT(ISODOW FROM p_data_fim) = 7 THEN
+        RETURN QUERY
+        SELECT s.equipe_id,
+               SUM(s.qtd_registros)::BIGINT,
+               SUM(s.pontuacao)::BIGINT,
+               SUM(s.qtd_pessoas_novas)::BIGINT,
+               SUM(s.qtd_celulas_realizadas)::BIGINT,
+               SUM(s.qtd_celulas_elite)::BIGINT,
+               SUM(s.qtd_pessoas_terca)::BIGINT,
+               SUM(s.qtd_pessoas_novas_terca)::BIGINT,
+               SUM(s.qtd_pessoas_arena)::BIGINT,
+               SUM(s.qtd_pessoas_novas_arena)::BIGINT,
+               SUM(s.qtd_pessoas_domingo)::BIGINT,
+               SUM(s.qtd_pessoas_novas_domingo)::BIGINT,
+               SUM(s.valor_arrecadacao_parceiro)::NUMERIC,
+               SUM(s.qtd_revisao_vidas)::BIGINT
+        FROM registros_semana s
+        WHERE s.semana_inicio >= p_data_inicio
+          AND s.semana_fim <= p_data_fim - 6
+        GROUP BY s.equipe_id;
+    ELSE
+        RETURN QUERY
+        SELECT r.equipe_id,
+               COUNT(*)::BIGINT,
+               COALESCE(SUM(r.pontuacao), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_celulas_realizadas), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_celulas_elite), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_terca), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_terca), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_arena), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_arena), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_domingo), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_domingo), 0)::BIGINT,
+               COALESCE(SUM(r.valor_arrecadacao_parceiro), 0)::NUMERIC,
+               COALESCE(SUM(r.qtd_revisao_vidas), 0)::BIGINT
+        FROM (
+            SELECT equipe_id, pontuacao, qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+                   qtd_pessoas_terca, qtd_pessoas_novas_terca, qtd_pessoas_arena, qtd_pessoas_novas_arena,
+                   qtd_pessoas_domingo, qtd_pessoas_novas_domingo, valor_arrecadacao_parceiro, qtd_revisao_vidas
+            FROM registros
+            WHERE data_inicio >= p_data_inicio AND data_fim <= p_data_fim
+            UNION ALL
+            SELECT equipe_id, pontuacao, qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+                   qtd_pessoas_terca, qtd_pessoas_novas_terca, qtd_pessoas_arena, qtd_pessoas_novas_arena,
+                   qtd_pessoas_domingo, qtd_pessoas_novas_domingo, valor_arrecadacao_parceiro, qtd_revisao_vidas
+            FROM registros_arquivo
+            WHERE data_inicio >= p_data_inicio AND data_fim <= p_data_fim
+        ) r
+        GROUP BY r.equipe_id;
+    END IF;
+END;
+$$;
+
+-- Resumo do histórico e do relatório com a parte arquivada. Sem período
+-- (histórico da equipe) a parte arquivada vem do resumo anual; com período,
+-- dos registros arquivados no intervalo. total_arquivados diz quantos
+-- registros entram nos totais sem aparecer na lista da página.
+DROP FUNCTION IF EXISTS resumo_registros(INTEGER, DATE, DATE);
+CREATE OR REPLACE FUNCTION resumo_registros(
+    p_equipe_id INTEGER DEFAULT NULL,
+    p_data_inicio DATE DEFAULT NULL,
+    p_data_fim DATE DEFAULT NULL
+)
+RETURNS TABLE (
+    total_registros BIGINT,
+    total_pontos BIGINT,
+    total_pessoas_novas BIGINT,
+    total_arrecadacao NUMERIC,
+    total_revisao_vidas BIGINT,
+    total_arquivados BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH partes AS (
+        SELECT COUNT(*) AS registros,
+               COALESCE(SUM(r.pontuacao), 0) AS pontos,
+               COALESCE(SUM(r.qtd_pessoas_novas), 0) AS pessoas_novas,
+               COALESCE(SUM(r.valor_arrecadacao_parceiro), 0) AS arrecadacao,
+               COALESCE(SUM(r.qtd_revisao_vidas), 0) AS revisao_vidas,
+               0 AS arquivados
+        FROM registros r
+        WHERE (p_equipe_id IS NULL OR r.equipe_id = p_equipe_id)
+          AND (p_data_inicio IS NULL OR r.data_inicio >= p_data_inicio)
+          AND (p_data_fim IS NULL OR r.data_fim <= p_data_fim)
+        UNION ALL
+        SELECT COALESCE(SUM(a.qtd_registros), 0),
+               COALESCE(SUM(a.pontuacao), 0),
+               COALESCE(SUM(a.qtd_pessoas_novas), 0),
+               COALESCE(SUM(a.valor_arrecadacao_parceiro), 0),
+               COALESCE(SUM(a.qtd_revisao_vidas), 0),
+               COALESCE(SUM(a.qtd_registros), 0)
+        FROM registros_ano a
+        WHERE p_data_inicio IS NULL AND p_data_fim IS NULL
+          AND (p_equipe_id IS NULL OR a.equipe_id = p_equipe_id)
+        UNION ALL
+        SELECT COUNT(*),
+               COALESCE(SUM(r.pontuacao), 0),
+               COALESCE(SUM(r.qtd_pessoas_novas), 0),
+               COALESCE(SUM(r.valor_arrecadacao_parceiro), 0),
+               COALESCE(SUM(r.qtd_revisao_vidas), 0),
+               COUNT(*)
+        FROM registros_arquivo r
+        WHERE (p_data_inicio IS NOT NULL OR p_data_fim IS NOT NULL)
+          AND (p_equipe_id IS NULL OR r.equipe_id = p_equipe_id)
+          AND (p_data_inicio IS NULL OR r.data_inicio >= p_data_inicio)
+          AND (p_data_fim IS NULL OR r.data_fim <= p_data_fim)
+    )
+    SELECT SUM(registros)::BIGINT,
+           SUM(pontos)::BIGINT,
+           SUM(pessoas_novas)::BIGINT,
+           SUM(arrecadacao)::NUMERIC,
+           SUM(revisao_vidas)::BIGINT,
+           SUM(arquivados)::BIGINT
+    FROM partes;
+$$;
+
+-- Reconciliação: o total real de cada equipe inclui os anos arquivados
+CREATE OR REPLACE FUNCTION reconciliar_pontuacao(p_aplicar BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (
+    equipe_id INTEGER,
+    nome TEXT,
+    pontuacao_armazenada INTEGER,
+    pontuacao_real INTEGER,
+    diferenca INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF p_aplicar THEN
+        LOCK TABLE equipes IN SHARE ROW EXCLUSIVE MODE;
+    END IF;
+
+    RETURN QUERY
+    WITH reais AS (
+        SELECT e.id,
+               (COALESCE((SELECT SUM(r.pontuacao) FROM registros r WHERE r.equipe_id = e.id), 0)
+                + COALESCE((SELECT SUM(a.pontuacao) FROM registros_ano a WHERE a.equipe_id = e.id), 0))::INTEGER AS total
+        FROM equipes e
+    ),
+    divergentes AS (
+        SELECT e.id, e.nome, e.pontuacao_total, reais.total
+        FROM equipes e
+        JOIN reais ON reais.id = e.id
+        WHERE e.pontuacao_total IS DISTINCT FROM reais.total
+    ),
+    corrigidas AS (
+        UPDATE equipes e
+        SET pontuacao_total = d.total
+        FROM divergentes d
+        WHERE p_aplicar AND e.id = d.id
+        RETURNING e.id
+    )
+    SELECT d.id,
+           d.nome::TEXT,
+           d.pontuacao_total,
+           d.total,
+           d.total - COALESCE(d.pontuacao_total, 0)
+    FROM divergentes d
+    ORDER BY abs(d.total - COALESCE(d.pontuacao_total, 0)) DESC, d.id;
+END;
+$$;
@@ -0,0 +1,697 @@
+-- Script para criar as ligas (várias congregações/campus no mesmo deploy)
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Cada equipe pertence a uma liga, e cada liga tem o seu placar, o seu
+-- ranking e o seu tamanho de Divisão A. Os dados que já existem ficam na
+-- liga 1 ("principal"), então um deploy com uma única liga continua
+-- funcionando como antes.
+--
+-- registros, registros_semana, registros_arquivo e registros_ano também
+-- levam liga_id (copiado da equipe por trigger), e os índices de período e
+-- de ranking passam a começar por liga_id: o placar de uma liga só
+-- percorre as linhas dela, não importa o tamanho das outras.
+-- Uma equipe não muda de liga (o trigger equipes_liga recusa).
+
+CREATE TABLE IF NOT EXISTS ligas (
+    id SERIAL PRIMARY KEY,
+    slug TEXT NOT NULL UNIQUE,
+    nome TEXT NOT NULL,
+    dominio TEXT UNIQUE,
+    equipes_divisao_a INTEGER NOT NULL DEFAULT 5 CHECK (equipes_divisao_a >= 0),
+    data_criacao TIMESTAMP DEFAULT NOW(),
+    data_atualizacao TIMESTAMP DEFAULT NOW()
+);
+
+INSERT INTO ligas (id, slug, nome) VALUES (1, 'principal', 'ZERO 1')
+ON CONFLICT (id) DO NOTHING;
+SELECT setval(pg_get_serial_sequence('ligas', 'id'), (SELECT MAX(id) FROM ligas));
+
+ALTER TABLE ligas ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for ligas" ON ligas;
+CREATE POLICY "Enable all operations for ligas" ON ligas FOR ALL USING (true);
+
+DROP TRIGGER IF EXISTS update_ligas_modtime ON ligas;
+CREATE TRIGGER update_ligas_modtime
+    BEFORE UPDATE ON ligas
+    FOR EACH ROW
+    EXECUTE FUNCTION update_modified_column();
+
+-- Colunas liga_id. O DEFAULT 1 só preenche as linhas que já existem (sem
+-- reescrever as tabelas); em equipes ele fica, para que uma versão antiga
+-- do app durante o deploy continue gravando na liga principal. Nas demais
+-- o valor vem sempre da equipe.
+ALTER TABLE equipes ADD COLUMN IF NOT EXISTS liga_id INTEGER NOT NULL DEFAULT 1 REFERENCES ligas(id);
+ALTER TABLE registros ADD COLUMN IF NOT EXISTS liga_id INTEGER NOT NULL DEFAULT 1 REFERENCES ligas(id);
+ALTER TABLE registros ALTER COLUMN liga_id DROP DEFAULT;
+ALTER TABLE registros_semana ADD COLUMN IF NOT EXISTS liga_id INTEGER NOT NULL DEFAULT 1 REFERENCES ligas(id);
+ALTER TABLE registros_semana ALTER COLUMN liga_id DROP DEFAULT;
+ALTER TABLE registros_arquivo ADD COLUMN IF NOT EXISTS liga_id INTEGER NOT NULL DEFAULT 1 REFERENCES ligas(id);
+ALTER TABLE registros_arquivo ALTER COLUMN liga_id DROP DEFAULT;
+ALTER TABLE registros_ano ADD COLUMN IF NOT EXISTS liga_id INTEGER NOT NULL DEFAULT 1 REFERENCES ligas(id);
+ALTER TABLE registros_ano ALTER COLUMN liga_id DROP DEFAULT;
+
+-- Índices por liga (substituem os globais equivalentes)
+CREATE INDEX IF NOT EXISTS idx_equipes_liga_ranking
+    ON equipes (liga_id, pontuacao_total DESC, id);
+DROP INDEX IF EXISTS idx_equipes_ranking;
+
+CREATE INDEX IF NOT EXISTS idx_registros_liga_periodo
+    ON registros (liga_id, data_inicio, data_fim);
+DROP INDEX IF EXISTS idx_registros_periodo;
+CREATE INDEX IF NOT EXISTS idx_registros_liga_recentes
+    ON registros (liga_id, data_registro DESC, id DESC);
+DROP INDEX IF EXISTS idx_registros_recentes;
+
+CREATE INDEX IF NOT EXISTS idx_registros_semana_liga_periodo
+    ON registros_semana (liga_id, semana_inicio, semana_fim);
+DROP INDEX IF EXISTS idx_registros_semana_periodo;
+
+CREATE INDEX IF NOT EXISTS idx_registros_arquivo_liga_periodo
+    ON registros_arquivo (liga_id, data_inicio, data_fim);
+DROP INDEX IF EXISTS idx_registros_arquivo_periodo;
+
+CREATE INDEX IF NOT EXISTS idx_registros_ano_liga
+    ON registros_ano (liga_id, equipe_id);
+
+-- O registro recebe a liga da sua equipe. Se o app mandar uma liga
+-- diferente (equipe de outra liga no formulário), a gravação é recusada.
+CREATE OR REPLACE FUNCTION definir_liga_registro()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_liga_id INTEGER;
+BEGIN
+    SELECT liga_id INTO v_liga_id FROM equipes WHERE id = NEW.equipe_id;
+    IF v_liga_id IS NOT NULL AND NEW.liga_id IS NOT NULL AND NEW.liga_id <> v_liga_id THEN
+        RAISE EXCEPTION 'A equipe % não pertence à liga %', NEW.equipe_id, NEW.liga_id
+            USING ERRCODE = '23514';
+    END IF;
+    NEW.liga_id := COALESCE(v_liga_id, NEW.liga_id);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS registros_liga ON registros;
+CREATE TRIGGER registros_liga
+    BEFORE INSERT OR UPDATE OF equipe_id, liga_id ON registros
+    FOR EACH ROW
+    EXECUTE FUNCTION definir_liga_registro();
+
+CREATE OR REPLACE FUNCTION bloquear_troca_liga()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.liga_id IS DISTINCT FROM OLD.liga_id THEN
+        RAISE EXCEPTION 'A equipe % não pode mudar de liga', OLD.id
+            USING ERRCODE = '23514';
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS equipes_liga ON equipes;
+CREATE TRIGGER equipes_liga
+    BEFORE UPDATE OF liga_id ON equipes
+    FOR EACH ROW
+    EXECUTE FUNCTION bloquear_troca_liga();
+
+-- Gravações: liga_id passa junto (e é conferida pelo trigger acima)
+CREATE OR REPLACE FUNCTION criar_registro_atomico(p_registro JSONB)
+RETURNS SETOF registros
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    novo registros;
+BEGIN
+    INSERT INTO registros (
+        equipe_id, liga_id, data_inicio, data_fim,
+        qtd_pessoas, qtd_pessoas_novas, qtd_celulas, qtd_celulas_realizadas, qtd_celulas_elite,
+        qtd_pessoas_terca, qtd_pessoas_novas_terca,
+        qtd_pessoas_arena, qtd_pessoas_novas_arena,
+        qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+        valor_arrecadacao_parceiro, qtd_revisao_vidas, pontuacao
+    )
+    SELECT d.equipe_id, d.liga_id, d.data_inicio, d.data_fim,
+           d.qtd_pessoas, d.qtd_pessoas_novas, d.qtd_celulas, d.qtd_celulas_realizadas, d.qtd_celulas_elite,
+           d.qtd_pessoas_terca, d.qtd_pessoas_novas_terca,
+           d.qtd_pessoas_arena, d.qtd_pessoas_novas_arena,
+           d.qtd_pessoas_domingo, d.qtd_pessoas_novas_domingo,
+           d.valor_arrecadacao_parceiro, d.qtd_revisao_vidas, d.pontuacao
+    FROM jsonb_populate_record(NULL::registros, p_registro) d
+    RETURNING * INTO novo;
+
+    UPDATE equipes
+    SET pontuacao_total = pontuacao_total + novo.pontuacao
+    WHERE id = novo.equipe_id;
+
+    RETURN NEXT novo;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION registrar_lote(p_registros JSONB)
+RETURNS TABLE (chave_cliente UUID, registro_id INTEGER)
+LANGUAGE sql
+AS $$
+    WITH novos AS (
+        INSERT INTO registros (
+            chave_cliente, equipe_id, liga_id, data_inicio, data_fim, data_registro,
+            qtd_pessoas, qtd_pessoas_novas, qtd_celulas, qtd_celulas_realizadas, qtd_celulas_elite,
+            qtd_pessoas_terca, qtd_pessoas_novas_terca,
+            qtd_pessoas_arena, qtd_pessoas_novas_arena,
+            qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+            valor_arrecadacao_parceiro, qtd_revisao_vidas, pontuacao
+        )
+        SELECT d.chave_cliente, d.equipe_id, d.liga_id, d.data_inicio, d.data_fim, COALESCE(d.data_registro, NOW()),
+               d.qtd_pessoas, d.qtd_pessoas_novas, d.qtd_celulas, d.qtd_celulas_realizadas, d.qtd_celulas_elite,
+               d.qtd_pessoas_terca, d.qtd_pessoas_novas_terca,
+               d.qtd_pessoas_arena, d.qtd_pessoas_novas_arena,
+               d.qtd_pessoas_domingo, d.qtd_pessoas_novas_domingo,
+               d.valor_arrecadacao_parceiro, d.qtd_revisao_vidas, d.pontuacao
+        FROM jsonb_populate_recordset(NULL::registros, p_registros) d
+        ON CONFLICT (chave_cliente) DO NOTHING
+        RETURNING registros.chave_cliente, registros.id, registros.equipe_id, registros.pontuacao
+    ),
+    totais AS (
+        UPDATE equipes e
+        SET pontuacao_total = e.pontuacao_total + t.pontos
+        FROM (
+            SELECT equipe_id, SUM(pontuacao)::INTEGER AS pontos
+            FROM novos
+            GROUP BY equipe_id
+        ) t
+        WHERE e.id = t.equipe_id
+    )
+    SELECT novos.chave_cliente, novos.id FROM novos;
+$$;
+
+-- Resumo semanal: a linha nova da semana leva a liga do registro
+CREATE OR REPLACE FUNCTION acumular_registro_semana(r registros, p_sinal INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_semana_inicio DATE := date_trunc('week', r.data_inicio)::DATE;
+    v_semana_fim DATE := date_trunc('week', r.data_fim)::DATE;
+BEGIN
+    IF p_sinal < 0 THEN
+        UPDATE registros_semana s SET
+            qtd_registros = s.qtd_registros - 1,
+            pontuacao = s.pontuacao - COALESCE(r.pontuacao, 0),
+            qtd_pessoas_novas = s.qtd_pessoas_novas - COALESCE(r.qtd_pessoas_novas, 0),
+            qtd_celulas_realizadas = s.qtd_celulas_realizadas - COALESCE(r.qtd_celulas_realizadas, 0),
+            qtd_celulas_elite = s.qtd_celulas_elite - COALESCE(r.qtd_celulas_elite, 0),
+            qtd_pessoas_terca = s.qtd_pessoas_terca - COALESCE(r.qtd_pessoas_terca, 0),
+            qtd_pessoas_novas_terca = s.qtd_pessoas_novas_terca - COALESCE(r.qtd_pessoas_novas_terca, 0),
+            qtd_pessoas_arena = s.qtd_pessoas_arena - COALESCE(r.qtd_pessoas_arena, 0),
+            qtd_pessoas_novas_arena = s.qtd_pessoas_novas_arena - COALESCE(r.qtd_pessoas_novas_arena, 0),
+            qtd_pessoas_domingo = s.qtd_pessoas_domingo - COALESCE(r.qtd_pessoas_domingo, 0),
+            qtd_pessoas_novas_domingo = s.qtd_pessoas_novas_domingo - COALESCE(r.qtd_pessoas_novas_domingo, 0),
+            valor_arrecadacao_parceiro = s.valor_arrecadacao_parceiro - COALESCE(r.valor_arrecadacao_parceiro, 0),
+            qtd_revisao_vidas = s.qtd_revisao_vidas - COALESCE(r.qtd_revisao_vidas, 0)
+        WHERE s.equipe_id = r.equipe_id
+          AND s.semana_inicio = v_semana_inicio
+          AND s.semana_fim = v_semana_fim;
+
+        -- Semana que ficou sem registros sai do resumo
+        DELETE FROM registros_semana s
+        WHERE s.equipe_id = r.equipe_id
+          AND s.semana_inicio = v_semana_inicio
+          AND s.semana_fim = v_semana_fim
+          AND s.qtd_registros <= 0;
+        RETURN;
+    END IF;
+
+    INSERT INTO registros_semana AS s (
+        equipe_id, liga_id, semana_inicio, semana_fim, qtd_registros, pontuacao,
+        qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+        qtd_pessoas_terca, qtd_pessoas_novas_terca,
+        qtd_pessoas_arena, qtd_pessoas_novas_arena,
+        qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+        valor_arrecadacao_parceiro, qtd_revisao_vidas
+    )
+    VALUES (
+        r.equipe_id, r.liga_id, v_semana_inicio, v_semana_fim, 1, COALESCE(r.pontuacao, 0),
+        COALESCE(r.qtd_pessoas_novas, 0),
+        COALESCE(r.qtd_celulas_realizadas, 0),
+        COALESCE(r.qtd_celulas_elite, 0),
+        COALESCE(r.qtd_pessoas_terca, 0),
+        COALESCE(r.qtd_pessoas_novas_terca, 0),
+        COALESCE(r.qtd_pessoas_arena, 0),
+        COALESCE(r.qtd_pessoas_novas_arena, 0),
+        COALESCE(r.qtd_pessoas_domingo, 0),
+        COALESCE(r.qtd_pessoas_novas_domingo, 0),
+        COALESCE(r.valor_arrecadacao_parceiro, 0),
+        COALESCE(r.qtd_revisao_vidas, 0)
+    )
+    ON CONFLICT (equipe_id, semana_inicio, semana_fim) DO UPDATE SET
+        qtd_registros = s.qtd_registros + EXCLUDED.qtd_registros,
+        pontuacao = s.pontuacao + EXCLUDED.pontuacao,
+        qtd_pessoas_novas = s.qtd_pessoas_novas + EXCLUDED.qtd_pessoas_novas,
+        qtd_celulas_realizadas = s.qtd_celulas_realizadas + EXCLUDED.qtd_celulas_realizadas,
+        qtd_celulas_elite = s.qtd_celulas_elite + EXCLUDED.qtd_celulas_elite,
+        qtd_pessoas_terca = s.qtd_pessoas_terca + EXCLUDED.qtd_pessoas_terca,
+        qtd_pessoas_novas_terca = s.qtd_pessoas_novas_terca + EXCLUDED.qtd_pessoas_novas_terca,
+        qtd_pessoas_arena = s.qtd_pessoas_arena + EXCLUDED.qtd_pessoas_arena,
+        qtd_pessoas_novas_arena = s.qtd_pessoas_novas_arena + EXCLUDED.qtd_pessoas_novas_arena,
+        qtd_pessoas_domingo = s.qtd_pessoas_domingo + EXCLUDED.qtd_pessoas_domingo,
+        qtd_pessoas_novas_domingo = s.qtd_pessoas_novas_domingo + EXCLUDED.qtd_pessoas_novas_domingo,
+        valor_arrecadacao_parceiro = s.valor_arrecadacao_parceiro + EXCLUDED.valor_arrecadacao_parceiro,
+        qtd_revisao_vidas = s.qtd_revisao_vidas + EXCLUDED.qtd_revisao_vidas;
+END;
+$$;
+
+-- Arquivamento: o resumo anual leva a liga da equipe
+CREATE OR REPLACE FUNCTION arquivar_registros(p_antes_de DATE, p_limite INTEGER DEFAULT 5000)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_movidos INTEGER;
+BEGIN
+    -- Gravações concorrentes esperam o lote terminar
+    LOCK TABLE registros IN SHARE ROW EXCLUSIVE MODE;
+    PERFORM set_config('placar.arquivando', 'on', true);
+
+    WITH movidos AS (
+        DELETE FROM registros r
+        WHERE r.id IN (
+            SELECT id FROM registros
+            WHERE data_fim < p_antes_de AND equipe_id IS NOT NULL
+            ORDER BY data_fim, id
+            LIMIT p_limite
+        )
+        RETURNING r.*
+    ),
+    anuais AS (
+        INSERT INTO registros_ano AS a (
+            equipe_id, liga_id, ano, qtd_registros, pontuacao,
+            qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+            qtd_pessoas_terca, qtd_pessoas_novas_terca,
+            qtd_pessoas_arena, qtd_pessoas_novas_arena,
+            qtd_pessoas_domingo, qtd_pessoas_novas_domingo,
+            valor_arrecadacao_parceiro, qtd_revisao_vidas
+        )
+        SELECT m.equipe_id,
+               m.liga_id,
+               EXTRACT(YEAR FROM m.data_fim)::INTEGER,
+               COUNT(*),
+               COALESCE(SUM(m.pontuacao), 0),
+               COALESCE(SUM(m.qtd_pessoas_novas), 0),
+               COALESCE(SUM(m.qtd_celulas_realizadas), 0),
+               COALESCE(SUM(m.qtd_celulas_elite), 0),
+               COALESCE(SUM(m.qtd_pessoas_terca), 0),
+               COALESCE(SUM(m.qtd_pessoas_novas_terca), 0),
+               COALESCE(SUM(m.qtd_pessoas_arena), 0),
+               COALESCE(SUM(m.qtd_pessoas_novas_arena), 0),
+               COALESCE(SUM(m.qtd_pessoas_domingo), 0),
+               COALESCE(SUM(m.qtd_pessoas_novas_domingo), 0),
+               COALESCE(SUM(m.valor_arrecadacao_parceiro), 0),
+               COALESCE(SUM(m.qtd_revisao_vidas), 0)
+        FROM movidos m
+        GROUP BY 1, 2, 3
+        ON CONFLICT (equipe_id, ano) DO UPDATE SET
+            qtd_registros = a.qtd_registros + EXCLUDED.qtd_registros,
+            pontuacao = a.pontuacao + EXCLUDED.pontuacao,
+            qtd_pessoas_novas = a.qtd_pessoas_novas + EXCLUDED.qtd_pessoas_novas,
+            qtd_celulas_realizadas = a.qtd_celulas_realizadas + EXCLUDED.qtd_celulas_realizadas,
+            qtd_celulas_elite = a.qtd_celulas_elite + EXCLUDED.qtd_celulas_elite,
+            qtd_pessoas_terca = a.qtd_pessoas_terca + EXCLUDED.qtd_pessoas_terca,
+            qtd_pessoas_novas_terca = a.qtd_pessoas_novas_terca + EXCLUDED.qtd_pessoas_novas_terca,
+            qtd_pessoas_arena = a.qtd_pessoas_arena + EXCLUDED.qtd_pessoas_arena,
+            qtd_pessoas_novas_arena = a.qtd_pessoas_novas_arena + EXCLUDED.qtd_pessoas_novas_arena,
+            qtd_pessoas_domingo = a.qtd_pessoas_domingo + EXCLUDED.qtd_pessoas_domingo,
+            qtd_pessoas_novas_domingo = a.qtd_pessoas_novas_domingo + EXCLUDED.qtd_pessoas_novas_domingo,
+            valor_arrecadacao_parceiro = a.valor_arrecadacao_parceiro + EXCLUDED.valor_arrecadacao_parceiro,
+            qtd_revisao_vidas = a.qtd_revisao_vidas + EXCLUDED.qtd_revisao_vidas,
+            data_atualizacao = NOW()
+    ),
+    copiados AS (
+        INSERT INTO registros_arquivo
+        SELECT (jsonb_populate_record(NULL::registros_arquivo, to_jsonb(m) || jsonb_build_object('arquivado_em', NOW()))).*
+        FROM movidos m
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_movidos FROM copiados;
+
+    IF v_movidos > 0 THEN
+        INSERT INTO arquivamentos (antes_de, qtd_registros) VALUES (p_antes_de, v_movidos);
+    END IF;
+
+    PERFORM set_config('placar.arquivando', 'off', true);
+    RETURN v_movidos;
+END;
+$$;
+
+-- Leituras por liga. As funções ganham p_liga_id no fim (padrão 1, a liga
+-- principal), então as chamadas antigas continuam valendo.
+DROP FUNCTION IF EXISTS totais_periodo(DATE, DATE);
+CREATE OR REPLACE FUNCTION totais_periodo(p_data_inicio DATE, p_data_fim DATE, p_liga_id INTEGER DEFAULT 1)
+RETURNS TABLE (
+    equipe_id INTEGER,
+    registros_periodo BIGINT,
+    pontuacao_periodo BIGINT,
+    pessoas_novas BIGINT,
+    celulas_realizadas BIGINT,
+    celulas_elite BIGINT,
+    pessoas_terca BIGINT,
+    pessoas_novas_terca BIGINT,
+    pessoas_arena BIGINT,
+    pessoas_novas_arena BIGINT,
+    pessoas_domingo BIGINT,
+    pessoas_novas_domingo BIGINT,
+    valor_arrecadacao NUMERIC,
+    revisao_vidas BIGINT
+)
+LANGUAGE plpgsql STABLE
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF EXTRACT(ISODOW FROM p_data_inicio) = 1 AND EXTRACT(ISODOW FROM p_data_fim) = 7 THEN
+        RETURN QUERY
+        SELECT s.equipe_id,
+               SUM(s.qtd_registros)::BIGINT,
+               SUM(s.pontuacao)::BIGINT,
+               SUM(s.qtd_pessoas_novas)::BIGINT,
+               SUM(s.qtd_celulas_realizadas)::BIGINT,
+               SUM(s.qtd_celulas_elite)::BIGINT,
+               SUM(s.qtd_pessoas_terca)::BIGINT,
+               SUM(s.qtd_pessoas_novas_terca)::BIGINT,
+               SUM(s.qtd_pessoas_arena)::BIGINT,
+               SUM(s.qtd_pessoas_novas_arena)::BIGINT,
+               SUM(s.qtd_pessoas_domingo)::BIGINT,
+               SUM(s.qtd_pessoas_novas_domingo)::BIGINT,
+               SUM(s.valor_arrecadacao_parceiro)::NUMERIC,
+               SUM(s.qtd_revisao_vidas)::BIGINT
+        FROM registros_semana s
+        WHERE s.liga_id = p_liga_id
+          AND s.semana_inicio >= p_data_inicio
+          AND s.semana_fim <= p_data_fim - 6
+        GROUP BY s.equipe_id;
+    ELSE
+        RETURN QUERY
+        SELECT r.equipe_id,
+               COUNT(*)::BIGINT,
+               COALESCE(SUM(r.pontuacao), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_celulas_realizadas), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_celulas_elite), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_terca), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_terca), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_arena), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_arena), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_domingo), 0)::BIGINT,
+               COALESCE(SUM(r.qtd_pessoas_novas_domingo), 0)::BIGINT,
+               COALESCE(SUM(r.valor_arrecadacao_parceiro), 0)::NUMERIC,
+               COALESCE(SUM(r.qtd_revisao_vidas), 0)::BIGINT
+        FROM (
+            SELECT equipe_id, pontuacao, qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+                   qtd_pessoas_terca, qtd_pessoas_novas_terca, qtd_pessoas_arena, qtd_pessoas_novas_arena,
+                   qtd_pessoas_domingo, qtd_pessoas_novas_domingo, valor_arrecadacao_parceiro, qtd_revisao_vidas
+            FROM registros
+            WHERE liga_id = p_liga_id AND data_inicio >= p_data_inicio AND data_fim <= p_data_fim
+            UNION ALL
+            SELECT equipe_id, pontuacao, qtd_pessoas_novas, qtd_celulas_realizadas, qtd_celulas_elite,
+                   qtd_pessoas_terca, qtd_pessoas_novas_terca, qtd_pessoas_arena, qtd_pessoas_novas_arena,
+                   qtd_pessoas_domingo, qtd_pessoas_novas_domingo, valor_arrecadacao_parceiro, qtd_revisao_vidas
+            FROM registros_arquivo
+            WHERE liga_id = p_liga_id AND data_inicio >= p_data_inicio AND data_fim <= p_data_fim
+        ) r
+        GROUP BY r.equipe_id;
+    END IF;
+END;
+$$;
+
+DROP FUNCTION IF EXISTS placar_periodo(DATE, DATE);
+CREATE OR REPLACE FUNCTION placar_periodo(p_data_inicio DATE, p_data_fim DATE, p_liga_id INTEGER DEFAULT 1)
+RETURNS TABLE (
+    id INTEGER,
+    nome TEXT,
+    logo_url TEXT,
+    pontuacao_total INTEGER,
+    pontuacao_periodo BIGINT,
+    registros_periodo BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT e.id,
+           e.nome::TEXT,
+           e.logo_url,
+           e.pontuacao_total,
+           COALESCE(t.pontuacao_periodo, 0)::BIGINT,
+           COALESCE(t.registros_periodo, 0)::BIGINT
+    FROM equipes e
+    LEFT JOIN totais_periodo(p_data_inicio, p_data_fim, p_liga_id) t ON t.equipe_id = e.id
+    WHERE e.liga_id = p_liga_id
+    ORDER BY COALESCE(t.pontuacao_periodo, 0) DESC, e.id;
+$$;
+
+DROP FUNCTION IF EXISTS placar_ranking_periodo(DATE, DATE, INTEGER, INTEGER, INTEGER, INTEGER);
+CREATE OR REPLACE FUNCTION placar_ranking_periodo(
+    p_data_inicio DATE,
+    p_data_fim DATE,
+    p_pontos_primeiro INTEGER DEFAULT 5,
+    p_pontos_segundo INTEGER DEFAULT 3,
+    p_pontos_terceiro INTEGER DEFAULT 1,
+    p_pontos_demais INTEGER DEFAULT 0,
+    p_liga_id INTEGER DEFAULT 1
+)
+RETURNS TABLE (
+    id INTEGER,
+    nome TEXT,
+    logo_url TEXT,
+    pontuacao_total INTEGER,
+    pessoas_novas BIGINT,
+    celulas_realizadas BIGINT,
+    celulas_elite BIGINT,
+    pessoas_terca BIGINT,
+    pessoas_novas_terca BIGINT,
+    pessoas_arena BIGINT,
+    pessoas_novas_arena BIGINT,
+    pessoas_domingo BIGINT,
+    pessoas_novas_domingo BIGINT,
+    valor_arrecadacao NUMERIC,
+    revisao_vidas BIGINT,
+    posicoes JSONB,
+    pontuacao_ranking BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH totais AS (
+        -- Só as equipes da liga disputam o ranking
+        SELECT * FROM totais_periodo(p_data_inicio, p_data_fim, p_liga_id)
+    ),
+    quesitos AS (
+        SELECT t.equipe_id, q.quesito, q.valor
+        FROM totais t
+        CROSS JOIN LATERAL (VALUES
+            ('pessoas_novas', t.pessoas_novas::NUMERIC),
+            ('celulas_realizadas', t.celulas_realizadas::NUMERIC),
+            ('celulas_elite', t.celulas_elite::NUMERIC),
+            ('pessoas_terca', t.pessoas_terca::NUMERIC),
+            ('pessoas_novas_terca', t.pessoas_novas_terca::NUMERIC),
+            ('pessoas_arena', t.pessoas_arena::NUMERIC),
+            ('pessoas_novas_arena', t.pessoas_novas_arena::NUMERIC),
+            ('pessoas_domingo', t.pessoas_domingo::NUMERIC),
+            ('pessoas_novas_domingo', t.pessoas_novas_domingo::NUMERIC),
+            ('valor_arrecadacao', t.valor_arrecadacao),
+            ('revisao_vidas', t.revisao_vidas::NUMERIC)
+        ) AS q(quesito, valor)
+        WHERE q.valor > 0
+    ),
+    ranking AS (
+        SELECT q.equipe_id,
+               q.quesito,
+               RANK() OVER (PARTITION BY q.quesito ORDER BY q.valor DESC) AS posicao
+        FROM quesitos q
+    ),
+    pontos AS (
+        SELECT rk.equipe_id,
+               jsonb_object_agg(rk.quesito, rk.posicao) AS posicoes,
+               SUM(CASE rk.posicao
+                       WHEN 1 THEN p_pontos_primeiro
+                       WHEN 2 THEN p_pontos_segundo
+                       WHEN 3 THEN p_pontos_terceiro
+                       ELSE p_pontos_demais
+                   END)::BIGINT AS pontuacao_ranking
+        FROM ranking rk
+        GROUP BY rk.equipe_id
+    )
+    SELECT e.id,
+           e.nome::TEXT,
+           e.logo_url,
+           e.pontuacao_total,
+           COALESCE(t.pessoas_novas, 0),
+           COALESCE(t.celulas_realizadas, 0),
+           COALESCE(t.celulas_elite, 0),
+           COALESCE(t.pessoas_terca, 0),
+           COALESCE(t.pessoas_novas_terca, 0),
+           COALESCE(t.pessoas_arena, 0),
+           COALESCE(t.pessoas_novas_arena, 0),
+           COALESCE(t.pessoas_domingo, 0),
+           COALESCE(t.pessoas_novas_domingo, 0),
+           COALESCE(t.valor_arrecadacao, 0),
+           COALESCE(t.revisao_vidas, 0),
+           COALESCE(p.posicoes, '{}'::JSONB),
+           COALESCE(p.pontuacao_ranking, 0)
+    FROM equipes e
+    LEFT JOIN totais t ON t.equipe_id = e.id
+    LEFT JOIN pontos p ON p.equipe_id = e.id
+    WHERE e.liga_id = p_liga_id
+    ORDER BY COALESCE(p.pontuacao_ranking, 0) DESC, e.id;
+$$;
+
+-- Posição da equipe dentro da sua liga; liga_id volta junto para o app
+-- conferir que a equipe é da liga da página
+DROP FUNCTION IF EXISTS posicao_equipe(INTEGER);
+CREATE OR REPLACE FUNCTION posicao_equipe(p_equipe_id INTEGER)
+RETURNS TABLE (
+    id INTEGER,
+    nome TEXT,
+    logo_url TEXT,
+    pontuacao_total INTEGER,
+    posicao BIGINT,
+    liga_id INTEGER
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT e.id,
+           e.nome::TEXT,
+           e.logo_url,
+           e.pontuacao_total,
+           1 + (
+               SELECT COUNT(*)
+               FROM equipes f
+               WHERE f.liga_id = e.liga_id
+                 AND f.pontuacao_total > e.pontuacao_total
+           ) + (
+               SELECT COUNT(*)
+               FROM equipes f
+               WHERE f.liga_id = e.liga_id
+                 AND f.pontuacao_total = e.pontuacao_total
+                 AND f.id < e.id
+           ),
+           e.liga_id
+    FROM equipes e
+    WHERE e.id = p_equipe_id;
+$$;
+
+DROP FUNCTION IF EXISTS resumo_registros(INTEGER, DATE, DATE);
+CREATE OR REPLACE FUNCTION resumo_registros(
+    p_equipe_id INTEGER DEFAULT NULL,
+    p_data_inicio DATE DEFAULT NULL,
+    p_data_fim DATE DEFAULT NULL,
+    p_liga_id INTEGER DEFAULT 1
+)
+RETURNS TABLE (
+    total_registros BIGINT,
+    total_pontos BIGINT,
+    total_pessoas_novas BIGINT,
+    total_arrecadacao NUMERIC,
+    total_revisao_vidas BIGINT,
+    total_arquivados BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH partes AS (
+        SELECT COUNT(*) AS registros,
+               COALESCE(SUM(r.pontuacao), 0) AS pontos,
+               COALESCE(SUM(r.qtd_pessoas_novas), 0) AS pessoas_novas,
+               COALESCE(SUM(r.valor_arrecadacao_parceiro), 0) AS arrecadacao,
+               COALESCE(SUM(r.qtd_revisao_vidas), 0) AS revisao_vidas,
+               0 AS arquivados
+        FROM registros r
+        WHERE r.liga_id = p_liga_id
+          AND (p_equipe_id IS NULL OR r.equipe_id = p_equipe_id)
+          AND (p_data_inicio IS NULL OR r.data_inicio >= p_data_inicio)
+          AND (p_data_fim IS NULL OR r.data_fim <= p_data_fim)
+        UNION ALL
+        SELECT COALESCE(SUM(a.qtd_registros), 0),
+               COALESCE(SUM(a.pontuacao), 0),
+               COALESCE(SUM(a.qtd_pessoas_novas), 0),
+               COALESCE(SUM(a.valor_arrecadacao_parceiro), 0),
+               COALESCE(SUM(a.qtd_revisao_vidas), 0),
+               COALESCE(SUM(a.qtd_registros), 0)
+        FROM registros_ano a
+        WHERE p_data_inicio IS NULL AND p_data_fim IS NULL
+          AND a.liga_id = p_liga_id
+          AND (p_equipe_id IS NULL OR a.equipe_id = p_equipe_id)
+        UNION ALL
+        SELECT COUNT(*),
+               COALESCE(SUM(r.pontuacao), 0),
+               COALESCE(SUM(r.qtd_pessoas_novas), 0),
+               COALESCE(SUM(r.valor_arrecadacao_parceiro), 0),
+               COALESCE(SUM(r.qtd_revisao_vidas), 0),
+               COUNT(*)
+        FROM registros_arquivo r
+        WHERE (p_data_inicio IS NOT NULL OR p_data_fim IS NOT NULL)
+          AND r.liga_id = p_liga_id
+          AND (p_equipe_id IS NULL OR r.equipe_id = p_equipe_id)
+          AND (p_data_inicio IS NULL OR r.data_inicio >= p_data_inicio)
+          AND (p_data_fim IS NULL OR r.data_fim <= p_data_fim)
+    )
+    SELECT SUM(registros)::BIGINT,
+           SUM(pontos)::BIGINT,
+           SUM(pessoas_novas)::BIGINT,
+           SUM(arrecadacao)::NUMERIC,
+           SUM(revisao_vidas)::BIGINT,
+           SUM(arquivados)::BIGINT
+    FROM partes;
+$$;
+
+-- Reconciliação de uma liga (p_liga_id) ou de todas (NULL)
+DROP FUNCTION IF EXISTS reconciliar_pontuacao(BOOLEAN);
+CREATE OR REPLACE FUNCTION reconciliar_pontuacao(p_aplicar BOOLEAN DEFAULT FALSE, p_liga_id INTEGER DEFAULT NULL)
+RETURNS TABLE (
+    equipe_id INTEGER,
+    nome TEXT,
+    pontuacao_armazenada INTEGER,
+    pontuacao_real INTEGER,
+    diferenca INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF p_aplicar THEN
+        LOCK TABLE equipes IN SHARE ROW EXCLUSIVE MODE;
+    END IF;
+
+    RETURN QUERY
+    WITH reais AS (
+        SELECT e.id,
+               (COALESCE((SELECT SUM(r.pontuacao) FROM registros r WHERE r.equipe_id = e.id), 0)
+                + COALESCE((SELECT SUM(a.pontuacao) FROM registros_ano a WHERE a.equipe_id = e.id), 0))::INTEGER AS total
+        FROM equipes e
+        WHERE p_liga_id IS NULL OR e.liga_id = p_liga_id
+    ),
+    divergentes AS (
+        SELECT e.id, e.nome, e.pontuacao_total, reais.total
+        FROM equipes e
+        JOIN reais ON reais.id = e.id
+        WHERE e.pontuacao_total IS DISTINCT FROM reais.total
+    ),
+    corrigidas AS (
+        UPDATE equipes e
+        SET pontuacao_total = d.total
+        FROM divergentes d
+        WHERE p_aplicar AND e.id = d.id
+        RETURNING e.id
+    )
+    SELECT d.id,
+           d.nome::TEXT,
+           d.pontuacao_total,
+           d.total,
+           d.total - COALESCE(d.pontuacao_total, 0)
+    FROM divergentes d
+    ORDER BY abs(d.total - COALESCE(d.pontuacao_total, 0)) DESC, d.id;
+END;
+$$;
+
+ANALYZE equipes;
+ANALYZE registros;
+ANALYZE registros_semana;
+
+-- Verificar se as funções foram criadas
+SELECT * FROM placar_periodo(CURRENT_DATE - 7, CURRENT_DATE, 1);
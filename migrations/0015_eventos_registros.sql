@@ -0,0 +1,257 @@
+-- Script para criar o histórico de eventos dos registros e os snapshots do placar
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Editar ou excluir um registro sobrescreve a linha, então não dava para ver
+-- o placar como estava no domingo passado. Cada inclusão, edição (que muda
+-- a pontuação) e exclusão de registro passa a deixar um evento em
+-- eventos_registros, que só recebe linhas novas.
+--
+-- Refazer o placar de uma data somando todos os eventos desde o início
+-- ficaria mais lento a cada semana. Por isso criar_snapshot_placar (rodada
+-- pelo comando `flask snapshot-placar`, ex.: uma vez por dia) guarda os
+-- totais de cada equipe em placar_snapshots; placar_em parte do snapshot
+-- mais próximo antes da data e soma só os eventos posteriores a ele.
+--
+-- O histórico começa nesta migração (ou na criação da liga): ela grava um
+-- snapshot inicial com os totais atuais de cada equipe.
+
+CREATE TABLE IF NOT EXISTS eventos_registros (
+    id BIGSERIAL PRIMARY KEY,
+    liga_id INTEGER NOT NULL REFERENCES ligas(id),
+    -- Sem foreign key: os eventos de uma equipe excluída continuam no histórico
+    equipe_id INTEGER NOT NULL,
+    registro_id INTEGER NOT NULL,
+    tipo TEXT NOT NULL CHECK (tipo IN ('criado', 'editado', 'excluido')),
+    delta_pontos INTEGER NOT NULL,
+    -- Linha do registro depois da mudança (NULL na exclusão)
+    dados JSONB,
+    data_evento TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Eventos de uma liga depois do snapshot (placar_em, criar_snapshot_placar)
+CREATE INDEX IF NOT EXISTS idx_eventos_registros_liga
+    ON eventos_registros (liga_id, id);
+-- Linha do tempo de um registro
+CREATE INDEX IF NOT EXISTS idx_eventos_registros_registro
+    ON eventos_registros (registro_id, id);
+
+CREATE TABLE IF NOT EXISTS placar_snapshots (
+    id SERIAL PRIMARY KEY,
+    liga_id INTEGER NOT NULL REFERENCES ligas(id),
+    -- Último evento da liga somado neste snapshot
+    ultimo_evento_id BIGINT NOT NULL,
+    data_snapshot TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_placar_snapshots_liga
+    ON placar_snapshots (liga_id, data_snapshot DESC);
+
+CREATE TABLE IF NOT EXISTS placar_snapshot_equipes (
+    snapshot_id INTEGER NOT NULL REFERENCES placar_snapshots(id) ON DELETE CASCADE,
+    equipe_id INTEGER NOT NULL,
+    pontuacao INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, equipe_id)
+);
+
+ALTER TABLE eventos_registros ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for eventos_registros" ON eventos_registros;
+CREATE POLICY "Enable all operations for eventos_registros" ON eventos_registros FOR ALL USING (true);
+ALTER TABLE placar_snapshots ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for placar_snapshots" ON placar_snapshots;
+CREATE POLICY "Enable all operations for placar_snapshots" ON placar_snapshots FOR ALL USING (true);
+ALTER TABLE placar_snapshot_equipes ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Enable all operations for placar_snapshot_equipes" ON placar_snapshot_equipes;
+CREATE POLICY "Enable all operations for placar_snapshot_equipes" ON placar_snapshot_equipes FOR ALL USING (true);
+
+-- Os eventos não mudam depois de gravados
+CREATE OR REPLACE FUNCTION bloquear_alteracao_evento()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RAISE EXCEPTION 'eventos_registros só recebe linhas novas'
+        USING ERRCODE = '55000';
+END;
+$$;
+
+DROP TRIGGER IF EXISTS eventos_registros_imutaveis ON eventos_registros;
+CREATE TRIGGER eventos_registros_imutaveis
+    BEFORE UPDATE OR DELETE ON eventos_registros
+    FOR EACH ROW
+    EXECUTE FUNCTION bloquear_alteracao_evento();
+
+-- Um evento por mudança em registros. As exclusões do arquivamento
+-- (placar.arquivando = 'on') não são eventos: os pontos arquivados
+-- continuam no placar.
+CREATE OR REPLACE FUNCTION registrar_evento_registro()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF current_setting('placar.arquivando', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO eventos_registros (liga_id, equipe_id, registro_id, tipo, delta_pontos, dados)
+        VALUES (NEW.liga_id, NEW.equipe_id, NEW.id, 'criado', COALESCE(NEW.pontuacao, 0), to_jsonb(NEW));
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO eventos_registros (liga_id, equipe_id, registro_id, tipo, delta_pontos, dados)
+        VALUES (NEW.liga_id, NEW.equipe_id, NEW.id, 'editado',
+                COALESCE(NEW.pontuacao, 0) - COALESCE(OLD.pontuacao, 0), to_jsonb(NEW));
+    ELSE
+        INSERT INTO eventos_registros (liga_id, equipe_id, registro_id, tipo, delta_pontos)
+        VALUES (OLD.liga_id, OLD.equipe_id, OLD.id, 'excluido', -COALESCE(OLD.pontuacao, 0));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS registros_eventos ON registros;
+CREATE TRIGGER registros_eventos
+    AFTER INSERT OR UPDATE OR DELETE ON registros
+    FOR EACH ROW
+    EXECUTE FUNCTION registrar_evento_registro();
+
+-- Grava um snapshot de cada liga (só de p_liga_id, se informada) que teve
+-- eventos desde o anterior: os totais do anterior mais esses eventos.
+-- Retorna uma linha por snapshot criado.
+CREATE OR REPLACE FUNCTION criar_snapshot_placar(p_liga_id INTEGER DEFAULT NULL)
+RETURNS TABLE (liga_id INTEGER, snapshot_id INTEGER, eventos INTEGER)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    v_liga INTEGER;
+    v_anterior placar_snapshots;
+    v_ultimo BIGINT;
+    v_eventos INTEGER;
+    v_snapshot INTEGER;
+BEGIN
+    -- Espera as gravações em andamento: um evento ainda não confirmado com
+    -- id menor que o do snapshot ficaria fora dele e dos eventos seguintes
+    LOCK TABLE eventos_registros IN SHARE MODE;
+
+    FOR v_liga IN SELECT l.id FROM ligas l WHERE p_liga_id IS NULL OR l.id = p_liga_id ORDER BY l.id LOOP
+        SELECT * INTO v_anterior
+        FROM placar_snapshots s
+        WHERE s.liga_id = v_liga
+        ORDER BY s.data_snapshot DESC
+        LIMIT 1;
+
+        SELECT MAX(ev.id), COUNT(*) INTO v_ultimo, v_eventos
+        FROM eventos_registros ev
+        WHERE ev.liga_id = v_liga AND ev.id > COALESCE(v_anterior.ultimo_evento_id, 0);
+
+        CONTINUE WHEN v_ultimo IS NULL;
+
+        -- Depois da trava: nenhum evento somado aqui tem data_evento posterior
+        INSERT INTO placar_snapshots (liga_id, ultimo_evento_id, data_snapshot)
+        VALUES (v_liga, v_ultimo, clock_timestamp()::TIMESTAMP)
+        RETURNING id INTO v_snapshot;
+
+        INSERT INTO placar_snapshot_equipes (snapshot_id, equipe_id, pontuacao)
+        SELECT v_snapshot, t.equipe_id, SUM(t.pontos)::INTEGER
+        FROM (
+            SELECT se.equipe_id, se.pontuacao AS pontos
+            FROM placar_snapshot_equipes se
+            WHERE se.snapshot_id = v_anterior.id
+            UNION ALL
+            SELECT ev.equipe_id, ev.delta_pontos
+            FROM eventos_registros ev
+            WHERE ev.liga_id = v_liga
+              AND ev.id > COALESCE(v_anterior.ultimo_evento_id, 0)
+              AND ev.id <= v_ultimo
+        ) t
+        GROUP BY t.equipe_id;
+
+        liga_id := v_liga;
+        snapshot_id := v_snapshot;
+        eventos := v_eventos;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
+
+-- Placar geral da liga como estava em p_data: o snapshot mais recente até
+-- p_data mais os eventos posteriores a ele até p_data. Vazio para datas
+-- anteriores ao início do histórico. Equipes excluídas não aparecem.
+CREATE OR REPLACE FUNCTION placar_em(p_data TIMESTAMP, p_liga_id INTEGER DEFAULT 1)
+RETURNS TABLE (
+    id INTEGER,
+    nome TEXT,
+    logo_url TEXT,
+    pontuacao_total INTEGER
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH base AS (
+        SELECT s.id, s.ultimo_evento_id
+        FROM placar_snapshots s
+        WHERE s.liga_id = p_liga_id AND s.data_snapshot <= p_data
+        ORDER BY s.data_snapshot DESC
+        LIMIT 1
+    ),
+    totais AS (
+        SELECT t.equipe_id, SUM(t.pontos)::INTEGER AS pontos
+        FROM (
+            SELECT se.equipe_id, se.pontuacao AS pontos
+            FROM placar_snapshot_equipes se
+            JOIN base ON se.snapshot_id = base.id
+            UNION ALL
+            SELECT ev.equipe_id, ev.delta_pontos
+            FROM eventos_registros ev
+            JOIN base ON ev.id > base.ultimo_evento_id
+            WHERE ev.liga_id = p_liga_id
+              AND ev.data_evento <= p_data
+        ) t
+        GROUP BY t.equipe_id
+    )
+    SELECT e.id,
+           e.nome::TEXT,
+           e.logo_url,
+           COALESCE(t.pontos, 0)
+    FROM equipes e
+    CROSS JOIN base
+    LEFT JOIN totais t ON t.equipe_id = e.id
+    WHERE e.liga_id = p_liga_id
+      AND COALESCE(e.data_criacao, '-infinity') <= p_data
+    ORDER BY COALESCE(t.pontos, 0) DESC, e.id;
+$$;
+
+-- Toda liga nova começa o histórico com um snapshot vazio
+CREATE OR REPLACE FUNCTION criar_snapshot_inicial_liga()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO placar_snapshots (liga_id, ultimo_evento_id)
+    VALUES (NEW.id, COALESCE((SELECT MAX(id) FROM eventos_registros), 0));
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS ligas_snapshot_inicial ON ligas;
+CREATE TRIGGER ligas_snapshot_inicial
+    AFTER INSERT ON ligas
+    FOR EACH ROW
+    EXECUTE FUNCTION criar_snapshot_inicial_liga();
+
+-- Snapshot inicial das ligas que já existem, com os totais reais de cada
+-- equipe (registros + resumos anuais do arquivo, como na reconciliação)
+WITH iniciais AS (
+    INSERT INTO placar_snapshots (liga_id, ultimo_evento_id)
+    SELECT l.id, 0
+    FROM ligas l
+    WHERE NOT EXISTS (SELECT 1 FROM placar_snapshots s WHERE s.liga_id = l.id)
+    RETURNING id, liga_id
+)
+INSERT INTO placar_snapshot_equipes (snapshot_id, equipe_id, pontuacao)
+SELECT i.id,
+       e.id,
+       (COALESCE((SELECT SUM(r.pontuacao) FROM registros r WHERE r.equipe_id = e.id), 0)
+        + COALESCE((SELECT SUM(a.pontuacao) FROM registros_ano a WHERE a.equipe_id = e.id), 0))::INTEGER
+FROM iniciais i
+JOIN equipes e ON e.liga_id = i.liga_id;
+
+-- Verificar se as funções foram criadas
+SELECT * FROM placar_em(NOW()::TIMESTAMP, 1);
@@ -0,0 +1,84 @@
+-- Script para a marca de sincronização do espelho por transação (xid)
+-- Migração: aplicada em ordem por `python migracoes.py aplicar`
+
+-- Até aqui o espelho buscava as linhas com data_atualizacao a partir da
+-- última marca menos 60s. data_atualizacao é NOW(), o início da transação:
+-- uma transação mais longa que isso (registrar_lote grande, arquivar,
+-- reconciliar) gravava linhas com data anterior à marca e o espelho nunca
+-- as copiava.
+--
+-- Cada linha passa a guardar o id da transação que a gravou por último
+-- (xid_alteracao). Antes de copiar, o espelho pede marca_espelho(): o menor
+-- xid ainda em andamento. Toda transação com xid menor já terminou, e toda
+-- que terminar depois tem xid maior ou igual a ela. Na rodada seguinte o
+-- espelho busca xid_alteracao >= essa marca, então nenhuma transação, por
+-- mais longa que seja, fica para trás. Enquanto uma transação longa não
+-- termina, as rodadas releem as linhas gravadas desde que ela começou
+-- (regravar uma linha igual no espelho não muda nada).
+
+-- O DEFAULT volátil preenche as linhas existentes (com o xid desta
+-- migração) e as novas inserções; o trigger cobre as atualizações.
+ALTER TABLE equipes ADD COLUMN IF NOT EXISTS xid_alteracao xid8 NOT NULL DEFAULT pg_current_xact_id();
+ALTER TABLE registros ADD COLUMN IF NOT EXISTS xid_alteracao xid8 NOT NULL DEFAULT pg_current_xact_id();
+ALTER TABLE registros_ano ADD COLUMN IF NOT EXISTS xid_alteracao xid8 NOT NULL DEFAULT pg_current_xact_id();
+ALTER TABLE arquivamentos ADD COLUMN IF NOT EXISTS xid_alteracao xid8 NOT NULL DEFAULT pg_current_xact_id();
+ALTER TABLE exclusoes ADD COLUMN IF NOT EXISTS xid_alteracao xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+CREATE OR REPLACE FUNCTION marcar_xid_alteracao()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.xid_alteracao = pg_current_xact_id();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS equipes_xid_alteracao ON equipes;
+CREATE TRIGGER equipes_xid_alteracao
+    BEFORE UPDATE ON equipes
+    FOR EACH ROW
+    EXECUTE FUNCTION marcar_xid_alteracao();
+
+DROP TRIGGER IF EXISTS registros_xid_alteracao ON registros;
+CREATE TRIGGER registros_xid_alteracao
+    BEFORE UPDATE ON registros
+    FOR EACH ROW
+    EXECUTE FUNCTION marcar_xid_alteracao();
+
+DROP TRIGGER IF EXISTS registros_ano_xid_alteracao ON registros_ano;
+CREATE TRIGGER registros_ano_xid_alteracao
+    BEFORE UPDATE ON registros_ano
+    FOR EACH ROW
+    EXECUTE FUNCTION marcar_xid_alteracao();
+
+DROP TRIGGER IF EXISTS arquivamentos_xid_alteracao ON arquivamentos;
+CREATE TRIGGER arquivamentos_xid_alteracao
+    BEFORE UPDATE ON arquivamentos
+    FOR EACH ROW
+    EXECUTE FUNCTION marcar_xid_alteracao();
+
+-- Cobre também o ON CONFLICT DO UPDATE de registrar_exclusao()
+DROP TRIGGER IF EXISTS exclusoes_xid_alteracao ON exclusoes;
+CREATE TRIGGER exclusoes_xid_alteracao
+    BEFORE UPDATE ON exclusoes
+    FOR EACH ROW
+    EXECUTE FUNCTION marcar_xid_alteracao();
+
+-- Mesma ordem da paginação do espelho (xid_alteracao, id)
+CREATE INDEX IF NOT EXISTS idx_equipes_xid_alteracao ON equipes (xid_alteracao, id);
+CREATE INDEX IF NOT EXISTS idx_registros_xid_alteracao ON registros (xid_alteracao, id);
+CREATE INDEX IF NOT EXISTS idx_registros_ano_xid_alteracao ON registros_ano (xid_alteracao, id);
+CREATE INDEX IF NOT EXISTS idx_arquivamentos_xid_alteracao ON arquivamentos (xid_alteracao, id);
+CREATE INDEX IF NOT EXISTS idx_exclusoes_xid_alteracao ON exclusoes (xid_alteracao, registro_id);
+
+-- Menor xid ainda em andamento (texto: o JSON não tem inteiro de 64 bits seguro)
+CREATE OR REPLACE FUNCTION marca_espelho()
+RETURNS TEXT
+LANGUAGE sql VOLATILE
+AS $$
+    SELECT pg_snapshot_xmin(pg_current_snapshot())::TEXT;
+$$;
+
+-- Verificar se a função foi criada
+SELECT marca_espelho();